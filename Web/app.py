@@ -25,14 +25,25 @@ Features:
 - Booking and reservation of items
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, get_flashed_messages, jsonify, Response, make_response
+from flask import Flask, render_template, request, redirect, url_for, session, flash, get_flashed_messages, jsonify, Response, make_response, stream_with_context
 from werkzeug.utils import secure_filename
 import user as us
 import items as it
 import ausleihung as au
+import auth
+import database
+import indexes
+import search
+import occupancy
+import scheduler
+import image_jobs
+import item_cache
+import media_store
+import metadata
+import notifications
+import payloads
+import serving
 import datetime
-from apscheduler.schedulers.background import BackgroundScheduler
-from pymongo import MongoClient
 from bson.objectid import ObjectId
 from urllib.parse import urlparse, urlunparse
 import requests
@@ -43,11 +54,14 @@ import time
 import traceback
 import re
 import io
+import csv
+import hashlib
 import html
 # QR Code functionality deactivated
 # import qrcode
 # from qrcode.constants import ERROR_CORRECT_L
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import shutil
 import uuid
@@ -88,6 +102,15 @@ SSL_KEY = cfg.SSL_KEY
 
 SCHOOL_PERIODS = cfg.SCHOOL_PERIODS
 
+# Long-poll wait of /api/notifications; stays below the gunicorn timeout
+NOTIFICATION_WAIT_SECONDS = 25
+
+# /api/bootstrap answers are reused per user for a few seconds
+BOOTSTRAP_CACHE_SECONDS = 5
+BOOTSTRAP_CACHE_SIZE = 1000
+# Predefined filters offered in the edit dialogs
+BOOTSTRAP_PREDEFINED_FILTERS = (1, 2)
+
 # Apply the configuration for general use throughout the app
 APP_VERSION = __version__
 
@@ -118,170 +141,17 @@ if not os.path.exists(BACKUP_FOLDER):
         except Exception as e:
             print(f"Fehler: Backup-Verzeichnis konnte nicht erstellt werden: {e}")
 
-def create_daily_backup():
-    """
-    Erstellt täglich ein Backup der Ausleihungsdatenbank
-    """
-    try:
-        print(f"[{datetime.datetime.now()}] Erstelle Backup der Ausleihungsdatenbank...")
-        result = au.create_backup_database()
-        if result:
-            print(f"[{datetime.datetime.now()}] Backup erfolgreich erstellt")
-        else:
-            print(f"[{datetime.datetime.now()}] Fehler beim Erstellen des Backups")
-    except Exception as e:
-        print(f"[{datetime.datetime.now()}] Ausnahme beim Erstellen des Backups: {str(e)}")
-
-def update_appointment_statuses():
-    """
-    Aktualisiert automatisch die Status aller Terminplaner-Einträge.
-    Diese Funktion wird jede Minute ausgeführt und überprüft:
-    - Geplante Termine, die aktiviert werden sollten
-    - Aktive Termine, die beendet werden sollten
-    """
-    current_time = datetime.datetime.now()
-    # Prepare logging early so it's available in exception paths
-    log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    log_file = os.path.join(log_dir, 'scheduler.log')
-
-    try:
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(f"[{current_time}] Starte automatische Statusaktualisierung...\n")
-
-        print(f"[{current_time}] Starte automatische Statusaktualisierung...")
-
-        # Hole alle Termine mit Status 'planned' oder 'active'
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
-        ausleihungen = db['ausleihungen']
-
-        # Finde alle Termine, die status updates benötigen
-        appointments_to_check = list(ausleihungen.find({
-            'Status': {'$in': ['planned', 'active']}
-        }))
-
-        updated_count = 0
-        activated_count = 0
-        completed_count = 0
-
-        for appointment in appointments_to_check:
-            old_status = appointment.get('Status')
-
-            # Aktuellen Status bestimmen
-            new_status = au.get_current_status(appointment, log_changes=True, user='scheduler')
-
-            # Wenn sich der Status geändert hat, aktualisiere in der Datenbank
-            if new_status != old_status:
-                extra_fields = {}
-
-                # --- Conflict resolver: planned → active transition ---
-                # Check if the physical item is already borrowed by someone else
-                if old_status == 'planned' and new_status == 'active':
-                    items_col = db['items']
-                    item_id_str = appointment.get('Item')
-                    conflict_detected = False
-                    conflict_note = ''
-                    if item_id_str:
-                        try:
-                            item_doc = items_col.find_one(
-                                {'_id': ObjectId(item_id_str)},
-                                {'Verfuegbar': 1, 'User': 1, 'Name': 1, 'Exemplare': 1}
-                            )
-                            if item_doc:
-                                total_exemplare = int(item_doc.get('Exemplare', 1))
-                                # Count how many active (non-planned) borrows currently hold this item
-                                active_borrows = ausleihungen.count_documents({
-                                    'Item': item_id_str,
-                                    'Status': 'active',
-                                    '_id': {'$ne': appointment['_id']}
-                                })
-                                if active_borrows >= total_exemplare or item_doc.get('Verfuegbar') is False:
-                                    conflict_detected = True
-                                    borrower = item_doc.get('User', 'unbekannter Benutzer')
-                                    item_name = item_doc.get('Name', item_id_str)
-                                    conflict_note = (
-                                        f"Gegenstand '{item_name}' war beim Aktivieren von "
-                                        f"'{appointment.get('User', '?')}' bereits ausgeliehen "
-                                        f"von '{borrower}' (aktive Borrows: {active_borrows}/{total_exemplare})."
-                                    )
-                                    extra_fields['ConflictDetected'] = True
-                                    extra_fields['ConflictNote'] = conflict_note
-                                    extra_fields['ConflictAt'] = current_time
-                                    conflict_log = (
-                                        f"  [KONFLIKT] Termin {appointment['_id']}: "
-                                        f"planned → active, aber {conflict_note}"
-                                    )
-                                    print(conflict_log)
-                                    with open(log_file, 'a', encoding='utf-8') as f:
-                                        f.write(f"[{current_time}] {conflict_log}\n")
-                                else:
-                                    # No conflict — clear any previously stored conflict flag
-                                    extra_fields['ConflictDetected'] = False
-                                    extra_fields['ConflictNote'] = ''
-                        except Exception as conflict_err:
-                            print(f"  [WARN] Konfliktprüfung fehlgeschlagen für Termin "
-                                  f"{appointment['_id']}: {conflict_err}")
+# Ensure MongoDB indexes and run pending schema migrations
+if cfg.MONGODB_ENSURE_INDEXES:
+    indexes.bootstrap()
 
-                result = ausleihungen.update_one(
-                    {'_id': appointment['_id']},
-                    {'$set': {
-                        'Status': new_status,
-                        'LastUpdated': current_time,
-                        **extra_fields
-                    }}
-                )
-
-                if result.modified_count > 0:
-                    updated_count += 1
-                    if new_status == 'active':
-                        activated_count += 1
-                    elif new_status == 'completed':
-                        completed_count += 1
-
-                    log_msg = f"  - Termin {appointment['_id']}: {old_status} → {new_status}"
-                    print(log_msg)
-                    with open(log_file, 'a', encoding='utf-8') as f:
-                        f.write(f"[{current_time}] {log_msg}\n")
-
-        client.close()
-
-        if updated_count > 0:
-            result_msg = f"Statusaktualisierung abgeschlossen: {updated_count} Termine aktualisiert"
-            detail_msg = f"  - {activated_count} aktiviert, {completed_count} abgeschlossen"
-            print(f"[{current_time}] {result_msg}")
-            print(f"[{current_time}] {detail_msg}")
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"[{current_time}] {result_msg}\n")
-                f.write(f"[{current_time}] {detail_msg}\n")
-        else:
-            result_msg = "Statusaktualisierung abgeschlossen: Keine Änderungen erforderlich"
-            print(f"[{current_time}] {result_msg}")
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"[{current_time}] {result_msg}\n")
-
-    except Exception as e:
-        error_msg = f"Fehler bei der automatischen Statusaktualisierung: {str(e)}"
-        print(f"[{datetime.datetime.now()}] {error_msg}")
-        try:
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"[{datetime.datetime.now()}] {error_msg}\n")
-        except Exception:
-            pass
-        import traceback
-        traceback.print_exc()
-
-# Schedule jobs
-scheduler = BackgroundScheduler()
+# Schedule jobs (only the elected leader process actually runs them)
 if cfg.SCHEDULER_ENABLED:
-    scheduler.add_job(func=create_daily_backup, trigger="interval", hours=cfg.BACKUP_INTERVAL_HOURS)
-    scheduler.add_job(func=update_appointment_statuses, trigger="interval", minutes=cfg.SCHEDULER_INTERVAL_MIN)
-    scheduler.start()
+    scheduler.start_background()
 
 # Register shutdown handler to stop scheduler when app is terminated
 import atexit
-atexit.register(lambda: scheduler.shutdown() if cfg.SCHEDULER_ENABLED else None)
+atexit.register(scheduler.shutdown)
 
 def allowed_file(filename, file_content=None, max_size_mb=cfg.MAX_UPLOAD_MB):
     """
@@ -459,6 +329,18 @@ def sanitize_form_value(value):
     return value
 
 
+def _send_placeholder():
+    """
+    Send the placeholder image for a missing file. The response must not be
+    cached, so the real image shows up once it exists.
+    """
+    for placeholder in ('img/no-image.svg', 'img/no-image.png', 'favicon.ico'):
+        response = serving.send('static', placeholder, cache_control='no-cache')
+        if response is not None:
+            return response
+    return Response("Image not found", status=404)
+
+
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
     """
@@ -471,26 +353,18 @@ def uploaded_file(filename):
         flask.Response: The requested file or placeholder image if not found
     """
     try:
-        # Check production path first (deployed environment)
-        prod_path = "/opt/Inventarsystem/Web/uploads"
-        dev_path = app.config['UPLOAD_FOLDER']
-        if os.path.exists(os.path.join(prod_path, filename)):
-            return send_from_directory(prod_path, filename)
-        # Then check development path
-        if os.path.exists(os.path.join(dev_path, filename)):
-            return send_from_directory(dev_path, filename)
-            
-        # Use a placeholder image if file not found - first try SVG, then PNG
-        svg_placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.svg')
-        png_placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.png')
-        
-        if os.path.exists(svg_placeholder_path):
-            return send_from_directory(app.static_folder, 'img/no-image.svg')
-        elif os.path.exists(png_placeholder_path):
-            return send_from_directory(app.static_folder, 'img/no-image.png')
-        
-        # Default placeholder from static folder
-        return send_from_directory(app.static_folder, 'favicon.ico')
+        response = serving.send('uploads', filename)
+        if response is not None:
+            return response
+
+        # The image worker may have replaced the upload with its WebP version
+        webp_filename = os.path.splitext(filename)[0] + '.webp'
+        if webp_filename != filename:
+            response = serving.send('uploads', webp_filename)
+            if response is not None:
+                return response
+
+        return _send_placeholder()
     except Exception as e:
         print(f"Error serving file {filename}: {str(e)}")
         return Response("Image not found", status=404)
@@ -508,24 +382,7 @@ def thumbnail_file(filename):
         flask.Response: The requested thumbnail file or placeholder image if not found
     """
     try:
-        # Check production path first
-        prod_path = "/var/Inventarsystem/Web/thumbnails"
-        dev_path = app.config['THUMBNAIL_FOLDER']
-        if os.path.exists(os.path.join(prod_path, filename)):
-            return send_from_directory(prod_path, filename)
-        if os.path.exists(os.path.join(dev_path, filename)):
-            return send_from_directory(dev_path, filename)
-            
-        # Use a placeholder image if file not found - first try SVG, then PNG
-        svg_placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.svg')
-        png_placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.png')
-        
-        if os.path.exists(svg_placeholder_path):
-            return send_from_directory(app.static_folder, 'img/no-image.svg')
-        elif os.path.exists(png_placeholder_path):
-            return send_from_directory(app.static_folder, 'img/no-image.png')
-        else:
-            return send_from_directory(app.static_folder, 'favicon.ico')
+        return serving.send('thumbnails', filename) or _send_placeholder()
     except Exception as e:
         print(f"Error serving thumbnail {filename}: {str(e)}")
         return Response("Thumbnail not found", status=404)
@@ -543,24 +400,7 @@ def preview_file(filename):
         flask.Response: The requested preview file or placeholder image if not found
     """
     try:
-        # Check production path first
-        prod_path = "/var/Inventarsystem/Web/previews"
-        dev_path = app.config['PREVIEW_FOLDER']
-        if os.path.exists(os.path.join(prod_path, filename)):
-            return send_from_directory(prod_path, filename)
-        if os.path.exists(os.path.join(dev_path, filename)):
-            return send_from_directory(dev_path, filename)
-            
-        # Use a placeholder image if file not found - first try SVG, then PNG
-        svg_placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.svg')
-        png_placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.png')
-        
-        if os.path.exists(svg_placeholder_path):
-            return send_from_directory(app.static_folder, 'img/no-image.svg')
-        elif os.path.exists(png_placeholder_path):
-            return send_from_directory(app.static_folder, 'img/no-image.png')
-        else:
-            return send_from_directory(app.static_folder, 'favicon.ico')
+        return serving.send('previews', filename) or _send_placeholder()
     except Exception as e:
         print(f"Error serving preview {filename}: {str(e)}")
         return Response("Preview not found", status=404)
@@ -614,48 +454,14 @@ def catch_all_files(filename):
         flask.Response: The requested file or placeholder image if not found
     """
     try:
-        # Check if the file exists in any of our directories
-        possible_dirs = [
-            app.config['UPLOAD_FOLDER'],
-            app.config['THUMBNAIL_FOLDER'],
-            app.config['PREVIEW_FOLDER'],
-            # app.config['QR_CODE_FOLDER'],  # QR Code serving deactivated
-            os.path.join(BASE_DIR, 'static')
-        ]
-        
-        # Check development paths first
-        for directory in possible_dirs:
-            file_path = os.path.join(directory, filename)
-            if os.path.isfile(file_path):
-                return send_from_directory(directory, os.path.basename(filename))
-        
-        # Check production paths if available
-        if os.path.exists("/var/Inventarsystem/Web"):
-            prod_dirs = [
-                "/var/Inventarsystem/Web/uploads",
-                "/var/Inventarsystem/Web/thumbnails",
-                "/var/Inventarsystem/Web/previews",
-                # "/var/Inventarsystem/Web/QRCodes",  # QR Code serving deactivated
-                "/var/Inventarsystem/Web/static"
-            ]
-            
-            for directory in prod_dirs:
-                file_path = os.path.join(directory, filename)
-                if os.path.isfile(file_path):
-                    return send_from_directory(directory, os.path.basename(filename))
-        
+        for kind in ('uploads', 'thumbnails', 'previews', 'static'):
+            response = serving.send(kind, filename)
+            if response is not None:
+                return response
+
         # Check if this looks like an image request
         if any(filename.lower().endswith(ext) for ext in ['png', 'jpg', 'jpeg', 'gif', 'svg']):
-            # Use a placeholder image if file not found - first try SVG, then PNG
-            svg_placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.svg')
-            png_placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.png')
-            
-            if os.path.exists(svg_placeholder_path):
-                return send_from_directory(app.static_folder, 'img/no-image.svg')
-            elif os.path.exists(png_placeholder_path):
-                return send_from_directory(app.static_folder, 'img/no-image.png')
-            else:
-                return send_from_directory(app.static_folder, 'favicon.ico')
+            return _send_placeholder()
         
         # If we get here, the file wasn't found
         return Response(f"File {filename} not found", status=404)
@@ -685,7 +491,7 @@ def user_status():
         JSON: User status information or error if not authenticated
     """
     if 'username' in session:
-        is_admin = us.check_admin(session['username'])
+        is_admin = auth.is_admin()
         return jsonify({
             'authenticated': True,
             'username': session['username'],
@@ -710,13 +516,14 @@ def home():
     if 'username' not in session:
         flash('Bitte mit registriertem Konto anmelden!', 'error')
         return redirect(url_for('login'))
-    elif not us.check_admin(session['username']):
+    elif not auth.is_admin():
         return render_template('main.html', username=session['username'])
     else:
         return redirect(url_for('home_admin'))
 
 
 @app.route('/home_admin')
+@auth.admin_required
 def home_admin():
     """
     Admin homepage route.
@@ -725,16 +532,11 @@ def home_admin():
     Returns:
         flask.Response: Rendered template or redirect
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
     return render_template('main_admin.html', username=session['username'])
 
 
 @app.route('/upload_admin')
+@auth.admin_required
 def upload_admin():
     """
     Admin upload page route.
@@ -744,13 +546,6 @@ def upload_admin():
     Returns:
         flask.Response: Rendered template or redirect
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     # Check if this is a duplication request
     duplicate_from = request.args.get('duplicate_from')
     duplicate_flag = request.args.get('duplicate')  # Check for sessionStorage-based duplication
@@ -825,6 +620,7 @@ def login():
 
         if user:
             session['username'] = username
+            auth.remember(username, user.get('Admin', False))
             if user['Admin']:
                 session['admin'] = True
                 return redirect(url_for('home_admin'))
@@ -915,35 +711,129 @@ def logout():
     """
     session.pop('username', None)
     session.pop('admin', None)
+    auth.forget()
     return redirect(url_for('login'))
 
 
+def _merged_favorites():
+    """Merge DB favorites into the session (if logged in) and return them as a set."""
+    username = session.get('username')
+    if username:
+        try:
+            db_favs = set(us.get_favorites(username))
+            session_favs = set(session.get('favorites', []))
+            merged = list(db_favs.union(session_favs))
+            session['favorites'] = merged
+        except Exception as fav_err:
+            app.logger.warning(f"Could not merge DB favorites: {fav_err}")
+    return set(session.get('favorites', []))
+
+
 @app.route('/get_items', methods=['GET'])
 def get_items():
-    """Return items plus merged favorites (session + DB) and per-item favorite flag."""
+    """
+    Return items plus merged favorites (session + DB) and per-item favorite flag.
+
+    With since=<cursor of the previous answer> only items changed since then
+    and the IDs of deleted items are returned ('full': false), together with
+    the item count so the client can detect a drifted local copy. If the
+    cursor is too old or invalid, the full list is returned ('full': true).
+    'version' is the catalog version the answer is at least as new as.
+    """
     try:
-        username = session.get('username')
-        # Merge DB favorites into session if logged in
-        if username:
+        favorites = _merged_favorites()
+        # Taken before reading, so writes during the read are in the next sync
+        cursor = datetime.datetime.now().isoformat()
+        version = item_cache.version()
+
+        since = request.args.get('since')
+        if since:
             try:
-                db_favs = set(us.get_favorites(username))
-                session_favs = set(session.get('favorites', []))
-                merged = list(db_favs.union(session_favs))
-                session['favorites'] = merged
-            except Exception as fav_err:
-                app.logger.warning(f"Could not merge DB favorites: {fav_err}")
-        favorites = set(session.get('favorites', []))
-
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
-        items_col = db['items']
-        items_cur = items_col.find()
-        items = []
-        for itm in items_cur:
+                changes = it.get_item_changes(datetime.datetime.fromisoformat(since))
+            except ValueError:
+                changes = None
+            if changes is not None:
+                items, deleted = changes
+                for itm in items:
+                    itm['is_favorite'] = itm['_id'] in favorites
+                return jsonify({
+                    'items': items,
+                    'deleted': deleted,
+                    'count': it.count_items(),
+                    'cursor': cursor,
+                    'version': version,
+                    'full': False,
+                    'favorites': list(favorites),
+                })
+
+        # The full list is serialised once per catalog version and set of
+        # favorites; unchanged catalogs are answered from the cached bytes or 304
+        favorites = sorted(favorites)
+        favorites_key = hashlib.sha1('\n'.join(favorites).encode('utf-8')).hexdigest()[:12]
+
+        def build():
+            items = it.get_items()
+            for itm in items:
+                itm['is_favorite'] = itm['_id'] in favorites
+            return payloads.dumps({'items': items, 'favorites': favorites, 'cursor': cursor,
+                                   'version': version, 'full': True})
+
+        return payloads.respond(('get_items', favorites_key), f"{version}-{favorites_key}", build)
+    except Exception as e:
+        return jsonify({'items': [], 'error': str(e)}), 500
+
+
+ITEMS_PAGE_SIZE = 100
+ITEMS_MAX_PAGE_SIZE = 500
+
+
+@app.route('/api/v2/items', methods=['GET'])
+def get_items_v2():
+    """
+    Paginated catalog API.
+
+    Query parameters:
+        profile: 'card' (fields needed by the item grid, default) or 'full'
+        limit: Items per page (default 100, max. 500)
+        cursor: next_cursor of the previous page
+        filter, filter2, filter3, ort: Exact match on the respective field
+        verfuegbar: 'true' or 'false'
+
+    Returns:
+        dict: {'items': [...], 'next_cursor': str or None, 'favorites': [...]}
+    """
+    try:
+        favorites = _merged_favorites()
+
+        profile = request.args.get('profile', 'card')
+        if profile not in it.ITEM_PROFILES:
+            return jsonify({'items': [], 'error': f'Unknown profile: {profile}'}), 400
+        try:
+            limit = max(1, min(int(request.args.get('limit', ITEMS_PAGE_SIZE)), ITEMS_MAX_PAGE_SIZE))
+        except ValueError:
+            limit = ITEMS_PAGE_SIZE
+
+        verfuegbar = request.args.get('verfuegbar')
+        if verfuegbar is not None:
+            verfuegbar = verfuegbar.lower() in ('1', 'true', 'yes')
+
+        query = it.build_item_query(
+            filter=request.args.get('filter'),
+            filter2=request.args.get('filter2'),
+            filter3=request.args.get('filter3'),
+            ort=request.args.get('ort'),
+            verfuegbar=verfuegbar
+        )
+        items, next_cursor = it.get_items_page(
+            query,
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            profile=profile
+        )
+        for itm in items:
             itm['_id'] = str(itm['_id'])
             itm['is_favorite'] = itm['_id'] in favorites
-            items.append(itm)
-        return jsonify({'items': items, 'favorites': list(favorites)})
+        return jsonify({'items': items, 'next_cursor': next_cursor, 'favorites': list(favorites)})
     except Exception as e:
         return jsonify({'items': [], 'error': str(e)}), 500
 
@@ -951,9 +841,7 @@ def get_items():
 @app.route('/get_item/<id>')
 def get_item_json(id):
     try:
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
-        item = db['items'].find_one({'_id': ObjectId(id)})
+        item = it.get_item(id)
         if not item:
             return jsonify({'error': 'not found'}), 404
         item['_id'] = str(item['_id'])
@@ -962,6 +850,41 @@ def get_item_json(id):
         return jsonify({'error': str(e)}), 500
 
 
+def _booking_conflicts(username, is_admin):
+    """
+    List active bookings with a detected conflict.
+
+    Args:
+        username (str): User whose conflicts are listed
+        is_admin (bool): List the conflicts of all users instead
+
+    Returns:
+        list: Conflicts as shown in the conflict banners
+    """
+    query = {'ConflictDetected': True, 'Status': 'active'}
+    if not is_admin:
+        query['User'] = username
+
+    conflicts = list(database.get_db()['ausleihungen'].find(query))
+    items_by_id = it.get_items_by_ids(c.get('Item') for c in conflicts)
+    result = []
+    for c in conflicts:
+        item_doc = items_by_id.get(str(c.get('Item')))
+        item_name = item_doc.get('Name', c.get('Item', '?')) if item_doc else c.get('Item', '?')
+        conflict_at = c.get('ConflictAt')
+        if isinstance(conflict_at, datetime.datetime):
+            conflict_at = conflict_at.strftime('%Y-%m-%d %H:%M')
+        result.append({
+            'id': str(c['_id']),
+            'Item': item_name,
+            'User': c.get('User', '?'),
+            'ConflictNote': c.get('ConflictNote', ''),
+            'ConflictAt': conflict_at,
+            'Status': c.get('Status', ''),
+        })
+    return result
+
+
 @app.route('/api/booking_conflicts')
 def api_booking_conflicts():
     """
@@ -972,36 +895,180 @@ def api_booking_conflicts():
     if 'username' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     try:
-        is_admin = us.check_admin(session['username'])
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
-        ausleihungen = db['ausleihungen']
-
-        query = {'ConflictDetected': True, 'Status': 'active'}
-        if not is_admin:
-            query['User'] = session['username']
-
-        conflicts = list(ausleihungen.find(query))
-        result = []
-        for c in conflicts:
-            item_doc = it.get_item(c.get('Item'))
-            item_name = item_doc.get('Name', c.get('Item', '?')) if item_doc else c.get('Item', '?')
-            conflict_at = c.get('ConflictAt')
-            if isinstance(conflict_at, datetime.datetime):
-                conflict_at = conflict_at.strftime('%Y-%m-%d %H:%M')
-            result.append({
-                'id': str(c['_id']),
-                'Item': item_name,
-                'User': c.get('User', '?'),
-                'ConflictNote': c.get('ConflictNote', ''),
-                'ConflictAt': conflict_at,
-                'Status': c.get('Status', ''),
-            })
-        client.close()
+        result = _booking_conflicts(session['username'], auth.is_admin())
         return jsonify({'conflicts': result, 'count': len(result)})
     except Exception as e:
         return jsonify({'error': str(e), 'conflicts': []}), 500
 
+
+_bootstrap_pool = ThreadPoolExecutor(max_workers=6, thread_name_prefix='bootstrap')
+_bootstrap_lock = threading.Lock()
+_bootstrap_cache = {}   # username -> (expires at, admin flag, data)
+
+
+def _bootstrap_shared():
+    """
+    Start the reads of /api/bootstrap that are the same for every user.
+
+    They come from versioned per-process snapshots and are read on every
+    request, so the catalog version is never older than the local catalog
+    a client wrote after its last /get_items.
+
+    Returns:
+        dict: name -> Future
+    """
+    def catalog():
+        # Version first: data read afterwards is at least as new
+        return {'version': item_cache.version(), 'count': it.count_items()}
+
+    def predefined_filters():
+        return {str(n): metadata.get_predefined_filter_values(n) for n in BOOTSTRAP_PREDEFINED_FILTERS}
+
+    return {
+        'catalog': _bootstrap_pool.submit(catalog),
+        'filters': _bootstrap_pool.submit(
+            lambda: {field: metadata.get_filter_values(field) for field in metadata.FILTER_FIELDS}),
+        'predefined_filters': _bootstrap_pool.submit(predefined_filters),
+        'locations': _bootstrap_pool.submit(metadata.get_predefined_locations),
+    }
+
+
+def _bootstrap_data(username, is_admin):
+    """
+    Collect the per-user part of /api/bootstrap.
+
+    The reads are independent, so they run concurrently on the bootstrap
+    pool; the page waits for the slowest one instead of the sum.
+    """
+    futures = {
+        'favorites': _bootstrap_pool.submit(us.get_favorites, username),
+        'conflicts': _bootstrap_pool.submit(_booking_conflicts, username, is_admin),
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _cached_bootstrap_data(username, is_admin):
+    """Return _bootstrap_data() of a user, reusing it for BOOTSTRAP_CACHE_SECONDS."""
+    now = time.monotonic()
+    with _bootstrap_lock:
+        entry = _bootstrap_cache.get(username)
+    if entry and entry[0] > now and entry[1] == is_admin:
+        return entry[2]
+
+    data = _bootstrap_data(username, is_admin)
+    with _bootstrap_lock:
+        if len(_bootstrap_cache) >= BOOTSTRAP_CACHE_SIZE:
+            for key in [k for k, v in _bootstrap_cache.items() if v[0] <= now]:
+                del _bootstrap_cache[key]
+            if len(_bootstrap_cache) >= BOOTSTRAP_CACHE_SIZE:
+                _bootstrap_cache.clear()
+        _bootstrap_cache[username] = (now + BOOTSTRAP_CACHE_SECONDS, is_admin, data)
+    return data
+
+
+def _forget_bootstrap(username):
+    """Drop the cached /api/bootstrap data of a user after they changed it."""
+    if username:
+        with _bootstrap_lock:
+            _bootstrap_cache.pop(username, None)
+
+
+@app.route('/api/bootstrap')
+def api_bootstrap():
+    """
+    Everything the main pages need for their first paint, in one request:
+
+        user: {'username', 'is_admin'}
+        favorites: Merged favorites (session + DB)
+        catalog: {'version', 'count'} of the item catalog; a client whose
+            local copy (see catalog_sync.js) has this version needs no
+            /get_items request
+        filters: Values used by items per filter field
+        predefined_filters: Predefined values of the edit dialog filters
+        locations: Predefined locations
+        periods: School periods
+        conflicts: Same as /api/booking_conflicts
+
+    The per-user part (favorites, conflicts) is reused for
+    BOOTSTRAP_CACHE_SECONDS; everything else is read on every request.
+    """
+    user = auth.current_user()
+    if user is None:
+        return jsonify({'error': 'Not authenticated'}), 401
+    try:
+        username = user['username']
+        shared = _bootstrap_shared()
+        data = dict(_cached_bootstrap_data(username, user['admin']))
+        data.update({name: future.result() for name, future in shared.items()})
+
+        # Not written back: the cached DB favorites may lag a removal
+        favorites = sorted(set(data['favorites']) | set(session.get('favorites', [])))
+
+        response = jsonify(dict(
+            data,
+            user={'username': username, 'is_admin': user['admin']},
+            favorites=favorites,
+            periods=SCHOOL_PERIODS,
+        ))
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/image_jobs')
+def api_image_jobs():
+    """
+    Returns the state of background image conversions, selected by
+    ?item=<item id> or ?ids=<job id>,<job id>. Once a job is 'done', 'result'
+    holds the file name of the optimised image that replaced the upload.
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    item_id = request.args.get('item')
+    job_ids = [j for j in request.args.get('ids', '').split(',') if j]
+    if not item_id and not job_ids:
+        return jsonify({'error': 'item or ids required', 'jobs': []}), 400
+    try:
+        jobs = image_jobs.get_jobs(item_id=item_id, job_ids=job_ids)
+        pending = sum(1 for j in jobs if j['status'] in ('queued', 'running'))
+        return jsonify({'jobs': jobs, 'pending': pending})
+    except Exception as e:
+        return jsonify({'error': str(e), 'jobs': []}), 500
+
+@app.route('/api/cache_stats')
+def api_cache_stats():
+    """
+    Returns the hit, miss and eviction counters of the item cache of the
+    worker process that answers the request (admins only).
+    """
+    if 'username' not in session or not auth.is_admin():
+        return jsonify({'error': 'Not authorized'}), 403
+    return jsonify({'pid': os.getpid(), 'items': item_cache.stats()})
+
+
+@app.route('/api/notifications')
+def api_notifications():
+    """
+    Long-poll endpoint of the notification channel. The client passes the
+    cursor of the last answer; the request returns as soon as newer events
+    exist or after NOTIFICATION_WAIT_SECONDS with an empty list. Without a
+    cursor it returns the current cursor immediately. If the process has no
+    free long-poll slot, the answer is immediate and carries 'retry_after'.
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    cursor = request.args.get('cursor', type=int)
+    username = session['username']
+    try:
+        result = notifications.wait(cursor, username, auth.is_admin(),
+                                    timeout=NOTIFICATION_WAIT_SECONDS)
+        response = jsonify(result)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e), 'events': []}), 500
+
 """Favorites management endpoints (persistent + session cache)."""
 def _ensure_session_favs():
     if 'favorites' not in session:
@@ -1029,6 +1096,7 @@ def add_fav(item_id):
     if username:
         try:
             us.add_favorite(username, item_id)
+            _forget_bootstrap(username)
         except Exception as e:
             app.logger.warning(f"Persist add favorite failed: {e}")
     session.modified = True
@@ -1042,6 +1110,7 @@ def remove_fav(item_id):
     if username:
         try:
             us.remove_favorite(username, item_id)
+            _forget_bootstrap(username)
         except Exception as e:
             app.logger.warning(f"Persist remove favorite failed: {e}")
     session.modified = True
@@ -1078,7 +1147,7 @@ def upload_item():
         
     # Check if user is an admin
     username = session['username']
-    if not us.check_admin(username):
+    if not auth.is_admin():
         return jsonify({'success': False, 'message': 'Administratorrechte erforderlich'}), 403
         
     # Detect if request is from mobile device
@@ -1524,81 +1593,7 @@ def upload_item():
                 except Exception as e:
                     app.logger.error(f"PNG DEBUG: {image_log_prefix} PNG verification error: {str(e)}")
             
-            # Generate optimized versions (thumbnails and previews)
-            optimization_success = False
-            try:
-                # Log original file size before optimization
-                original_path = os.path.join(app.config['UPLOAD_FOLDER'], saved_filename)
-                original_size = os.path.getsize(original_path)
-                
-                # Get original image dimensions
-                original_dimensions = "unknown"
-                try:
-                    with Image.open(original_path) as img:
-                        original_dimensions = f"{img.width}x{img.height}"
-                        if is_png:
-                            app.logger.info(f"PNG DEBUG: {image_log_prefix} Original PNG dimensions: {original_dimensions}, mode: {img.mode}")
-                except Exception as dim_err:
-                    app.logger.warning(f"{image_log_prefix} Could not get image dimensions: {str(dim_err)}")
-                    if is_png:
-                        app.logger.error(f"PNG DEBUG: {image_log_prefix} Could not get PNG dimensions: {str(dim_err)}")
-                        app.logger.error(f"PNG DEBUG: {image_log_prefix} Error type: {type(dim_err).__name__}")
-                        traceback.print_exc()
-                
-                app.logger.info(f"{image_log_prefix} Starting optimization for {saved_filename} ({original_size/1024:.1f}KB, {original_dimensions})")
-                
-                # PNG-specific optimization options
-                if is_png:
-                    app.logger.info(f"PNG DEBUG: {image_log_prefix} Starting PNG optimization")
-                    # For PNGs, we might need different parameters
-                    optimization_result = generate_optimized_versions(
-                        saved_filename, 
-                        max_original_width=500, 
-                        target_size_kb=100,  # Higher target for PNGs to maintain transparency
-                        debug_prefix=f"PNG DEBUG: {image_log_prefix}"
-                    )
-                else:
-                    # Standard optimization for non-PNG images
-                    optimization_result = generate_optimized_versions(saved_filename, max_original_width=500, target_size_kb=80)
-                
-                # Log file size after optimization
-                if optimization_result['success'] and optimization_result['original']:
-                    optimized_name = optimization_result['original']
-                    optimized_path = os.path.join(app.config['UPLOAD_FOLDER'], optimized_name)
-                    
-                    if os.path.exists(optimized_path):
-                        optimized_size = os.path.getsize(optimized_path)
-                        reduction = (1 - (optimized_size / original_size)) * 100 if original_size > 0 else 0
-                        
-                        # Get optimized dimensions
-                        optimized_dimensions = "unknown"
-                        try:
-                            with Image.open(optimized_path) as img:
-                                optimized_dimensions = f"{img.width}x{img.height}"
-                        except Exception as dim_err:
-                            app.logger.warning(f"{image_log_prefix} Could not get optimized dimensions: {str(dim_err)}")
-                            
-                        app.logger.info(
-                            f"{image_log_prefix} Optimization results:\n"
-                            f"  File: {saved_filename} → {optimized_name}\n"
-                            f"  Size: {original_size/1024:.1f}KB → {optimized_size/1024:.1f}KB ({reduction:.1f}% reduction)\n"
-                            f"  Dimensions: {original_dimensions} → {optimized_dimensions}"
-                        )
-                        
-                        # Use the optimized filename
-                        saved_filename = optimized_name
-                    else:
-                        app.logger.warning(f"{image_log_prefix} Optimized file reported success but not found: {optimized_path}")
-                else:
-                    app.logger.warning(f"{image_log_prefix} Optimization failed or returned no file")
-            except Exception as e:
-                app.logger.error(f"{image_log_prefix} Optimization failed: {str(e)}")
-                traceback.print_exc()
-                
-                # No fallback thumbnail generation needed as we only use the main image
-            
-            # Always add the filename to our list even if optimization failed
-            # We'll use the original in that case
+            # The WebP conversion runs in the image worker pool once the item exists
             image_filenames.append(saved_filename)
             processed_count += 1
             app.logger.info(f"{image_log_prefix} Successfully processed")
@@ -1633,7 +1628,7 @@ def upload_item():
                 f"{name_part}.png",  # In case it was saved as PNG
             ]
             
-            possible_paths = []
+            possible_paths = [media_store.path_for(dup_img)] if media_store.is_stored(dup_img) else []
             for filename in possible_filenames:
                 possible_paths.extend([
                     os.path.join(dev_upload_path, filename),  # Development upload path
@@ -1710,40 +1705,17 @@ def upload_item():
                 _, ext_part = os.path.splitext(dup_img) if dup_img else '.jpg'
                 new_filename = f"{unique_id}_{timestamp}{ext_part}"
                 
-                # If we found the image, copy it
+                # If we found the image, reference it in the media store
                 if found_image:
                     dup_img, src_path = found_image
-                    app.logger.info(f"Copying image {i+1}/{original_count} from {src_path} to {new_filename}")
-                    
-                    # Copy the image file to the new name
-                    dst_path = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
-                    
-                    # Make sure the target directory exists
-                    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-                    
-                    # Copy the file
-                    shutil.copy2(src_path, dst_path)
-                    
-                    # Verify the file was copied successfully
-                    if os.path.exists(dst_path):
-                        app.logger.info(f"Successfully copied image to {dst_path}")
+                    if media_store.is_stored(dup_img):
+                        # Stored images are shared; the copy is only another reference
+                        media_store.add_refs([dup_img])
+                        new_filename = dup_img
                     else:
-                        app.logger.error(f"Failed to copy image to {dst_path}")
-                        # If copy fails, use placeholder
-                        raise Exception("Copy failed - will use placeholder")
-                    
-                    # Generate optimized versions (thumbnails and previews) for the new copy
-                    try:
-                        result = generate_optimized_versions(new_filename, max_original_width=500, target_size_kb=80)
-                        app.logger.info(f"Generated optimized versions: {result}")
-                        if result['success'] and result['original']:
-                            new_filename = result['original']
-                    except Exception as e:
-                        app.logger.error(f"Error generating optimized versions for {new_filename}: {e}")
-                        # If optimization fails, at least keep the original file
-                        result = {'original': new_filename}
-                        traceback.print_exc()
-                
+                        new_filename = media_store.ingest(src_path, move=False)
+                    app.logger.info(f"Referenced image {i+1}/{original_count} {dup_img} as {new_filename}")
+
                 # If we didn't find the image, use a placeholder
                 else:
                     app.logger.warning(f"Using placeholder for image {i+1}/{original_count} (original: {dup_img})")
@@ -1797,22 +1769,16 @@ def upload_item():
     # Handle book cover image if provided
     if book_cover_image:
         # Verify the book cover image exists
-        full_path = os.path.join(app.config['UPLOAD_FOLDER'], book_cover_image)
+        full_path = media_store.path_for(book_cover_image)
         if os.path.exists(full_path) and os.path.isfile(full_path):
-            # Create a unique filename for the book cover
-            unique_id = str(uuid.uuid4())
-            timestamp = time.strftime("%Y%m%d%H%M%S")
-            _, ext_part = os.path.splitext(book_cover_image)
-            
-            new_filename = f"{unique_id}_{timestamp}_book_cover{ext_part}"
-            new_path = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
-            
-            # Copy the file to the new unique name
-            shutil.copy2(full_path, new_path)
-            
-            # Use the new filename instead
+            if media_store.is_stored(book_cover_image):
+                media_store.add_refs([book_cover_image])
+                new_filename = book_cover_image
+            else:
+                new_filename = media_store.ingest(full_path, move=False)
+
             image_filenames.append(new_filename)
-            app.logger.info(f"Copied book cover from {book_cover_image} to {new_filename}")
+            app.logger.info(f"Referenced book cover {book_cover_image} as {new_filename}")
         else:
             app.logger.warning(f"Book cover image not found: {book_cover_image}")
     
@@ -1826,17 +1792,23 @@ def upload_item():
     
     reservierbar = 'reservierbar' in request.form
 
+    # Images shared with other items already have their variants
+    known_variants = media_store.get_variants(image_filenames)
+
     # Add the item to the database
     item_id = it.add_item(name, ort, beschreibung, image_filenames, filter_upload, 
                         filter_upload2, filter_upload3, 
                         anschaffungs_jahr[0] if anschaffungs_jahr else None, 
                         anschaffungs_kosten[0] if anschaffungs_kosten else None,
                         code_4[0] if code_4 else None,
-                        reservierbar=reservierbar)
+                        reservierbar=reservierbar,
+                        image_variants={image_jobs.variant_key(f): v for f, v in known_variants.items()})
     
     if item_id:
     # Create QR code for the item (deactivated)
     # create_qr_code(str(item_id))
+        job_ids = image_jobs.enqueue(item_id, [f for f in image_filenames if f not in known_variants],
+                                     user=session.get('username'))
         success_msg = 'Element wurde erfolgreich hinzugefügt'
         
         if is_mobile:
@@ -1850,7 +1822,8 @@ def upload_item():
                     'skipped': skipped_count,
                     'duplicates': len(duplicate_images) if duplicate_images else 0,
                     'totalImages': len(image_filenames)
-                }
+                },
+                'imageJobs': job_ids
             })
         else:
             flash(success_msg, 'success')
@@ -1881,7 +1854,7 @@ def duplicate_item():
         
         # Check if user is admin
         username = session['username']
-        if not us.check_admin(username):
+        if not auth.is_admin():
             return jsonify({'success': False, 'message': 'Keine Administratorrechte'}), 403
         
         # Detect if request is from mobile device
@@ -1921,7 +1894,7 @@ def duplicate_item():
         
         if is_mobile:
             for img in images:
-                img_path = os.path.join(app.config['UPLOAD_FOLDER'], img)
+                img_path = media_store.path_for(img, app.config['UPLOAD_FOLDER'])
                 if os.path.exists(img_path) and os.path.isfile(img_path):
                     verified_images.append(img)
                 else:
@@ -1938,7 +1911,7 @@ def duplicate_item():
             # Check if images exist (we now use main images as thumbnails)
             images_exist = []
             for img in verified_images[:5]:  # Only check first 5 to save time
-                img_path = os.path.join(app.config['UPLOAD_FOLDER'], img)
+                img_path = media_store.path_for(img, app.config['UPLOAD_FOLDER'])
                 if os.path.exists(img_path):
                     images_exist.append(True)
                 else:
@@ -1976,6 +1949,7 @@ def duplicate_item():
 
 
 @app.route('/delete_item/<id>', methods=['POST', 'GET'])
+@auth.admin_required
 def delete_item(id):
     """
     Route for deleting inventory items.
@@ -1986,14 +1960,6 @@ def delete_item(id):
     Returns:
         flask.Response: Redirect to admin homepage
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
-    
     # Delete associated images first
     item_to_delete = it.get_item(id)
     if not item_to_delete:
@@ -2021,6 +1987,7 @@ def delete_item(id):
 
 
 @app.route('/edit_item/<id>', methods=['POST'])
+@auth.admin_required
 def edit_item(id):
     """
     Route for editing an existing inventory item.
@@ -2031,13 +1998,6 @@ def edit_item(id):
     Returns:
         flask.Response: Redirect to admin homepage with status message
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     # Strip whitespace from all text fields
     name = sanitize_form_value(request.form.get('name'))
     ort = sanitize_form_value(request.form.get('ort'))
@@ -2080,6 +2040,7 @@ def edit_item(id):
     new_images = request.files.getlist('new_images')
     
     # Process any new image uploads
+    new_filenames = []
     for image in new_images:
         if image and image.filename:
             is_allowed, error_message = allowed_file(image.filename)
@@ -2096,15 +2057,8 @@ def edit_item(id):
                 
                 image.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
                 
-                # Optimize the image
-                try:
-                    opt_result = generate_optimized_versions(filename, max_original_width=500, target_size_kb=80)
-                    if opt_result['success'] and opt_result['original']:
-                        filename = opt_result['original']
-                except Exception as e:
-                    app.logger.error(f"Error optimizing image in edit_item: {e}")
-                
                 images.append(filename)
+                new_filenames.append(filename)
             else:
                 flash(error_message, 'error')
                 return redirect(url_for('home_admin'))
@@ -2122,6 +2076,10 @@ def edit_item(id):
     )
     
     if result:
+        removed_images = [img for img in original_images if img not in images]
+        if removed_images:
+            delete_item_images(removed_images)
+        image_jobs.enqueue(id, new_filenames, user=session.get('username'))
         flash('Element erfolgreich aktualisiert', 'success')
     else:
         flash('Fehler beim Aktualisieren des Elements', 'error')
@@ -2142,6 +2100,7 @@ def get_ausleihungen():
 
 
 @app.route('/ausleihen/<id>', methods=['POST'])
+@auth.login_required
 def ausleihen(id):
     """
     Route for borrowing an item from inventory.
@@ -2152,10 +2111,6 @@ def ausleihen(id):
     Returns:
         flask.Response: Redirect to appropriate homepage
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     item = it.get_item(id)
     if not item:
         flash('Element nicht gefunden', 'error')
@@ -2273,12 +2228,13 @@ def ausleihen(id):
         
         flash(f'{exemplare_count} Exemplare erfolgreich ausgeliehen', 'success')
     
-    if 'username' in session and not us.check_admin(session['username']):
+    if not auth.is_admin():
         return redirect(url_for('home'))
     return redirect(url_for('home_admin'))
 
 
 @app.route('/zurueckgeben/<id>', methods=['POST'])
+@auth.login_required
 def zurueckgeben(id): 
     """
     Route for returning a borrowed item.
@@ -2290,10 +2246,6 @@ def zurueckgeben(id):
     Returns:
         flask.Response: Redirect to appropriate homepage
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     item = it.get_item(id)
     if not item:
         flash('Element nicht gefunden', 'error')
@@ -2303,12 +2255,11 @@ def zurueckgeben(id):
     
     print("Code 1169: zurueckgeben called with item ID:", id)
 
-    if not item.get('Verfuegbar', True) and (us.check_admin(session['username']) or item.get('User') == username):
+    if not item.get('Verfuegbar', True) and (auth.is_admin() or item.get('User') == username):
         print("Code 1172: Item is not available, proceeding with return")
         try:
             # Get ALL active borrowing records for this item and complete them
-            client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-            db = client[MONGODB_DB]
+            db = database.get_db()
             ausleihungen = db['ausleihungen']
             
             # Find all active records for this item
@@ -2337,8 +2288,7 @@ def zurueckgeben(id):
                 
                 if result.modified_count > 0:
                     updated_count += 1
-            
-            client.close()
+                    occupancy.release_booking(ausleihung_id)
             
             # Update the item status
             it.update_item_status(id, True, original_user)
@@ -2361,7 +2311,7 @@ def zurueckgeben(id):
     if source_page == 'my_borrowed_items' or '/my_borrowed_items' in referrer:
         return redirect(url_for('my_borrowed_items'))
     
-    if 'username' in session and not us.check_admin(session['username']):
+    if not auth.is_admin():
         return redirect(url_for('home'))
     return redirect(url_for('home_admin'))
 
@@ -2373,7 +2323,8 @@ def get_filter():
     Returns:
         dict: Dictionary of available filters
     """
-    return it.get_filters()
+    return payloads.respond(('get_filter',), item_cache.version(),
+                            lambda: payloads.dumps(it.get_filters()))
     
 
 @app.route('/get_ausleihung_by_item/<id>')
@@ -2403,7 +2354,7 @@ def get_ausleihung_by_item_route(id):
     
     # Admin users can see all borrowing details
     # Regular users can only see their own borrowings
-    if ausleihung and (us.check_admin(session['username']) or ausleihung.get('User') == session['username']):
+    if ausleihung and (auth.is_admin() or ausleihung.get('User') == session['username']):
         return {'ausleihung': ausleihung, 'status': 'success'}
     
     # Get item name for better error message
@@ -2423,12 +2374,11 @@ def get_planned_bookings(item_id):
     """
     Return all planned bookings for a given item (admin only).
     """
-    if 'username' not in session or not us.check_admin(session['username']):
+    if 'username' not in session or not auth.is_admin():
         return jsonify({'ok': False, 'error': 'unauthorized'}), 403
 
     try:
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         cursor = ausleihungen.find({'Item': item_id, 'Status': 'planned'}).sort('Start', 1)
         bookings = []
@@ -2441,7 +2391,6 @@ def get_planned_bookings(item_id):
                 'end': r.get('End').isoformat() if r.get('End') else None,
                 'notes': r.get('Notes', '')
             })
-        client.close()
         return jsonify({'ok': True, 'bookings': bookings})
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -2456,10 +2405,10 @@ def get_planned_bookings_public(item_id):
         return jsonify({'ok': False, 'error': 'unauthorized'}), 401
 
     try:
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
-        cursor = ausleihungen.find({'Item': item_id, 'Status': 'planned'}).sort('Start', 1)
+        cursor = ausleihungen.find({'Item': item_id, 'Status': 'planned'},
+                                   {'Period': 1, 'Start': 1, 'End': 1}).sort('Start', 1)
         bookings = []
         for r in cursor:
             bookings.append({
@@ -2467,8 +2416,9 @@ def get_planned_bookings_public(item_id):
                 'start': r.get('Start').isoformat() if r.get('Start') else None,
                 'end': r.get('End').isoformat() if r.get('End') else None
             })
-        client.close()
-        return jsonify({'ok': True, 'bookings': bookings})
+        # Bookings have many writers, so the ETag is derived from the body
+        return payloads.respond(('planned_bookings', item_id), None,
+                                lambda: payloads.dumps({'ok': True, 'bookings': bookings}))
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
 
@@ -2504,34 +2454,22 @@ def check_availability():
         if not start_times or not end_times:
             return jsonify({'ok': False, 'error': 'invalid period(s)'}), 400
         req_start = start_times['start']
-        req_end = end_times['end']
 
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         items_col = db['items']
 
-        # Collect potential conflicts (planned and active) for this day
-        same_day_start = datetime.datetime.combine(booking_date.date(), datetime.time.min)
-        same_day_end = datetime.datetime.combine(booking_date.date(), datetime.time.max)
-        candidates = list(ausleihungen.find({
-            'Item': item_id,
-            'Status': {'$in': ['planned', 'active']},
-            'Start': {'$lte': same_day_end},
-            'End': {'$gte': same_day_start}
-        }))
+        # Bit test against the item's period occupancy of that day
+        req_mask = occupancy.periods_mask(range(start_num, end_num + 1))
+        day_doc = occupancy.get_day(item_id, booking_date)
+        conflict_ids = occupancy.conflicting_bookings(day_doc, req_mask, item_id, occupancy.item_capacity(item_id))
 
         conflicts = []
-        for r in candidates:
-            r_start = r.get('Start')
-            r_end = r.get('End')
-            # If end missing for active, assume lasts through the day
-            if r_end is None:
-                r_end = same_day_end
-            if r_start is None:
-                r_start = same_day_start
-            # Overlap check: req_start < r_end and req_end > r_start
-            if req_start < r_end and req_end > r_start:
+        if conflict_ids:
+            # Only load booking details when there actually is a conflict
+            for r in ausleihungen.find({'_id': {'$in': [ObjectId(cid) for cid in conflict_ids]}}):
+                r_start = r.get('Start')
+                r_end = r.get('End')
                 conflicts.append({
                     'id': str(r.get('_id')),
                     'status': r.get('Status'),
@@ -2548,12 +2486,100 @@ def check_availability():
             if req_start.date() == now.date():
                 conflicts.append({'status': 'active', 'user': item_doc.get('User'), 'start': None, 'end': None, 'period': None, 'id': None})
 
-        client.close()
         return jsonify({'ok': True, 'available': len(conflicts) == 0, 'conflicts': conflicts})
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
 
 
+AVAILABILITY_MAX_ITEMS = 200
+AVAILABILITY_MAX_DAYS = 31
+
+
+@app.route('/api/availability_matrix', methods=['GET', 'POST'])
+def availability_matrix():
+    """
+    Availability of many items over a date range, per school period.
+    Parameters (JSON body or query string): item_ids (list, repeated or comma separated),
+    start=YYYY-MM-DD, end=YYYY-MM-DD (inclusive, default start).
+    Returns: { ok, days:[...], periods:[...], items: { <id>: { name, exemplare,
+               days: { <date>: { <period>: {status, booked, free} } } } } }
+    with status 'free', 'partial' (some exemplars booked) or 'booked'.
+    """
+    if 'username' not in session:
+        return jsonify({'ok': False, 'error': 'unauthorized'}), 401
+
+    params = request.get_json(silent=True) or request.values
+    if params is request.values:
+        # ?item_ids=a,b as well as repeated ?item_ids=a&item_ids=b
+        item_ids = params.getlist('item_ids')
+    else:
+        item_ids = params.get('item_ids') or []
+    if isinstance(item_ids, str):
+        item_ids = [item_ids]
+    item_ids = [i for value in item_ids for i in str(value).split(',') if i]
+    start_str = params.get('start')
+    end_str = params.get('end') or start_str
+    if not item_ids or not start_str:
+        return jsonify({'ok': False, 'error': 'missing parameters'}), 400
+    if len(item_ids) > AVAILABILITY_MAX_ITEMS:
+        return jsonify({'ok': False, 'error': f'at most {AVAILABILITY_MAX_ITEMS} items'}), 400
+
+    try:
+        start_date = datetime.datetime.strptime(start_str, '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(end_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'ok': False, 'error': 'invalid date'}), 400
+    if end_date < start_date:
+        start_date, end_date = end_date, start_date
+    if (end_date - start_date).days >= AVAILABILITY_MAX_DAYS:
+        return jsonify({'ok': False, 'error': f'at most {AVAILABILITY_MAX_DAYS} days'}), 400
+
+    try:
+        days = [(start_date + datetime.timedelta(days=n)).isoformat()
+                for n in range((end_date - start_date).days + 1)]
+        periods = sorted(int(p) for p in SCHOOL_PERIODS.keys())
+
+        # Item names and exemplar counts, then the occupancy of all items and days
+        items_by_id = it.get_items_by_ids(item_ids, fields=('Name', 'Exemplare'))
+        occupancy_by_item = occupancy.get_range(item_ids, start_date, end_date)
+
+        result = {}
+        for item_id in item_ids:
+            item_doc = items_by_id.get(str(item_id))
+            if not item_doc:
+                continue
+            parent_id = it.get_parent_item_id(item_id)
+            try:
+                exemplare = max(1, int(item_doc.get('Exemplare', 1) or 1))
+            except (TypeError, ValueError):
+                exemplare = 1
+
+            item_days = {}
+            for day in days:
+                counts = occupancy.period_counts(occupancy_by_item.get(parent_id, {}).get(day))
+                day_matrix = {}
+                for period in periods:
+                    booked = min(counts.get(period, 0), exemplare)
+                    if booked == 0:
+                        status = 'free'
+                    elif booked < exemplare:
+                        status = 'partial'
+                    else:
+                        status = 'booked'
+                    day_matrix[str(period)] = {'status': status, 'booked': booked, 'free': exemplare - booked}
+                item_days[day] = day_matrix
+
+            result[str(item_id)] = {
+                'name': item_doc.get('Name', ''),
+                'exemplare': exemplare,
+                'days': item_days
+            }
+
+        return jsonify({'ok': True, 'days': days, 'periods': periods, 'items': result})
+    except Exception as e:
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+
 # def create_qr_code(id):
 #     """
 #     Generate a QR code for an item.
@@ -2683,6 +2709,14 @@ def plan_booking():
         booking_ids = []
         errors = []
         
+        # Load the item's period occupancy for all requested days at once
+        booking_days = []
+        current_date = start_date
+        while current_date <= end_date:
+            booking_days.append(current_date)
+            current_date += datetime.timedelta(days=1)
+        day_occupancy = occupancy.get_days(item_id, booking_days)
+        
         # If it's a range of days
         if booking_type == 'range' and start_date != end_date:
             current_date = start_date
@@ -2692,7 +2726,8 @@ def plan_booking():
                     item_id, 
                     current_date,
                     periods,
-                    notes
+                    notes,
+                    day_occupancy
                 )
                 booking_ids.extend(day_booking_ids)
                 errors.extend(day_errors)
@@ -2705,7 +2740,8 @@ def plan_booking():
                 item_id,
                 start_date,
                 periods,
-                notes
+                notes,
+                day_occupancy
             )
             
         # Return results
@@ -2731,7 +2767,7 @@ def plan_booking():
         traceback.print_exc()
         return {"success": False, "error": f"Serverfehler: {str(e)}"}, 500
 
-def process_day_bookings(item_id, booking_date, periods, notes):
+def process_day_bookings(item_id, booking_date, periods, notes, day_occupancy=None):
     """
     Helper function to process bookings for a single day across multiple periods
     
@@ -2740,12 +2776,17 @@ def process_day_bookings(item_id, booking_date, periods, notes):
         booking_date: The date for the booking
         periods: List of period numbers to book
         notes: Booking notes
+        day_occupancy: Preloaded occupancy of the item (occupancy.get_days),
+            new bookings are added to it
         
     Returns:
         tuple: (list of booking_ids, list of errors)
     """
     booking_ids = []
     errors = []
+    if day_occupancy is None:
+        day_occupancy = occupancy.get_days(item_id, [booking_date])
+    capacity = occupancy.item_capacity(item_id)
     
     for period in periods:
         # Get period times
@@ -2758,8 +2799,8 @@ def process_day_bookings(item_id, booking_date, periods, notes):
         start_time = period_times.get('start')
         end_time = period_times.get('end')
         
-        # Check for conflicts
-        if au.check_booking_conflict(item_id, start_time, end_time, period):
+        # Check for conflicts with a bit test on the day's occupancy
+        if occupancy.check_conflict(item_id, start_time, end_time, period, days=day_occupancy, capacity=capacity):
             errors.append(f"Conflict for period {period} on {booking_date.strftime('%Y-%m-%d')}")
             continue
             
@@ -2775,6 +2816,8 @@ def process_day_bookings(item_id, booking_date, periods, notes):
         
         if booking_id:
             booking_ids.append(str(booking_id))
+            occupancy.add_to_days(day_occupancy, {'_id': booking_id, 'Item': item_id, 'Start': start_time,
+                                                  'End': end_time, 'Period': period})
         else:
             errors.append(f"Failed to create booking for period {period}")
             
@@ -2827,21 +2870,18 @@ def add_booking():
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/cancel_booking/<id>', methods=['POST'])
+@auth.login_required
 def cancel_booking(id):
     """
     Cancel a planned booking
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     # Get the booking
     booking = au.get_booking(id)
     if not booking:
         return {"success": False, "error": "Booking not found"}, 404
         
     # Check if user owns this booking
-    if booking.get('User') != session['username'] and not us.check_admin(session['username']):
+    if booking.get('User') != session['username'] and not auth.is_admin():
                return {"success": False, "error": "Not authorized to cancel this booking"}, 403
     
     # Cancel the booking
@@ -2881,19 +2921,14 @@ def terminplan():
 '''-------------------------------------------------------------------------------------------------------------ADMIN ROUTES------------------------------------------------------------------------------------------------------------------'''
 
 @app.route('/register', methods=['GET', 'POST'])
+@auth.admin_required
 def register():
     """
     User registration route.false
     Returns:
         flask.Response: Rendered template or redirect
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if 'username' in session and us.check_admin(session['username']):
+    if auth.is_admin():
         if request.method == 'POST':
             username = request.form['username']
             password = request.form['password']
@@ -2916,6 +2951,7 @@ def register():
 
 
 @app.route('/user_del', methods=['GET'])
+@auth.admin_required
 def user_del():
     """
     User deletion interface.
@@ -2925,13 +2961,6 @@ def user_del():
     Returns:
         flask.Response: Rendered template with user list or redirect
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     all_users = us.get_all_users()
 
     users_list = []
@@ -2970,6 +2999,7 @@ def user_del():
 
 
 @app.route('/delete_user', methods=['POST'])
+@auth.admin_required
 def delete_user():
     """
     Process user deletion request.
@@ -2979,13 +3009,6 @@ def delete_user():
     Returns:
         flask.Response: Redirect to the user deletion interface with status
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     username = request.form.get('username')
     if not username:
         flash('Kein Benutzer ausgewählt', 'error')
@@ -2998,12 +3021,17 @@ def delete_user():
     
     # Reset this user's borrowings and free items before deleting the user
     try:
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         items_col = db['items']
         now = datetime.datetime.now()
 
+        # Release the period occupancy of all open borrowings of this user
+        open_ids = [r['_id'] for r in ausleihungen.find(
+            {'User': username, 'Status': {'$in': ['active', 'planned']}}, {'_id': 1}
+        )]
+        occupancy.release_bookings(open_ids)
+
         # Complete all active borrowings of this user
         ausleihungen.update_many(
             {'User': username, 'Status': 'active'},
@@ -3021,8 +3049,8 @@ def delete_user():
             {'User': username},
             {'$set': {'Verfuegbar': True, 'LastUpdated': now}, '$unset': {'User': ""}}
         )
+        item_cache.changed()
 
-        client.close()
     except Exception as e:
         flash(f'Warnung: Ausleihungen/Reservierungen für {username} konnten nicht vollständig zurückgesetzt werden: {str(e)}', 'warning')
 
@@ -3037,18 +3065,13 @@ def delete_user():
 
 
 @app.route('/admin/borrowings')
+@auth.admin_required
 def admin_borrowings():
     """
     Admin view: list all active and planned borrowings with ability to reset.
     """
-    if 'username' not in session or not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-
-    client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-    db = client[MONGODB_DB]
+    db = database.get_db()
     ausleihungen = db['ausleihungen']
-    items_col = db['items']
 
     # Load active and planned borrowings
     records = list(ausleihungen.find({'Status': {'$in': ['active', 'planned']}}).sort('Start', -1))
@@ -3059,16 +3082,14 @@ def admin_borrowings():
         except Exception:
             return str(dt) if dt else ''
 
+    # Resolve all referenced items with one query instead of one per record
+    items_by_id = it.get_items_by_ids(r.get('Item') for r in records)
+
     entries = []
     for r in records:
-        it_id = r.get('Item')
-        id = it.get_item(it_id)
-        try:
-            item_id = id.get('Code_4')
-            item_name = id.get('Name')
-        except:
-            item_id = None
-            item_name = None
+        item_doc = items_by_id.get(str(r.get('Item')))
+        item_id = item_doc.get('Code_4') if item_doc else None
+        item_name = item_doc.get('Name') if item_doc else None
         entries.append({
             'id': str(r.get('_id')),
             'item_id': str(item_id),
@@ -3081,31 +3102,24 @@ def admin_borrowings():
             'notes': r.get('Notes', '')
         })
 
-    client.close()
-
     return render_template('admin_borrowings.html', entries=entries)
 
 
 @app.route('/admin/reset_borrowing/<borrow_id>', methods=['POST'])
+@auth.admin_required
 def admin_reset_borrowing(borrow_id):
     """
     Admin action: reset a single borrowing.
     - If active: complete it and free the item
     - If planned: cancel it
     """
-    if 'username' not in session or not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-
     try:
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         items_col = db['items']
 
         rec = ausleihungen.find_one({'_id': ObjectId(borrow_id)})
         if not rec:
-            client.close()
             flash('Ausleihung nicht gefunden', 'error')
             return redirect(url_for('admin_borrowings'))
 
@@ -3116,20 +3130,22 @@ def admin_reset_borrowing(borrow_id):
         now = datetime.datetime.now()
         if status == 'active':
             ausleihungen.update_one({'_id': rec['_id']}, {'$set': {'Status': 'completed', 'End': now, 'LastUpdated': now}})
+            occupancy.release_booking(rec['_id'])
             # Free the item
             if item_id:
                 try:
                     items_col.update_one({'_id': ObjectId(item_id)}, {'$set': {'Verfuegbar': True, 'LastUpdated': now}, '$unset': {'User': ""}})
+                    item_cache.changed([item_id])
                 except Exception:
                     pass
             flash('Aktive Ausleihe wurde zurückgesetzt (abgeschlossen).', 'success')
         elif status == 'planned':
             ausleihungen.update_one({'_id': rec['_id']}, {'$set': {'Status': 'cancelled', 'LastUpdated': now}})
+            occupancy.release_booking(rec['_id'])
             flash('Geplante Ausleihe wurde storniert.', 'success')
         else:
             flash('Diese Ausleihe ist weder aktiv noch geplant.', 'warning')
 
-        client.close()
     except Exception as e:
         flash(f'Fehler beim Zurücksetzen: {str(e)}', 'error')
 
@@ -3137,6 +3153,7 @@ def admin_reset_borrowing(borrow_id):
 
 
 @app.route('/admin_reset_user_password', methods=['POST'])
+@auth.admin_required
 def admin_reset_user_password():
     """
     Admin route to reset a user's password.
@@ -3146,14 +3163,6 @@ def admin_reset_user_password():
     Returns:
         flask.Response: Redirect to user management page with status message
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adresse zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-        
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adresse zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     username = request.form.get('username')
     new_password = html.escape(request.form.get('new_password', 'Password123'))  # Default temporary password
     
@@ -3190,7 +3199,7 @@ def admin_update_user_name():
     Returns:
         flask.Response: Redirect to user management page
     """
-    if 'username' not in session or not us.check_admin(session['username']):
+    if 'username' not in session or not auth.is_admin():
         flash('Nicht autorisierter Zugriff', 'error')
         return redirect(url_for('login'))
         
@@ -3210,94 +3219,224 @@ def admin_update_user_name():
     return redirect(url_for('user_del'))
 
 
+LOG_PAGE_SIZE = 50
+LOG_EXPORT_BATCH = 500
+LOG_EXPORT_FIELDS = ['Item', 'User', 'Status', 'Start', 'End', 'Duration', 'ConflictDetected', 'ConflictNote', 'id']
+
+
+def _log_filters_from_request():
+    """
+    Read the log filters (status, user, item, date range) from the query string.
+
+    Returns:
+        tuple: (MongoDB query, dict of the raw filter values for the template)
+    """
+    filters = {
+        'status': request.args.get('status', '').strip(),
+        'user': request.args.get('user', '').strip(),
+        'item': request.args.get('item', '').strip(),
+        'from': request.args.get('from', '').strip(),
+        'to': request.args.get('to', '').strip(),
+    }
+
+    status = None
+    if filters['status']:
+        status = [s for s in filters['status'].split(',') if s]
+
+    item_ids = it.find_item_ids(filters['item']) if filters['item'] else None
+
+    date_from = None
+    date_to = None
+    try:
+        if filters['from']:
+            date_from = datetime.datetime.strptime(filters['from'], '%Y-%m-%d')
+        if filters['to']:
+            # Inclusive end date: everything starting before the following day
+            date_to = datetime.datetime.strptime(filters['to'], '%Y-%m-%d') + datetime.timedelta(days=1)
+    except ValueError:
+        pass
+
+    query = au.build_log_query(
+        status=status,
+        user=filters['user'] or None,
+        item_ids=item_ids,
+        date_from=date_from,
+        date_to=date_to
+    )
+    return query, filters
+
+
+def _format_log_entry(ausleihung, items_by_id):
+    """
+    Format a single ausleihung for the log view and exports.
+
+    Args:
+        ausleihung (dict): Ausleihung record
+        items_by_id (dict): Items resolved via it.get_items_by_ids
+
+    Returns:
+        dict: Display values of the record
+    """
+    item = items_by_id.get(str(ausleihung.get('Item')))
+    item_name = item.get('Name', 'Unknown Item') if item else 'Unknown Item'
+    username = ausleihung.get('User', 'Unknown User')
+
+    # Determine (verified) status for display
+    try:
+        display_status = au.get_current_status(ausleihung)
+    except Exception:
+        display_status = ausleihung.get('Status', 'unknown')
+
+    # Format dates for display
+    start_date = ausleihung.get('Start')
+    if isinstance(start_date, datetime.datetime):
+        start_date = start_date.strftime('%Y-%m-%d %H:%M')
+
+    end_date = ausleihung.get('End', 'Not returned')
+    if isinstance(end_date, datetime.datetime):
+        end_date = end_date.strftime('%Y-%m-%d %H:%M')
+
+    # Calculate duration
+    duration = 'N/A'
+    if isinstance(ausleihung.get('Start'), datetime.datetime) and isinstance(ausleihung.get('End'), datetime.datetime):
+        duration_td = ausleihung['End'] - ausleihung['Start']
+        hours, remainder = divmod(duration_td.seconds, 3600)
+        minutes, _ = divmod(remainder, 60)
+        if duration_td.days > 0:
+            duration = f"{duration_td.days}d {hours}h {minutes}m"
+        else:
+            duration = f"{hours}h {minutes}m"
+
+    return {
+        'Item': item_name,
+        'User': username,
+        'Start': start_date,
+        'End': end_date,
+        'Duration': duration,
+        'Status': display_status,
+        'id': str(ausleihung['_id']),
+        'ConflictDetected': ausleihung.get('ConflictDetected', False),
+        'ConflictNote': ausleihung.get('ConflictNote', ''),
+    }
+
+
+def _format_log_page(records):
+    """Format a page of ausleihungen, resolving all items with one query."""
+    items_by_id = it.get_items_by_ids(r.get('Item') for r in records)
+    formatted_items = []
+    for ausleihung in records:
+        try:
+            formatted_items.append(_format_log_entry(ausleihung, items_by_id))
+        except Exception:
+            continue
+    return formatted_items
+
+
+def _iter_log_entries(query):
+    """
+    Yield formatted log entries for a query without materialising the result.
+    Items are resolved per batch, so memory stays bounded by LOG_EXPORT_BATCH.
+    """
+    batch = []
+    for ausleihung in au.iter_ausleihungen(query, batch_size=LOG_EXPORT_BATCH):
+        batch.append(ausleihung)
+        if len(batch) >= LOG_EXPORT_BATCH:
+            yield from _format_log_page(batch)
+            batch = []
+    if batch:
+        yield from _format_log_page(batch)
+
+
 @app.route('/logs')
+@auth.admin_required
 def logs():
     """
     View system logs interface.
-    Displays a history of all item borrowings with detailed information.
+    Displays a page of the borrowing history (newest first) with server-side
+    filters for status, user, item and date range.
     
     Returns:
         flask.Response: Rendered template with logs or redirect if not authenticated
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-        
-    # Get ausleihungen
-    all_ausleihungen = au.get_ausleihungen()
-    
-    formatted_items = []
-    for ausleihung in all_ausleihungen:
-        try:
-            # Get item details - from sample data, Item is an ID
-            item = it.get_item(ausleihung.get('Item'))
-            item_name = item.get('Name', 'Unknown Item') if item else 'Unknown Item'
-            
-            # Get user details - from sample data, User is a username string
-           
+    query, filters = _log_filters_from_request()
+    cursor = request.args.get('cursor')
+    records, next_cursor = au.get_ausleihungen_page(query, cursor=cursor, limit=LOG_PAGE_SIZE)
+    formatted_items = _format_log_page(records)
 
-            username = ausleihung.get('User', 'Unknown User')
-            # Determine (verified) status for display
-            try:
-                display_status = au.get_current_status(ausleihung)
-            except Exception:
-                display_status = ausleihung.get('Status', 'unknown')
-            
-            # Format dates for display
-            start_date = ausleihung.get('Start')
-            if isinstance(start_date, datetime.datetime):
-                start_date = start_date.strftime('%Y-%m-%d %H:%M')
-                
-            end_date = ausleihung.get('End', 'Not returned')
-            if isinstance(end_date, datetime.datetime):
-                end_date = end_date.strftime('%Y-%m-%d %H:%M')
-            
-            # Calculate duration
-            duration = 'N/A'
-            if isinstance(ausleihung.get('Start'), datetime.datetime) and isinstance(ausleihung.get('End'), datetime.datetime):
-                duration_td = ausleihung['End'] - ausleihung['Start']
-                hours, remainder = divmod(duration_td.seconds, 3600)
-                minutes, _ = divmod(remainder, 60)
-                if duration_td.days > 0:
-                    duration = f"{duration_td.days}d {hours}h {minutes}m"
-                else:
-                    duration = f"{hours}h {minutes}m"
-            
-            formatted_items.append({
-                'Item': item_name,
-                'User': username,
-                'Start': start_date,
-                'End': end_date,
-                'Duration': duration,
-                'Status': display_status,
-                'id': str(ausleihung['_id']),
-                'ConflictDetected': ausleihung.get('ConflictDetected', False),
-                'ConflictNote': ausleihung.get('ConflictNote', ''),
-            })
-        except Exception as e:
-            continue
-    
-    return render_template('logs.html', items=formatted_items)
+    return render_template(
+        'logs.html',
+        items=formatted_items,
+        filters=filters,
+        next_cursor=next_cursor,
+        is_first_page=not cursor
+    )
 
 
 @app.route('/get_logs', methods=['GET'])
 def get_logs():
     """
-    API endpoint to retrieve all borrowing logs.
+    API endpoint to retrieve borrowing logs page by page.
+    Accepts the same filters as /logs plus 'cursor' and 'limit' (max. 500).
     
     Returns:
-        dict: Dictionary containing all borrowing records or redirect if not authenticated
+        dict: {'logs': [...], 'next_cursor': str or None} or redirect if not authenticated
     """
     if not session.get('username'):
         return redirect(url_for('login'))
-    logs = au.get_ausleihungen()
-    return logs
+    query, _ = _log_filters_from_request()
+    try:
+        limit = max(1, min(int(request.args.get('limit', LOG_PAGE_SIZE)), 500))
+    except ValueError:
+        limit = LOG_PAGE_SIZE
+    records, next_cursor = au.get_ausleihungen_page(query, cursor=request.args.get('cursor'), limit=limit)
+    return jsonify({'logs': _format_log_page(records), 'next_cursor': next_cursor})
+
+
+@app.route('/logs/export')
+@auth.admin_required
+def export_logs():
+    """
+    Stream the (filtered) borrowing history as CSV or NDJSON.
+    Rows are written while the database cursor yields them.
+    
+    Returns:
+        flask.Response: Streaming download or redirect if not authenticated
+    """
+    query, _ = _log_filters_from_request()
+    export_format = request.args.get('format', 'csv').lower()
+    date_str = datetime.datetime.now().strftime('%Y-%m-%d')
+
+    if export_format == 'ndjson':
+        def generate():
+            for entry in _iter_log_entries(query):
+                yield json.dumps(entry, ensure_ascii=False) + '\n'
+        mimetype = 'application/x-ndjson'
+        filename = f'ausleihungen_{date_str}.ndjson'
+    else:
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=LOG_EXPORT_FIELDS)
+            writer.writeheader()
+            for entry in _iter_log_entries(query):
+                writer.writerow(entry)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            # Header only, if there are no rows at all
+            if buffer.tell():
+                yield buffer.getvalue()
+        mimetype = 'text/csv'
+        filename = f'ausleihungen_{date_str}.csv'
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    # Do not let nginx buffer the whole export
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @app.route('/get_usernames', methods=['GET'])
+@auth.login_required
 def get_usernames():
     """
     API endpoint to retrieve all usernames from the system.
@@ -3306,21 +3445,15 @@ def get_usernames():
     Returns:
         dict: Dictionary containing all users or redirect if not authenticated
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
+    if not auth.is_admin():
         flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
         return redirect(url_for('logout'))
-    elif 'username' in session and us.check_admin(session['username']):
-        return jsonify(us.get_all_users())  # Fixed to use get_all_users
-    else:
-        flash('Bitte melden Sie sich an, um auf diese Funktion zuzugreifen', 'error')
-        return redirect(url_for('login'))  # Added proper return
+    return jsonify(us.get_all_users())
 
 # New routes for filter management
 
 @app.route('/manage_filters')
+@auth.admin_required
 def manage_filters():
     """
 "
@@ -3329,13 +3462,6 @@ def manage_filters():
     Returns:
         flask.Response: Rendered filter management template or redirect
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     # Get predefined filter values
     filter1_values = it.get_predefined_filter_values(1)
     filter2_values = it.get_predefined_filter_values(2)
@@ -3355,7 +3481,7 @@ def add_filter_value(filter_num):
     Returns:
         flask.Response: Redirect to filter management page
     """
-    if 'username' not in session or not us.check_admin(session['username']):
+    if 'username' not in session or not auth.is_admin():
         return jsonify({'success': False, 'error': 'Not authorized'}), 403
     
     value = sanitize_form_value(request.form.get('value'))
@@ -3386,7 +3512,7 @@ def remove_filter_value(filter_num, value):
     Returns:
         flask.Response: Redirect to filter management page
     """
-    if 'username' not in session or not us.check_admin(session['username']):
+    if 'username' not in session or not auth.is_admin():
         return jsonify({'success': False, 'error': 'Not authorized'}), 403
     
     # Remove the value from the filter
@@ -3411,46 +3537,25 @@ def get_predefined_filter_values(filter_num):
     Returns:
         dict: Dictionary containing predefined filter values
     """
-    values = it.get_predefined_filter_values(filter_num)
-    return jsonify({'values': values})
+    return payloads.respond(
+        ('predefined_filter_values', filter_num), payloads.version(metadata.FILTER_PRESETS_VERSION),
+        lambda: payloads.dumps({'values': it.get_predefined_filter_values(filter_num)}))
 
 @app.route('/search_word/<path:word>')
 def search_word(word):
-    """Search items by Titel (Name) and Beschreibung, case-insensitive.
+    """Search items by Name, Beschreibung, Ort, Code_4 and filter values.
 
-    Returns: JSON with list of matching item IDs.
+    Umlauts and ß are folded and words match by prefix, so 'schlues' finds
+    'Schlüssel'. Uses the in-memory index from search.py.
+
+    Returns: JSON with list of matching item IDs, best match first.
     """
     try:
         term = (word or "").strip()
         if not term:
             return jsonify({"success": True, "response": []})
 
-        term_lower = term.lower()
-        id_set = set()
-        for i in it.get_items():
-            beschreibung = i.get("Beschreibung", "")
-            titel = i.get("Name", "")
-            # Normalize Beschreibung to string
-            try:
-                if isinstance(beschreibung, (list, tuple)):
-                    text = " ".join([str(x) for x in beschreibung])
-                else:
-                    text = str(beschreibung)
-            except Exception:
-                text = ""
-
-            # Normalize title
-            try:
-                title_text = str(titel)
-            except Exception:
-                title_text = ""
-
-            if (term_lower in text.lower()) or (term_lower in title_text.lower()):
-                _id = i.get("_id")
-                if _id is not None:
-                    id_set.add(str(_id))
-
-        return jsonify({"success": True, "response": list(id_set)})
+        return jsonify({"success": True, "response": search.search(term)})
     except Exception as e:
         return jsonify({"success": False, "response": str(e)})
 
@@ -3530,7 +3635,7 @@ def download_book_cover():
     """
     if 'username' not in session:
         return jsonify({"error": "Not authorized"}), 403
-    if not us.check_admin(session['username']):
+    if not auth.is_admin():
         return jsonify({"error": "Admin privileges required"}), 403
     
     try:
@@ -3539,7 +3644,16 @@ def download_book_cover():
         
         if not image_url:
             return jsonify({"error": "No image URL provided"}), 400
-        
+
+        # Covers of the same book are only downloaded once
+        stored_name = media_store.find_by_source(image_url)
+        if stored_name:
+            return jsonify({
+                "success": True,
+                "filename": stored_name,
+                "message": "Image already downloaded"
+            })
+
         # Download the image
         response = requests.get(image_url, stream=True, timeout=10)
         
@@ -3577,7 +3691,10 @@ def download_book_cover():
         with open(filepath, 'wb') as f:
             for chunk in response.iter_content(chunk_size=8192):
                 f.write(chunk)
-        
+
+        # The item that uses the cover takes the reference in upload_item
+        filename = media_store.ingest(filepath, move=True, source=image_url, add_reference=False)
+
         return jsonify({
             "success": True,
             "filename": filename,
@@ -3689,8 +3806,7 @@ def my_borrowed_items():
         return redirect(url_for('login', next=request.path))
     
     username = session['username']
-    client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-    db = client[MONGODB_DB]
+    db = database.get_db()
     items_collection = db.items
     ausleihungen_collection = db.ausleihungen
     
@@ -3791,8 +3907,6 @@ def my_borrowed_items():
             
             planned_items.append(item_obj)
     
-    client.close()
-    
     # DEBUG: Log what we're passing to the template
     app.logger.info(f"Passing {len(active_items)} active items and {len(planned_items)} planned items to template")
     if planned_items:
@@ -3814,7 +3928,7 @@ def favicon():
     Returns:
         flask.Response: The favicon.ico file
     """
-    return send_from_directory(app.static_folder, 'favicon.ico')
+    return serving.send('static', 'favicon.ico') or Response("Not found", status=404)
 
 @app.route('/get_predefined_locations')
 def get_predefined_locations_route():
@@ -3824,8 +3938,9 @@ def get_predefined_locations_route():
     Returns:
         dict: Dictionary containing predefined location values
     """
-    values = it.get_predefined_locations()
-    return jsonify({'locations': values})
+    return payloads.respond(
+        ('predefined_locations',), payloads.version(metadata.LOCATIONS_VERSION),
+        lambda: payloads.dumps({'locations': it.get_predefined_locations()}))
 
 @app.route('/add_location_value', methods=['POST'])
 def add_location_value():
@@ -3835,7 +3950,7 @@ def add_location_value():
     Returns:
         flask.Response: Redirect to location management page
     """
-    if 'username' not in session or not us.check_admin(session['username']):
+    if 'username' not in session or not auth.is_admin():
         return jsonify({'success': False, 'error': 'Not authorized'}), 403
     
     value = sanitize_form_value(request.form.get('value'))
@@ -3865,7 +3980,7 @@ def remove_location_value(value):
     Returns:
         flask.Response: Redirect to location management page
     """
-    if 'username' not in session or not us.check_admin(session['username']):
+    if 'username' not in session or not auth.is_admin():
         return jsonify({'success': False, 'error': 'Not authorized'}), 403
     
     # Remove the value from locations
@@ -3879,6 +3994,7 @@ def remove_location_value(value):
     return redirect(url_for('manage_locations'))
 
 @app.route('/manage_locations')
+@auth.admin_required
 def manage_locations():
     """
     Admin page to manage predefined location values.
@@ -3886,13 +4002,6 @@ def manage_locations():
     Returns:
         flask.Response: Rendered location management template or redirect
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    if not us.check_admin(session['username']):
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-    
     # Get predefined location values
     location_values = it.get_predefined_locations()
     
@@ -4013,15 +4122,24 @@ def schedule_appointment():
             booking_period = start_period_num
             booking_period_end = end_period_num
         
-        # Check for conflicts (use full period-range aware check)
+        # Check for conflicts (bit test on the period occupancy, time-based
+        # check only if the window does not touch any school period)
         try:
-            has_conflict = au.check_booking_period_range_conflict(
+            has_conflict = occupancy.check_conflict(
                 item_id,
                 start_datetime,
                 end_datetime,
                 period=booking_period,
                 period_end=booking_period_end
             )
+            if has_conflict is None:
+                has_conflict = au.check_booking_period_range_conflict(
+                    item_id,
+                    start_datetime,
+                    end_datetime,
+                    period=booking_period,
+                    period_end=booking_period_end
+                )
             if has_conflict:
                 return jsonify({'success': False, 'message': 'Termin kollidiert mit bestehender Buchung'}), 409
         except Exception as e:
@@ -4087,6 +4205,7 @@ def schedule_appointment():
         return jsonify({'success': False, 'message': f'Serverfehler aufgetreten: {str(e)}'}), 500
 
 @app.route('/cancel_ausleihung/<id>', methods=['POST'])
+@auth.login_required
 def cancel_ausleihung_route(id):
     """
     Route for canceling a planned or active ausleihung.
@@ -4097,10 +4216,6 @@ def cancel_ausleihung_route(id):
     Returns:
         flask.Response: Redirect to My Ausleihungen page
     """
-    if 'username' not in session:
-        flash('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!', 'error')
-        return redirect(url_for('login'))
-        
     username = session['username']
     
     try:
@@ -4120,7 +4235,7 @@ def cancel_ausleihung_route(id):
         print(f"Found ausleihung: ID={id}, User={ausleihung_user}, Status={ausleihung_status}")
             
         # Check if the ausleihung belongs to the current user
-        if ausleihung_user != username and not us.check_admin(username):
+        if ausleihung_user != username and not auth.is_admin():
             print(f"Authorization failure: {username} attempted to cancel ausleihung belonging to {ausleihung_user}")
             flash('Sie sind nicht berechtigt, diese Ausleihung zu stornieren', 'error')
             return redirect(url_for('my_borrowed_items'))
@@ -4166,7 +4281,7 @@ def reset_item(id):
     if 'username' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
     
-    if not us.check_admin(session['username']):
+    if not auth.is_admin():
         return jsonify({'success': False, 'error': 'Not authorized'}), 403
     
     try:
@@ -4388,279 +4503,6 @@ def create_video_thumbnail(video_path, thumbnail_path, size):
         return False
 
 
-def generate_optimized_versions(filename, max_original_width=500, target_size_kb=80, debug_prefix=""):
-    """
-    Generate optimized version of uploaded files.
-    Convert all image files to WebP format.
-    Also resizes and compresses the original image to save storage space.
-    No separate thumbnail or preview files are generated.
-    
-    Args:
-        filename (str): Name of the uploaded file
-        max_original_width (int): Maximum width for the original image (default: 500px)
-        target_size_kb (int): Target file size in kilobytes (default: 80KB)
-        
-    Returns:
-        dict: Dictionary with paths to generated files
-    """
-    # Create a process ID for logging
-    process_id = str(uuid.uuid4())[:6]
-    log_prefix = f"[Optimize-{process_id}][{filename}]"
-    app.logger.info(f"{log_prefix} Starting optimization")
-    
-    # Make sure all required directories exist
-    for directory in [app.config['UPLOAD_FOLDER']]:
-        os.makedirs(directory, exist_ok=True)
-    
-    original_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    # Fallback to production path if dev path missing
-    if not os.path.exists(original_path):
-        prod_upload = "/var/Inventarsystem/Web/uploads"
-        alt_path = os.path.join(prod_upload, filename)
-        if os.path.exists(alt_path):
-            original_path = alt_path
-    
-    # Generate file paths
-    name_part, ext = os.path.splitext(filename)
-    ext = ext.lower()
-    is_webp_ext = ext == '.webp'
-    
-    # If already a WebP, keep filename to avoid same-file writes
-    converted_filename = filename if is_webp_ext else f"{name_part}.webp"
-    converted_path = os.path.join(app.config['UPLOAD_FOLDER'], converted_filename)
-    
-    result = {
-        'original': converted_filename,  # Use WebP name; if already WebP, this equals input
-        'thumbnail': None,
-        'preview': None,
-        'is_image': False,
-        'is_video': False,
-        'success': False
-    }
-    
-    # Check if the file actually exists
-    if not os.path.exists(original_path):
-        app.logger.error(f"{log_prefix} Original file not found: {original_path}")
-        
-        # Check if we need to use a placeholder
-        placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.svg')
-        if not os.path.exists(placeholder_path):
-            placeholder_path = os.path.join(app.static_folder, 'img', 'no-image.png')
-        # Also check production static dir
-        if not os.path.exists(placeholder_path):
-            prod_static = "/var/Inventarsystem/Web/static/img"
-            fallback_svg = os.path.join(prod_static, 'no-image.svg')
-            fallback_png = os.path.join(prod_static, 'no-image.png')
-            if os.path.exists(fallback_svg):
-                placeholder_path = fallback_svg
-            elif os.path.exists(fallback_png):
-                placeholder_path = fallback_png
-            
-        if os.path.exists(placeholder_path):
-            app.logger.info(f"{log_prefix} Using placeholder image instead")
-            try:
-                # Copy placeholder to uploads folder with the original filename
-                shutil.copy2(placeholder_path, original_path)
-                result['original'] = filename
-                result['is_placeholder'] = True
-                result['success'] = True
-                return result
-            except Exception as e:
-                app.logger.error(f"{log_prefix} Failed to use placeholder: {str(e)}")
-                return result
-        else:
-            app.logger.error(f"{log_prefix} No placeholder found, cannot continue")
-            return result
-    
-    # Check if it's an image or video file
-    is_png = filename.lower().endswith('.png')
-    
-    if is_image_file(filename):
-        result['is_image'] = True
-        app.logger.info(f"{log_prefix} Processing as image file")
-        
-        # Special logging for PNG files
-        if is_png:
-            if debug_prefix:
-                app.logger.info(f"{debug_prefix} Processing PNG in optimization function")
-            else:
-                app.logger.info(f"PNG DEBUG: {log_prefix} Processing PNG in optimization function")
-    elif is_video_file(filename):
-        result['is_video'] = True
-        app.logger.info(f"{log_prefix} Processing as video file")
-        # For videos, we might want to extract a frame as the "image" representation
-        # But for now, we'll just leave it as is, assuming the video itself is the asset
-        # If a thumbnail is needed for video, we might need to generate one "poster" image
-        # But the requirement says "only the downsized Image", which implies for images.
-        # For videos, we'll just return success.
-        result['success'] = True
-        return result
-    else:
-        app.logger.info(f"{log_prefix} Not an image or video file, skipping optimization")
-        return result
-    
-    try:
-        # Get file info before processing
-        original_size = os.path.getsize(original_path)
-        app.logger.info(f"{log_prefix} Original size: {original_size/1024:.1f}KB")
-        
-    # Try to open and process the image
-        try:
-            with Image.open(original_path) as img:
-                img = normalize_image_orientation(img, log_prefix)
-
-                # Special handling for PNG
-                is_png = filename.lower().endswith('.png')
-                if is_png:
-                    debug_msg = debug_prefix if debug_prefix else f"PNG DEBUG: {log_prefix}"
-                    app.logger.info(f"{debug_msg} Processing PNG image in optimization function")
-                    app.logger.info(f"{debug_msg} PNG details - Format: {img.format}, Mode: {img.mode}")
-                
-                # Log original dimensions
-                original_width, original_height = img.size
-                app.logger.info(f"{log_prefix} Original dimensions: {original_width}x{original_height}")
-                
-                # Resize if needed
-                resized = False
-                if original_width > max_original_width:
-                    try:
-                        scaling_factor = max_original_width / original_width
-                        new_width = max_original_width
-                        new_height = int(original_height * scaling_factor)
-                        # Resize with high quality resampling
-                        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        app.logger.info(f"{log_prefix} Resized to {new_width}x{new_height}")
-                        if is_png:
-                            app.logger.info(f"{debug_msg} PNG resized to {new_width}x{new_height}")
-                        resized = True
-                    except Exception as e:
-                        app.logger.error(f"{log_prefix} Resize failed: {str(e)}")
-                        if is_png:
-                            app.logger.error(f"{debug_msg} PNG resize failed: {str(e)}")
-                            app.logger.error(f"{debug_msg} Error type: {type(e).__name__}")
-                        # Continue without resizing
-                
-                # Save as WebP with compression to target file size
-                try:
-                    # Get optimal quality setting to reach target size
-                    # For WebP we can use a fixed quality or adapt it
-                    quality = 80 # Default quality for WebP
-                    app.logger.info(f"{log_prefix} Using quality setting: {quality}")
-                    
-                    # Standard save for WebP
-                    if not is_webp_ext:
-                        # Only create a new WebP if source wasn't already WebP
-                        img.save(converted_path, 'WEBP', quality=quality, method=6)
-                        app.logger.info(f"{log_prefix} Saved optimized WebP: {converted_path}")
-                        
-                        # Remove the original non-WebP file after successful conversion
-                        if os.path.exists(converted_path):
-                            try:
-                                os.remove(original_path)
-                                app.logger.info(f"{log_prefix} Removed original file after conversion")
-                            except Exception as e:
-                                app.logger.warning(f"{log_prefix} Error removing original file: {str(e)}")
-                    else:
-                        # Already a WebP: don't overwrite original; we'll use it for thumbs
-                        app.logger.info(f"{log_prefix} Original is already WebP; skip in-place re-save")
-                        
-                except Exception as save_err:
-                    app.logger.error(f"{log_prefix} Failed to save optimized WebP: {str(save_err)}")
-                    
-                    # Try with default quality as fallback (only when not already WebP)
-                    try:
-                        if not is_webp_ext:
-                            app.logger.info(f"{log_prefix} Attempting save with default quality")
-                            img.save(converted_path, 'WEBP', quality=80, method=6)
-                            app.logger.info(f"{log_prefix} Saved WebP with default quality")
-                        else:
-                            app.logger.info(f"{log_prefix} Skipping fallback save; original is WebP and won't be overwritten")
-                    except Exception as default_save_err:
-                        app.logger.error(f"{log_prefix} WebP fallback save also failed: {str(default_save_err)}")
-                        
-                        # If WebP conversion fails entirely and different path, copy original
-                        if not is_webp_ext and os.path.abspath(original_path) != os.path.abspath(converted_path):
-                            shutil.copy2(original_path, converted_path)
-                            app.logger.warning(f"{log_prefix} Used original file without optimization")
-                    
-                    # Compare file sizes
-                    if not is_webp_ext and os.path.exists(converted_path):
-                        new_size = os.path.getsize(converted_path)
-                        reduction = (1 - (new_size / original_size)) * 100 if original_size > 0 else 0
-                        app.logger.info(f"{log_prefix} Size reduction: {original_size/1024:.1f}KB -> {new_size/1024:.1f}KB ({reduction:.1f}%)")
-                    
-                    # Remove the original non-WebP file if it was converted or resized
-                    if not is_webp_ext and os.path.exists(converted_path) and (not filename.lower().endswith('.webp') or resized):
-                        try:
-                            os.remove(original_path)
-                            app.logger.info(f"{log_prefix} Removed original file after conversion")
-                        except Exception as e:
-                            app.logger.warning(f"{log_prefix} Error removing original file: {str(e)}")
-                    
-                except Exception as e:
-                    app.logger.error(f"{log_prefix} Compression error: {str(e)}")
-                    # Use original file if optimization fails
-                    if not os.path.exists(converted_path):
-                        shutil.copy2(original_path, converted_path)
-                        app.logger.warning(f"{log_prefix} Used original file as fallback")
-                
-                # Use the converted file for thumbnails if it exists
-                # If we produced a converted WebP (non-WebP source), use it as the basis for thumbs
-                if not is_webp_ext and os.path.exists(converted_path):
-                    original_path = converted_path
-        
-        except Exception as e:
-            app.logger.error(f"{log_prefix} Failed to process image: {str(e)}")
-            traceback.print_exc()
-            # Just copy the original file as is
-            if not is_webp_ext and os.path.exists(original_path) and not os.path.exists(converted_path):
-                try:
-                    shutil.copy2(original_path, converted_path)
-                    app.logger.warning(f"{log_prefix} Used original file after processing error")
-                except Exception as copy_err:
-                    app.logger.error(f"{log_prefix} Failed to copy original file: {str(copy_err)}")
-        
-        # Mark success if we have at least the original or converted file
-        if os.path.exists(original_path) or os.path.exists(converted_path):
-            result['success'] = True
-            app.logger.info(f"{log_prefix} Optimization completed successfully")
-            
-            # Log verification of all created files
-            for file_type, file_path in [
-                ('Original', original_path),
-                ('Converted', converted_path)
-            ]:
-                if os.path.exists(file_path):
-                    file_size = os.path.getsize(file_path) / 1024.0  # KB
-                    app.logger.info(f"{log_prefix} {file_type}: {os.path.basename(file_path)} ({file_size:.1f}KB)")
-                else:
-                    app.logger.warning(f"{log_prefix} {file_type} file missing: {os.path.basename(file_path)}")
-            
-        return result
-        
-    except Exception as e:
-        app.logger.error(f"{log_prefix} Unhandled exception in optimization: {str(e)}")
-        traceback.print_exc()
-        
-        # If anything went wrong but the original file exists, just use it
-        if os.path.exists(original_path):
-            try:
-                # Copy original to all required outputs as last resort
-                for target_path in [converted_path]:
-                    if not os.path.exists(os.path.dirname(target_path)):
-                        os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                    shutil.copy2(original_path, target_path)
-                
-                result['original'] = filename
-                result['success'] = True
-                result['recovery'] = True
-                app.logger.warning(f"{log_prefix} Recovery completed: using original file for all outputs")
-                return result
-            except Exception as recovery_err:
-                app.logger.error(f"{log_prefix} Recovery failed: {str(recovery_err)}")
-        
-        return result
-
 def get_thumbnail_info(filename):
     """
     Get thumbnail and preview information for a file.
@@ -4796,7 +4638,7 @@ def serve_static(filename):
     Returns:
         flask.Response: The requested static file
     """
-    return send_from_directory(app.static_folder, filename)
+    return serving.send('static', filename) or Response(f"File {filename} not found", status=404)
 
 @app.route('/static/css/<filename>')
 def serve_css(filename):
@@ -4809,8 +4651,7 @@ def serve_css(filename):
     Returns:
         flask.Response: The requested CSS file
     """
-    css_folder = os.path.join(app.static_folder, 'css')
-    return send_from_directory(css_folder, filename)
+    return serving.send('static', f"css/{filename}") or Response(f"File {filename} not found", status=404)
 
 @app.route('/static/js/<filename>')
 def serve_js(filename):
@@ -4823,8 +4664,7 @@ def serve_js(filename):
     Returns:
         flask.Response: The requested JS file
     """
-    js_folder = os.path.join(app.static_folder, 'js')
-    return send_from_directory(js_folder, filename)
+    return serving.send('static', f"js/{filename}") or Response(f"File {filename} not found", status=404)
 
 @app.route('/log_mobile_issue', methods=['POST'])
 def log_mobile_issue():
@@ -4859,11 +4699,9 @@ def log_mobile_issue():
         app.logger.warning(log_message)
         
         # Store in database for analytics
-        client = MongoClient(MONGODB_HOST, MONGODB_PORT)
-        db = client[MONGODB_DB]
+        db = database.get_db()
         logs_collection = db['system_logs']
         logs_collection.insert_one(log_entry)
-        client.close()
         
         return jsonify({'success': True})
     except Exception as e:
@@ -4873,7 +4711,9 @@ def log_mobile_issue():
 def delete_item_images(filenames):
     """
     Delete all images associated with an item.
-    Only deletes the main image file as we no longer use separate thumbnails/previews.
+    Releases the item's references on content-addressed files, which the
+    media sweep removes with their variants once no item uses them. Flat legacy uploads
+    are deleted directly, along with legacy thumbnails/previews.
     
     Args:
         filenames (list): List of image filenames to delete
@@ -4890,9 +4730,18 @@ def delete_item_images(filenames):
     
     if not filenames:
         return stats
-        
+
+    # Stored files are shared; the media sweep removes them after their last reference
+    stored = [f for f in filenames if media_store.is_stored(f)]
+    if stored:
+        try:
+            stats['originals'] += media_store.release(stored)
+        except Exception as e:
+            app.logger.error(f"Error releasing stored images {stored}: {str(e)}")
+            stats['errors'] += 1
+
     for filename in filenames:
-        if not filename:
+        if not filename or media_store.is_stored(filename):
             continue
             
         try:
@@ -4904,7 +4753,11 @@ def delete_item_images(filenames):
                 (os.path.join(app.config['UPLOAD_FOLDER'], f"{name_part}.webp"), 'originals'),
                 (os.path.join(app.config['UPLOAD_FOLDER'], f"{name_part}.jpg"), 'originals'),
                 (os.path.join(app.config['UPLOAD_FOLDER'], filename), 'originals'),
-                
+
+                # Responsive variants written by the image worker
+                *[(os.path.join(app.config['UPLOAD_FOLDER'], v), 'thumbnails')
+                  for v in image_jobs.variant_filenames(f"{name_part}.webp")],
+
                 # Also try to clean up legacy thumbnails/previews if they exist
                 (os.path.join(app.config['THUMBNAIL_FOLDER'], f"{name_part}_thumb.webp"), 'thumbnails'),
                 (os.path.join(app.config['THUMBNAIL_FOLDER'], f"{name_part}_thumb.jpg"), 'thumbnails'),
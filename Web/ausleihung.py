@@ -25,15 +25,20 @@ Sammlungsstruktur:
    Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
    For commercial licensing inquiries: https://github.com/AIIrondev
 '''
-from pymongo import MongoClient
+import backup
+import database
+import item_cache
+import occupancy
 from bson.objectid import ObjectId
 import datetime
 import pytz
 from datetime import timezone
 import os
 import json
+import re
+import base64
+import bisect
 import shutil
-import settings as cfg
 
 # Add this helper function after imports
 def ensure_timezone_aware(dt):
@@ -110,54 +115,36 @@ def get_current_status(ausleihung, log_changes=False, user=None):
     
     return new_status
 
-def create_backup_database():
+def create_backup_database(mode='auto'):
     """
-    Erstellt eine Sicherungskopie der Ausleihungsdatenbank.
+    Erstellt eine Sicherung der Ausleihungen, Gegenstände, Benutzer, Filter-Presets
+    und Einstellungen als komprimierte NDJSON-Dateien (siehe backup.py).
+    Alte Sicherungen werden gemäß der Aufbewahrungsrichtlinie entfernt.
+    
+    Args:
+        mode (str): 'full', 'incremental' oder 'auto' (regelmäßige Vollsicherung,
+            sonst inkrementell)
     
     Returns:
         bool: True wenn Backup erfolgreich erstellt wurde, sonst False
     """
     try:
-        # Verbindung zur Datenbank herstellen
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        ausleihungen = db['ausleihungen']
-        
-        # Backup-Verzeichnis erstellen, falls es nicht existiert
-        backup_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backups')
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-        
-        # Aktuelles Datum für den Dateinamen
-        current_date = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-        backup_file = os.path.join(backup_dir, f'ausleihungen_backup_{current_date}.json')
-        
-        # Ausleihungen abrufen und als JSON speichern
-        all_ausleihungen = list(ausleihungen.find({}))
-        
-        # ObjectId in String umwandeln für JSON-Serialisierung
-        for ausleihung in all_ausleihungen:
-            ausleihung['_id'] = str(ausleihung['_id'])
-            if 'Start' in ausleihung and ausleihung['Start']:
-                ausleihung['Start'] = ausleihung['Start'].isoformat()
-            if 'End' in ausleihung and ausleihung['End']:
-                ausleihung['End'] = ausleihung['End'].isoformat()
-            if 'LastUpdated' in ausleihung and ausleihung['LastUpdated']:
-                ausleihung['LastUpdated'] = ausleihung['LastUpdated'].isoformat()
-        
-        with open(backup_file, 'w', encoding='utf-8') as f:
-            json.dump(all_ausleihungen, f, ensure_ascii=False, indent=4)
+        manifest = backup.create_backup(mode)
+        removed = backup.prune_backups()
         
         # Log-Eintrag erstellen
         log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
         if not os.path.exists(log_dir):
             os.makedirs(log_dir)
         
+        current_date = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        total = sum(c['count'] for c in manifest['collections'].values())
         log_file = os.path.join(log_dir, 'ausleihungen_backup.log')
         with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(f"{current_date}: Backup erstellt: {backup_file}, {len(all_ausleihungen)} Einträge\n")
+            f.write(f"{current_date}: Backup ({manifest['type']}) erstellt: {manifest['path']}, {total} Einträge\n")
+            if removed:
+                f.write(f"{current_date}: Alte Backups entfernt: {', '.join(removed)}\n")
         
-        client.close()
         return True
     except Exception as e:
         # Fehler protokollieren
@@ -175,6 +162,13 @@ def create_backup_database():
 
 # === AUSLEIHUNG MANAGEMENT ===
 
+def _request_status_update():
+    """Let the scheduler pick up a new or changed Start/End boundary."""
+    # Imported here: scheduler imports this module
+    import scheduler
+    scheduler.request_status_update()
+
+
 def add_ausleihung(item_id, user, start_date, end_date=None, notes="", status="active", period=None, exemplar_data=None):
     """
     Add a new borrowing record for an item.
@@ -193,8 +187,7 @@ def add_ausleihung(item_id, user, start_date, end_date=None, notes="", status="a
         ObjectId: ID of the new borrowing record or None if failed
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         
         ausleihung = {
@@ -218,8 +211,9 @@ def add_ausleihung(item_id, user, start_date, end_date=None, notes="", status="a
         
         result = ausleihungen.insert_one(ausleihung)
         ausleihung_id = result.inserted_id
+        occupancy.sync_booking(ausleihung)
+        _request_status_update()
         
-        client.close()
         return ausleihung_id
     except Exception as e:
         print(f"Error adding ausleihung: {e}")
@@ -243,8 +237,7 @@ def update_ausleihung(id, item_id=None, user_id=None, start=None, end=None, note
         bool: True if successful, False otherwise
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         
         # Build update data with only the fields that are provided
@@ -276,10 +269,10 @@ def update_ausleihung(id, item_id=None, user_id=None, start=None, end=None, note
             {'$set': update_data}
         )
         
-        client.close()
-        
         # Log the update for debugging
         print(f"Updated ausleihung {id}: modified_count={result.modified_count}, update_data={update_data}")
+        occupancy.sync_booking_id(id)
+        _request_status_update()
         
         return result.modified_count > 0
         
@@ -303,8 +296,7 @@ def complete_ausleihung(id, end_time=None):
         if end_time is None:
             end_time = datetime.datetime.now()
         
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         item = db['items']
         
@@ -324,8 +316,9 @@ def complete_ausleihung(id, end_time=None):
                 'LastUpdated': datetime.datetime.now()
             }}
         )
+        item_cache.changed([id])
+        occupancy.release_booking(id)
 
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         # print(f"Error completing ausleihung: {e}") # Log the error
@@ -343,8 +336,7 @@ def cancel_ausleihung(id):
         bool: True bei Erfolg, sonst False
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
 
         # Mark the booking as cancelled
@@ -355,8 +347,8 @@ def cancel_ausleihung(id):
                 'LastUpdated': datetime.datetime.now()
             }}
         )
+        occupancy.release_booking(id)
 
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         # print(f"Error cancelling ausleihung: {e}") # Log the error
@@ -375,11 +367,10 @@ def remove_ausleihung(id):
         bool: True bei Erfolg, sonst False
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         result = ausleihungen.delete_one({'_id': ObjectId(id)})
-        client.close()
+        occupancy.release_booking(id)
         return result.deleted_count > 0
     except Exception as e:
         # print(f"Error removing ausleihung: {e}") # Log the error
@@ -399,11 +390,9 @@ def get_ausleihung(id):
         dict: Der Ausleihungsdatensatz oder None, wenn nicht gefunden
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         ausleihung = ausleihungen.find_one({'_id': ObjectId(id)})
-        client.close()
         return ausleihung
     except Exception as e:
         # print(f"Error retrieving ausleihung: {e}") # Log the error
@@ -424,8 +413,7 @@ def get_ausleihungen(status=None, start=None, end=None, date_filter='overlap'):
         list: Liste von Ausleihungsdatensätzen
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         collection = db['ausleihungen']
         
         # Query erstellen
@@ -479,13 +467,153 @@ def get_ausleihungen(status=None, start=None, end=None, date_filter='overlap'):
                 query['End'] = {'$lte': end}
         
         results = list(collection.find(query))
-        client.close()
         return results
     except Exception as e:
         # print(f"Error retrieving ausleihungen: {e}") # Log the error
         return []
 
 
+LOG_SORT = [('Start', -1), ('_id', -1)]
+
+
+def encode_log_cursor(ausleihung):
+    """
+    Erzeugt einen Cursor (Keyset) aus Start und _id einer Ausleihung.
+    
+    Args:
+        ausleihung (dict): Letzter Datensatz der aktuellen Seite
+        
+    Returns:
+        str: URL-sicherer Cursor-String
+    """
+    start = ausleihung.get('Start')
+    payload = {
+        's': start.isoformat() if isinstance(start, datetime.datetime) else None,
+        'id': str(ausleihung['_id'])
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_log_cursor(cursor):
+    """
+    Liest einen mit encode_log_cursor erzeugten Cursor.
+    
+    Args:
+        cursor (str): Cursor-String
+        
+    Returns:
+        tuple: (Start als datetime oder None, ObjectId) oder None bei ungültigem Cursor
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        start = datetime.datetime.fromisoformat(payload['s']) if payload.get('s') else None
+        return start, ObjectId(payload['id'])
+    except Exception:
+        return None
+
+
+def build_log_query(status=None, user=None, item_ids=None, date_from=None, date_to=None):
+    """
+    Baut die MongoDB-Abfrage für das Ausleihungs-Protokoll.
+    
+    Args:
+        status (str/list, optional): Status(se) der Ausleihungen
+        user (str, optional): Benutzername oder dessen Anfang
+        item_ids (list, optional): Gegenstands-IDs; Exemplare ('<id>_<n>') werden mit erfasst
+        date_from (datetime, optional): Frühester Start
+        date_to (datetime, optional): Spätester Start (exklusiv)
+        
+    Returns:
+        dict: MongoDB-Abfrage
+    """
+    query = {}
+    if status:
+        query['Status'] = {'$in': status} if isinstance(status, list) else status
+    if user:
+        # Verankerter Präfix-Vergleich, damit der Index auf User genutzt werden kann
+        query['User'] = {'$regex': '^' + re.escape(user)}
+    if item_ids is not None:
+        matches = []
+        for item_id in item_ids:
+            matches.append(str(item_id))
+            matches.append(re.compile('^' + re.escape(str(item_id)) + r'_\d+$'))
+        query['Item'] = {'$in': matches}
+    if date_from is not None or date_to is not None:
+        query['Start'] = {}
+        if date_from is not None:
+            query['Start']['$gte'] = date_from
+        if date_to is not None:
+            query['Start']['$lt'] = date_to
+    return query
+
+
+def get_ausleihungen_page(query=None, cursor=None, limit=50):
+    """
+    Ruft eine Seite des Ausleihungs-Protokolls ab (neueste zuerst).
+    
+    Statt skip/offset wird über (Start, _id) geblättert, damit auch tiefe Seiten
+    nur die angeforderten Datensätze lesen.
+    
+    Args:
+        query (dict, optional): Abfrage aus build_log_query
+        cursor (str, optional): Cursor der vorherigen Seite
+        limit (int, optional): Anzahl Datensätze pro Seite
+        
+    Returns:
+        tuple: (Liste von Ausleihungen, Cursor der nächsten Seite oder None)
+    """
+    try:
+        db = database.get_db()
+        collection = db['ausleihungen']
+        
+        query = dict(query or {})
+        keyset = decode_log_cursor(cursor) if cursor else None
+        if keyset:
+            start, last_id = keyset
+            if start is None:
+                # Datensätze ohne Start stehen bei absteigender Sortierung am Ende
+                after = {'Start': None, '_id': {'$lt': last_id}}
+            else:
+                after = {'$or': [
+                    {'Start': {'$lt': start}},
+                    {'Start': start, '_id': {'$lt': last_id}},
+                    {'Start': None}
+                ]}
+            query = {'$and': [query, after]} if query else after
+        
+        # Einen Datensatz mehr laden, um zu wissen, ob es eine weitere Seite gibt
+        results = list(collection.find(query).sort(LOG_SORT).limit(limit + 1))
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = encode_log_cursor(results[-1])
+        return results, next_cursor
+    except Exception as e:
+        print(f"Error retrieving ausleihungen page: {e}")
+        return [], None
+
+
+def iter_ausleihungen(query=None, batch_size=500):
+    """
+    Liefert alle passenden Ausleihungen nacheinander, ohne sie als Liste zu laden.
+    
+    Args:
+        query (dict, optional): Abfrage aus build_log_query
+        batch_size (int, optional): Anzahl Datensätze pro Datenbank-Batch
+        
+    Yields:
+        dict: Ausleihungsdatensätze, neueste zuerst
+    """
+    db = database.get_db()
+    collection = db['ausleihungen']
+    cursor = collection.find(query or {}).sort(LOG_SORT).batch_size(batch_size)
+    try:
+        for ausleihung in cursor:
+            yield ausleihung
+    finally:
+        cursor.close()
+
+
 def get_active_ausleihungen(start=None, end=None):
     """
     Ruft alle aktiven (laufenden) Ausleihungen ab.
@@ -557,8 +685,7 @@ def get_ausleihung_by_user(user_id, status=None, use_client_side_verification=Tr
         list: Liste von Ausleihungsdatensätzen des Benutzers
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         
         query = {'User': user_id}
@@ -583,13 +710,11 @@ def get_ausleihung_by_user(user_id, status=None, use_client_side_verification=Tr
         # Get appointments from database
         if not use_client_side_verification:
             results = list(ausleihungen.find(query))
-            client.close()
             return results
         
         # Wenn clientseitige Statusverifikation aktiviert ist, holen wir alle Ausleihungen
         # des Benutzers und verifizieren den Status anschließend
         all_ausleihungen = list(ausleihungen.find(query))
-        client.close()
         
         # Immer clientseitige Statusverifikation durchführen wenn aktiviert
         if use_client_side_verification:
@@ -639,8 +764,7 @@ def get_ausleihung_by_item(item_id, status=None, include_history=False):
         dict or None: Ausleihung record or None if not found
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         
         # Build query
@@ -657,7 +781,6 @@ def get_ausleihung_by_item(item_id, status=None, include_history=False):
             result = record
             break
             
-        client.close()
         return result
         
     except Exception as e:
@@ -680,6 +803,146 @@ def get_ausleihungen_by_date_range(start_date, end_date, status=None):
     return get_ausleihungen(status=status, start=start_date, end=end_date)
 
 
+# === KONFLIKTPRÜFUNG ===
+
+DEFAULT_BOOKING_DURATION = datetime.timedelta(hours=1)
+
+
+def _strip_tz(dt):
+    """Entfernt die Zeitzone, damit mit den (naiven) Datenbankwerten verglichen werden kann."""
+    if dt and hasattr(dt, 'tzinfo') and dt.tzinfo:
+        return dt.replace(tzinfo=None)
+    return dt
+
+
+def _intervals_overlap(start_date, end_date, booking_start, booking_end):
+    """
+    Prüft zwei Zeiträume auf Überschneidung.
+    
+    1. Neue Buchung beginnt während der bestehenden
+    2. Neue Buchung endet während der bestehenden
+    3. Neue Buchung umschließt die bestehende vollständig
+    4. Bestehende Buchung umschließt die neue vollständig
+    """
+    return ((start_date >= booking_start and start_date < booking_end) or
+            (end_date > booking_start and end_date <= booking_end) or
+            (start_date <= booking_start and end_date >= booking_end) or
+            (start_date >= booking_start and end_date <= booking_end))
+
+
+def new_interval_index():
+    """
+    Erzeugt einen leeren Intervall-Index für die Buchungen eines Gegenstands.
+    
+    Der Index besteht aus nach Start sortierten Arrays (für bisect), der
+    längsten Buchungsdauer (begrenzt den Suchbereich nach links) und den
+    belegten Schulstunden je Datum.
+    
+    Returns:
+        dict: Leerer Index
+    """
+    return {
+        'starts': [],
+        'ends': [],
+        'max_duration': datetime.timedelta(0),
+        'periods': {},
+    }
+
+
+def add_to_interval_index(index, booking):
+    """
+    Fügt eine Buchung in einen Intervall-Index ein.
+    Buchungen ohne gültigen Start werden (wie bisher) ignoriert; fehlt das Ende,
+    gilt Start + 1 Stunde.
+    
+    Args:
+        index (dict): Index aus new_interval_index/build_interval_index
+        booking (dict): Buchung mit Start, End und optional Period
+    """
+    booking_start = booking.get('Start')
+    if not isinstance(booking_start, datetime.datetime):
+        return
+    booking_end = booking.get('End') or booking_start + DEFAULT_BOOKING_DURATION
+    
+    pos = bisect.bisect_right(index['starts'], booking_start)
+    index['starts'].insert(pos, booking_start)
+    index['ends'].insert(pos, booking_end)
+    if booking_end - booking_start > index['max_duration']:
+        index['max_duration'] = booking_end - booking_start
+    
+    booking_period = booking.get('Period')
+    try:
+        booking_period = int(booking_period) if booking_period is not None else None
+    except (TypeError, ValueError):
+        booking_period = None
+    if booking_period is not None:
+        index['periods'].setdefault(booking_start.date(), set()).add(booking_period)
+
+
+def build_interval_index(item_id):
+    """
+    Lädt alle geplanten und aktiven Buchungen eines Gegenstands mit einer
+    Abfrage in einen Intervall-Index. Für mehrere Prüfungen innerhalb einer
+    Anfrage (z.B. plan_booking über viele Tage) einmal laden und weiterreichen.
+    
+    Args:
+        item_id (str): ID des Gegenstands
+        
+    Returns:
+        dict: Intervall-Index
+    """
+    db = database.get_db()
+    ausleihungen = db['ausleihungen']
+    bookings = ausleihungen.find(
+        {'Item': item_id, 'Status': {'$in': ['planned', 'active']}},
+        {'Start': 1, 'End': 1, 'Period': 1}
+    )
+    index = new_interval_index()
+    for booking in bookings:
+        add_to_interval_index(index, booking)
+    return index
+
+
+def has_period_conflict(index, booking_date, periods):
+    """
+    Prüft, ob am Datum eine der Schulstunden bereits belegt ist.
+    
+    Args:
+        index (dict): Intervall-Index
+        booking_date (date): Datum der neuen Buchung
+        periods (iterable): Schulstunden der neuen Buchung
+        
+    Returns:
+        bool: True bei Konflikt
+    """
+    booked = index['periods'].get(booking_date)
+    return bool(booked) and any(int(p) in booked for p in periods)
+
+
+def has_time_conflict(index, start_date, end_date):
+    """
+    Prüft, ob sich der Zeitraum mit einer Buchung im Index überschneidet.
+    Per bisect werden nur Buchungen betrachtet, deren Start im Bereich
+    [Beginn - längste Dauer, Ende] liegt.
+    
+    Args:
+        index (dict): Intervall-Index
+        start_date (datetime): Beginn der neuen Buchung
+        end_date (datetime): Ende der neuen Buchung
+        
+    Returns:
+        bool: True bei Konflikt
+    """
+    starts = index['starts']
+    ends = index['ends']
+    low = bisect.bisect_left(starts, min(start_date, end_date) - index['max_duration'])
+    high = bisect.bisect_right(starts, max(start_date, end_date))
+    for pos in range(low, high):
+        if _intervals_overlap(start_date, end_date, starts[pos], ends[pos]):
+            return True
+    return False
+
+
 def check_ausleihung_conflict(item_id, start_date, end_date, period=None):
     """
     Prüft, ob es Konflikte mit bestehenden Ausleihungen oder aktiven Ausleihen gibt.
@@ -693,97 +956,7 @@ def check_ausleihung_conflict(item_id, start_date, end_date, period=None):
     Returns:
         bool: True, wenn ein Konflikt besteht, sonst False
     """
-    try:
-        print(f"Checking booking conflict for item {item_id}, period {period}, start {start_date}, end {end_date}")
-        
-        if start_date and hasattr(start_date, 'tzinfo') and start_date.tzinfo:
-            start_date = start_date.replace(tzinfo=None)
-        if end_date and hasattr(end_date, 'tzinfo') and end_date.tzinfo:
-            end_date = end_date.replace(tzinfo=None)
-        
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        ausleihungen = db['ausleihungen']
-        
-        # Get the date component for filtering
-        booking_date = start_date.date()
-        
-        # First, get all active and planned bookings for this item
-        all_bookings = list(ausleihungen.find({
-            'Item': item_id,
-            'Status': {'$in': ['planned', 'active']}
-        }))
-        
-        # Print all relevant bookings for debugging
-        print(f"Found {len(all_bookings)} existing bookings for this item")
-        for bk in all_bookings:
-            bk_id = str(bk.get('_id'))
-            bk_status = bk.get('Status')
-            bk_period = bk.get('Period', 'None')
-            bk_start = bk.get('Start')
-            bk_user = bk.get('User')
-            print(f"  - Booking {bk_id}: Status={bk_status}, Period={bk_period}, Start={bk_start}, User={bk_user}")
-
-        # If we're booking by period, check for period conflicts
-        if period is not None:
-            period_int = int(period)
-            
-            # Check bookings on the same day with the same period
-            for booking in all_bookings:
-                booking_start = booking.get('Start')
-                if not booking_start:
-                    continue
-                    
-                # Compare just the date part
-                try:
-                    # Ensure we're comparing date objects, not datetime objects
-                    existing_date = booking_start.date()
-                    if existing_date == booking_date:
-                        # If this booking has the same period, it's a conflict
-                        booking_period = booking.get('Period')
-                        # Convert to integer for proper comparison
-                        if booking_period is not None and int(booking_period) == period_int:
-                            print(f"CONFLICT: Same day, same period. Period: {period_int}, Date: {booking_date}")
-                            client.close()
-                            return True
-                except Exception as e:
-                    print(f"Error comparing dates: {e}")
-                    # Continue checking other bookings if there's an error with one
-        
-        # Always check for time overlaps, regardless of whether period was specified
-        for booking in all_bookings:
-            booking_start = booking.get('Start')
-            booking_end = booking.get('End')
-            
-            if not booking_start:
-                continue
-            
-            # Set default end time if not specified
-            if not booking_end:
-                booking_end = booking_start + datetime.timedelta(hours=1)
-            
-            # Check for overlap
-            # 1. New booking starts during existing booking
-            # 2. New booking ends during existing booking
-            # 3. New booking completely contains existing booking
-            # 4. Existing booking completely contains new booking
-            if ((start_date >= booking_start and start_date < booking_end) or
-                (end_date > booking_start and end_date <= booking_end) or
-                (start_date <= booking_start and end_date >= booking_end) or
-                (start_date >= booking_start and end_date <= booking_end)):
-                print(f"CONFLICT: Time overlap. New booking: {start_date}-{end_date}, Existing: {booking_start}-{booking_end}")
-                client.close()
-                return True
-        
-        print("No conflicts found!")
-        client.close()
-        return False
-        
-    except Exception as e:
-        print(f"Error checking booking conflicts: {e}")
-        import traceback
-        traceback.print_exc()
-        return True  # Bei Fehler Konflikt annehmen, um auf Nummer sicher zu gehen
+    return check_booking_period_range_conflict(item_id, start_date, end_date, period=period)
 
 
 def check_booking_period_range_conflict(item_id, start_date, end_date, period=None, period_end=None):
@@ -801,81 +974,29 @@ def check_booking_period_range_conflict(item_id, start_date, end_date, period=No
         bool: True if there's a conflict, False otherwise
     """
     try:
-        if start_date and hasattr(start_date, 'tzinfo') and start_date.tzinfo:
-            start_date = start_date.replace(tzinfo=None)
-        if end_date and hasattr(end_date, 'tzinfo') and end_date.tzinfo:
-            end_date = end_date.replace(tzinfo=None)
-        
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        ausleihungen = db['ausleihungen']
-        
-        # Get the date component for filtering
-        booking_date = start_date.date()
+        start_date = _strip_tz(start_date)
+        end_date = _strip_tz(end_date)
         
-        # First, get all active and planned bookings for this item
-        all_bookings = list(ausleihungen.find({
-            'Item': item_id,
-            'Status': {'$in': ['planned', 'active']}
-        }))
-        
-        # Print all relevant bookings for debugging
-        print(f"Found {len(all_bookings)} existing bookings for this item")
+        index = build_interval_index(item_id)
         
-        # If we're booking by period, check for period conflicts
+        # If we're booking by period, check for period conflicts on the same day
         if period is not None:
             period_start = int(period)
             periods_to_check = [period_start]
             
             # If period_end is specified, it's a range of periods
             if period_end is not None:
-                period_end = int(period_end)
-                periods_to_check = list(range(period_start, period_end + 1))
-                
-            # Check bookings on the same day with any overlapping period
-            for booking in all_bookings:
-                booking_start = booking.get('Start')
-                if not booking_start:
-                    continue
-                    
-                # Compare just the date part
-                existing_date = booking_start.date()
-                if existing_date == booking_date:
-                    booking_period = booking.get('Period')
-                    # Normalize to int if possible
-                    try:
-                        booking_period_int = int(booking_period) if booking_period is not None else None
-                    except Exception:
-                        booking_period_int = None
-                    
-                    # If this booking has any period in our range, it's a conflict
-                    if booking_period_int is not None and booking_period_int in periods_to_check:
-                        print(f"CONFLICT: Same day, overlapping period. Booking period: {booking_period_int}")
-                        client.close()
-                        return True
-        # Always also check time overlaps against any existing bookings (incl. those without Period)
-        for booking in all_bookings:
-            booking_start = booking.get('Start')
-            booking_end = booking.get('End')
-            
-            if not booking_start:
-                continue
+                periods_to_check = list(range(period_start, int(period_end) + 1))
             
-            # Set default end time if not specified
-            if not booking_end:
-                booking_end = booking_start + datetime.timedelta(hours=1)
-            
-            # Check for overlap of [start_date, end_date] with [booking_start, booking_end]
-            if ((start_date >= booking_start and start_date < booking_end) or
-                (end_date > booking_start and end_date <= booking_end) or
-                (start_date <= booking_start and end_date >= booking_end) or
-                (start_date >= booking_start and end_date <= booking_end)):
-                print(f"CONFLICT: Time overlap. New: {start_date}-{end_date}, Existing: {booking_start}-{booking_end}")
-                client.close()
+            if has_period_conflict(index, start_date.date(), periods_to_check):
+                print(f"CONFLICT: Same day, overlapping period. Item: {item_id}, Date: {start_date.date()}, Periods: {periods_to_check}")
                 return True
         
-        print("No conflicts found!")
-        client.close()
+        # Always also check time overlaps against any existing bookings (incl. those without Period)
+        if has_time_conflict(index, start_date, end_date):
+            print(f"CONFLICT: Time overlap. Item: {item_id}, New: {start_date}-{end_date}")
+            return True
+        
         return False
         
     except Exception as e:
@@ -908,8 +1029,7 @@ def get_ausleihungen_starting_now(current_time):
         # Get today's date for date comparison
         today = current_time.date()
         
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         
         # Build a query to find planned bookings that:
@@ -939,7 +1059,6 @@ def get_ausleihungen_starting_now(current_time):
         for b in bookings:
             print(f"  - Booking {b.get('_id')}: Start={b.get('Start')}, Period={b.get('Period')}")
             
-        client.close()
         return bookings
     except Exception as e:
         print(f"Error in get_ausleihungen_starting_now: {e}")
@@ -959,8 +1078,7 @@ def get_ausleihungen_ending_now(current_time):
         list: Liste von Ausleihungen, die jetzt enden sollen
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         
         # Create a wider time window (15 minutes before to catch any missed endings)
@@ -995,7 +1113,6 @@ def get_ausleihungen_ending_now(current_time):
         for b in bookings:
             print(f"  - Potential ending booking {b.get('_id')}: End={b.get('End')}, Period={b.get('Period')}")
             
-        client.close()
         return bookings
     except Exception as e:
         print(f"Error in get_ausleihungen_ending_now: {e}")
@@ -1015,14 +1132,12 @@ def activate_ausleihung(id):
         bool: True bei Erfolg, sonst False
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         
         # Zuerst prüfen, ob die Ausleihe existiert und den Status 'planned' hat
         ausleihung = ausleihungen.find_one({'_id': ObjectId(id)})
         if not ausleihung or ausleihung.get('Status') != 'planned':
-            client.close()
             return False
             
         # Ausleihe aktivieren
@@ -1034,7 +1149,6 @@ def activate_ausleihung(id):
             }}
         )
         
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         return False
@@ -1075,8 +1189,7 @@ def get_completed_bookings(start=None, end=None):
 def mark_booking_active(booking_id, ausleihung_id=None):
     """Kompatibilitätsfunktion - markiert eine Ausleihe als aktiv und verknüpft optional eine Ausleihungs-ID"""
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
         
         # Basisupdate-Daten mit Status-Änderung
@@ -1095,7 +1208,6 @@ def mark_booking_active(booking_id, ausleihung_id=None):
             {'$set': update_data}
         )
         
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         print(f"Error activating booking: {e}")
@@ -1137,8 +1249,7 @@ def reset_item_completely(item_id):
         dict: Erfolg-/Fehlerstatus mit Details
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items_collection = db['items']
         ausleihungen_collection = db['ausleihungen']
         
@@ -1157,6 +1268,7 @@ def reset_item_completely(item_id):
         
         completed_count = 0
         for borrowing in active_borrowings:
+            occupancy.release_booking(borrowing['_id'])
             ausleihungen_collection.update_one(
                 {'_id': borrowing['_id']},
                 {
@@ -1197,8 +1309,7 @@ def reset_item_completely(item_id):
             {'_id': ObjectId(item_id)},
             update_data
         )
-        
-        client.close()
+        item_cache.changed([item_id])
         
         if result.modified_count > 0:
             return {
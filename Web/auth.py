@@ -0,0 +1,128 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Request Authentication Context
+==============================
+
+Resolves the logged in user once per request and keeps it on flask.g, so
+routes and helpers can ask for the user and the admin flag as often as they
+like:
+
+    auth.current_user()   -> {'username': ..., 'admin': ...} or None
+    auth.is_admin()       -> bool
+
+The admin flag is additionally cached in the signed session cookie as a
+short-lived claim {'user', 'admin', 'exp', 'ver'}, so most requests do not
+read the user document at all. A claim is trusted until it expires
+(ADMIN_CLAIM_SECONDS) and only while the 'auth' version is unchanged;
+user.make_admin(), remove_admin() and delete_user() bump that version,
+which revokes all claims within one cache check interval.
+
+login_required and admin_required wrap page routes and redirect to the
+login page like the inline checks they replace.
+"""
+import functools
+import time
+
+from flask import flash, g, redirect, session, url_for
+
+import database
+import payloads
+import user as us
+
+
+ADMIN_CLAIM_SECONDS = 60
+NOT_ALLOWED_MESSAGE = ('Ihnen ist es nicht gestattet auf dieser Internetanwendung, die eben besuchte Adrrese zu nutzen, '
+                       'versuchen sie es erneut nach dem sie sich mit einem berechtigten Nutzer angemeldet haben!')
+
+
+def remember(username, admin):
+    """
+    Store the admin claim after a successful login.
+
+    Args:
+        username (str): Logged in user
+        admin (bool): Whether the user is an administrator
+    """
+    session['auth'] = {
+        'user': username,
+        'admin': bool(admin),
+        'exp': time.time() + ADMIN_CLAIM_SECONDS,
+        'ver': payloads.version(us.AUTH_VERSION_NAME),
+    }
+    g.auth_user = {'username': username, 'admin': bool(admin)}
+
+
+def forget():
+    """Drop the claim and the request context, e.g. on logout."""
+    session.pop('auth', None)
+    g.pop('auth_user', None)
+
+
+def _load(username):
+    """Resolve a user from the session claim or, if it is stale, the database."""
+    version = payloads.version(us.AUTH_VERSION_NAME)
+    claim = session.get('auth')
+    if (isinstance(claim, dict) and claim.get('user') == username
+            and claim.get('exp', 0) > time.time() and claim.get('ver') == version):
+        return {'username': username, 'admin': bool(claim.get('admin'))}
+
+    doc = database.get_db()['users'].find_one({'Username': username}, {'Admin': 1})
+    if doc is None:
+        session.pop('auth', None)
+        return None
+    remember(username, doc.get('Admin', False))
+    return {'username': username, 'admin': bool(doc.get('Admin', False))}
+
+
+def current_user():
+    """
+    Return the logged in user of the current request.
+
+    Returns:
+        dict: {'username', 'admin'} or None if nobody (or a deleted user) is
+              logged in
+    """
+    if 'auth_user' not in g:
+        username = session.get('username')
+        g.auth_user = _load(username) if username else None
+    return g.auth_user
+
+
+def is_admin():
+    """
+    Check whether the user of the current request is an administrator.
+
+    Returns:
+        bool: True for administrators
+    """
+    user = current_user()
+    return bool(user and user['admin'])
+
+
+def login_required(view):
+    """Redirect to the login page unless a user is logged in."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_user() is None:
+            flash(NOT_ALLOWED_MESSAGE, 'error')
+            return redirect(url_for('login'))
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def admin_required(view):
+    """Redirect to the login page unless an administrator is logged in."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            flash(NOT_ALLOWED_MESSAGE, 'error')
+            return redirect(url_for('login'))
+        return view(*args, **kwargs)
+    return wrapper
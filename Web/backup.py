@@ -0,0 +1,322 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Database Backups
+================
+
+Streaming backup engine used by ausleihung.create_backup_database() and the
+scheduled backup job. Each run writes one directory below BACKUP_FOLDER:
+
+    db_backup_<YYYY-MM-DD_HH-MM-SS>_<full|incremental>/
+        ausleihungen.ndjson.gz
+        items.ndjson.gz
+        ...
+        manifest.json
+
+Every collection file holds one MongoDB Extended JSON document per line
+(ObjectId and datetime values keep their types) and is written while the
+cursor iterates, so memory use does not depend on the collection size.
+Compression is gzip by default; zstd is used when configured and the optional
+'zstandard' package is installed.
+
+Incremental runs only export documents with LastUpdated after the start of
+the previous run, or an _id greater than the largest one exported before.
+Every manifest records that largest _id cumulatively, also when the run
+exported nothing of a collection.
+Deletions and changes to documents without LastUpdated are only captured by
+full snapshots, which are taken every backup.full_interval_hours. Retention
+keeps the newest backup.keep_full full snapshots and their incrementals.
+"""
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+
+from bson import json_util
+from bson.objectid import ObjectId
+
+import database
+import settings as cfg
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COLLECTIONS = ['ausleihungen', 'items', 'users', 'filter_presets', 'settings']
+RUN_PREFIX = 'db_backup_'
+MANIFEST_FILE = 'manifest.json'
+FORMAT_VERSION = 1
+
+EXTENSIONS = {
+    'gzip': '.ndjson.gz',
+    'zstd': '.ndjson.zst',
+    'none': '.ndjson',
+}
+
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+
+
+def get_backup_folder():
+    """
+    Return the backup folder, creating it if necessary.
+
+    Falls back to a 'backups' directory inside the application directory if
+    BACKUP_FOLDER cannot be created.
+
+    Returns:
+        str: Absolute path of the backup folder
+    """
+    folder = cfg.BACKUP_FOLDER
+    try:
+        os.makedirs(folder, exist_ok=True)
+    except PermissionError:
+        folder = os.path.join(cfg.BASE_DIR, 'backups')
+        os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _compression():
+    """Return the configured compression, falling back to gzip if zstd is unavailable."""
+    compression = cfg.BACKUP_COMPRESSION
+    if compression not in EXTENSIONS:
+        print(f"Unknown backup compression '{compression}', using gzip")
+        return 'gzip'
+    if compression == 'zstd' and zstandard is None:
+        print("zstandard is not installed, using gzip for backups")
+        return 'gzip'
+    return compression
+
+
+def open_writer(path, compression):
+    """
+    Open a text stream that writes (compressed) NDJSON.
+
+    Args:
+        path (str): Target file path
+        compression (str): 'gzip', 'zstd' or 'none'
+
+    Returns:
+        TextIO: Writable text stream
+    """
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    if compression == 'zstd':
+        raw = zstandard.ZstdCompressor(level=3).stream_writer(open(path, 'wb'))
+        return io.TextIOWrapper(raw, encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def open_reader(path):
+    """
+    Open a (compressed) backup file for reading text, based on its extension.
+
+    Args:
+        path (str): Backup file path
+
+    Returns:
+        TextIO: Readable text stream
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst backups")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+        return io.TextIOWrapper(raw, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def export_collection(collection, path, compression, query=None, batch_size=1000):
+    """
+    Stream a collection into an NDJSON file.
+
+    Args:
+        collection (Collection): Source collection
+        path (str): Target file path
+        compression (str): 'gzip', 'zstd' or 'none'
+        query (dict, optional): Filter, defaults to all documents
+        batch_size (int): Cursor batch size
+
+    Returns:
+        dict: {'file', 'count', 'sha256', 'max_id'}; sha256 covers the
+        uncompressed content
+    """
+    count = 0
+    max_id = None
+    digest = hashlib.sha256()
+    with open_writer(path, compression) as out:
+        for doc in collection.find(query or {}).batch_size(batch_size):
+            line = json_util.dumps(doc, json_options=JSON_OPTIONS, ensure_ascii=False) + '\n'
+            out.write(line)
+            digest.update(line.encode('utf-8'))
+            count += 1
+            doc_id = doc.get('_id')
+            if isinstance(doc_id, ObjectId) and (max_id is None or doc_id > max_id):
+                max_id = doc_id
+    return {
+        'file': os.path.basename(path),
+        'count': count,
+        'sha256': digest.hexdigest(),
+        'max_id': str(max_id) if max_id else None,
+    }
+
+
+def list_runs(folder=None):
+    """
+    Return the manifests of all completed backup runs, oldest first.
+
+    Args:
+        folder (str, optional): Backup folder, defaults to get_backup_folder()
+
+    Returns:
+        list: Manifest dicts with an added 'path' key
+    """
+    folder = folder or get_backup_folder()
+    runs = []
+    for name in os.listdir(folder):
+        manifest_path = os.path.join(folder, name, MANIFEST_FILE)
+        if not name.startswith(RUN_PREFIX) or not os.path.isfile(manifest_path):
+            continue
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable backup manifest {manifest_path}: {e}")
+            continue
+        manifest['path'] = os.path.join(folder, name)
+        runs.append(manifest)
+    runs.sort(key=lambda m: m.get('started', ''))
+    return runs
+
+
+def _last_max_id(runs, coll_name):
+    """Return the largest exported _id of a collection, from the newest run that has one."""
+    for manifest in reversed(runs):
+        max_id = manifest.get('collections', {}).get(coll_name, {}).get('max_id')
+        if max_id:
+            return max_id
+    return None
+
+
+def _incremental_query(previous, max_id):
+    """Build the filter for documents changed since the previous run."""
+    clauses = [{'LastUpdated': {'$gt': datetime.datetime.fromisoformat(previous['started'])}}]
+    if max_id:
+        clauses.append({'_id': {'$gt': ObjectId(max_id)}})
+    return {'$or': clauses}
+
+
+def _choose_mode(runs, now):
+    """Return 'full' or 'incremental' for an automatic run."""
+    fulls = [m for m in runs if m.get('type') == 'full']
+    if not fulls:
+        return 'full'
+    last_full = datetime.datetime.fromisoformat(fulls[-1]['started'])
+    if now - last_full >= datetime.timedelta(hours=cfg.BACKUP_FULL_INTERVAL_HOURS):
+        return 'full'
+    return 'incremental'
+
+
+def create_backup(mode='auto', collections=None):
+    """
+    Create a full or incremental backup run.
+
+    Args:
+        mode (str): 'full', 'incremental' or 'auto' (full snapshot when the
+            last one is older than backup.full_interval_hours)
+        collections (list, optional): Collections to back up, defaults to COLLECTIONS
+
+    Returns:
+        dict: Manifest of the written run
+    """
+    folder = get_backup_folder()
+    runs = list_runs(folder)
+    started = datetime.datetime.now()
+    if mode == 'auto':
+        mode = _choose_mode(runs, started)
+    previous = runs[-1] if runs else None
+    if mode == 'incremental' and previous is None:
+        mode = 'full'
+
+    compression = _compression()
+    name = f"{RUN_PREFIX}{started.strftime('%Y-%m-%d_%H-%M-%S')}_{mode}"
+    target = os.path.join(folder, name)
+    tmp_dir = target + '.tmp'
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    db = database.get_db()
+    manifest = {
+        'format': FORMAT_VERSION,
+        'type': mode,
+        'started': started.isoformat(),
+        'base': os.path.basename(previous['path']) if mode == 'incremental' else None,
+        'compression': compression,
+        'collections': {},
+    }
+    try:
+        for coll_name in collections or COLLECTIONS:
+            previous_max_id = _last_max_id(runs, coll_name) if mode == 'incremental' else None
+            query = _incremental_query(previous, previous_max_id) if mode == 'incremental' else None
+            path = os.path.join(tmp_dir, coll_name + EXTENSIONS[compression])
+            result = export_collection(db[coll_name], path, compression, query, cfg.BACKUP_BATCH_SIZE)
+            if previous_max_id and (not result['max_id'] or ObjectId(result['max_id']) < ObjectId(previous_max_id)):
+                # Carried forward, so the next incremental still knows where new documents start
+                result['max_id'] = previous_max_id
+            manifest['collections'][coll_name] = result
+        manifest['finished'] = datetime.datetime.now().isoformat()
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+        # Only complete runs get their final name and are visible to list_runs()
+        os.rename(tmp_dir, target)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    manifest['path'] = target
+    return manifest
+
+
+def prune_backups(keep_full=None, folder=None):
+    """
+    Delete backup runs older than the oldest full snapshot to keep.
+
+    Incremental runs are kept together with the full snapshot they build on.
+    Leftover '.tmp' directories of aborted runs are removed as well.
+
+    Args:
+        keep_full (int, optional): Number of full snapshots to keep,
+            defaults to backup.keep_full
+        folder (str, optional): Backup folder, defaults to get_backup_folder()
+
+    Returns:
+        list: Names of the deleted runs
+    """
+    folder = folder or get_backup_folder()
+    keep_full = cfg.BACKUP_KEEP_FULL if keep_full is None else keep_full
+    removed = []
+
+    runs = list_runs(folder)
+    fulls = [m for m in runs if m.get('type') == 'full']
+    if keep_full > 0 and len(fulls) > keep_full:
+        cutoff = fulls[-keep_full]['started']
+        for manifest in runs:
+            if manifest.get('started', '') < cutoff:
+                shutil.rmtree(manifest['path'], ignore_errors=True)
+                removed.append(os.path.basename(manifest['path']))
+
+    for name in os.listdir(folder):
+        if name.startswith(RUN_PREFIX) and name.endswith('.tmp'):
+            shutil.rmtree(os.path.join(folder, name), ignore_errors=True)
+            removed.append(name)
+    return removed
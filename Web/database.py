@@ -0,0 +1,128 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Database Access
+===============
+
+Central access point for the MongoDB connection used by the web application
+and its helper modules (items, ausleihung, user).
+
+Instead of opening a new MongoClient for every call, each process owns exactly
+one lazily created client with its own connection pool. The client is bound to
+the process ID it was created in, so gunicorn workers forked from a parent that
+already touched the database transparently build their own client instead of
+sharing sockets with the parent.
+
+Pool size and timeouts are configured through settings.MONGODB_*.
+"""
+import os
+import threading
+
+from pymongo import MongoClient
+
+import settings as cfg
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def _create_client():
+    """
+    Build a new MongoClient with the configured pool and timeout settings.
+
+    Returns:
+        MongoClient: Unconnected client (connects on first operation)
+    """
+    return MongoClient(
+        cfg.MONGODB_HOST,
+        cfg.MONGODB_PORT,
+        maxPoolSize=cfg.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=cfg.MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=cfg.MONGODB_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=cfg.MONGODB_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=cfg.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=cfg.MONGODB_SOCKET_TIMEOUT_MS,
+        connect=False,
+    )
+
+
+def get_client():
+    """
+    Return the MongoClient of the current process, creating it on first use.
+
+    A client inherited from a parent process (fork) is discarded and replaced,
+    because pymongo clients are not fork-safe.
+
+    Returns:
+        MongoClient: Process-wide pooled client
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            # Do not close an inherited client: its sockets belong to the parent
+            _client = _create_client()
+            _client_pid = pid
+        return _client
+
+
+def get_db():
+    """
+    Return the configured application database.
+
+    Returns:
+        Database: The database named by settings.MONGODB_DB
+    """
+    return get_client()[cfg.MONGODB_DB]
+
+
+def get_collection(name):
+    """
+    Return a collection of the application database.
+
+    Args:
+        name (str): Name of the collection
+
+    Returns:
+        Collection: The requested collection
+    """
+    return get_db()[name]
+
+
+def close_client():
+    """
+    Close the client of the current process, if any.
+    The next call to get_client() creates a fresh one.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            try:
+                _client.close()
+            except Exception as e:
+                print(f"Error closing MongoDB client: {e}")
+        _client = None
+        _client_pid = None
+
+
+def _reset_after_fork():
+    """Forget the parent's client in a freshly forked child process."""
+    global _client, _client_pid, _client_lock
+    _client = None
+    _client_pid = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
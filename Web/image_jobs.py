@@ -0,0 +1,430 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Background Image Processing
+===========================
+
+Uploaded images are stored as-is and referenced by the item right away; the
+WebP conversion and resizing run afterwards in a process pool, so uploads
+return without waiting for the encoder. Besides the main image, every
+conversion writes a ladder of width variants ('<hash>_<width>w.webp',
+widths from images.variant_widths) that the templates offer via srcset. The
+item keeps them in its manifest:
+
+    'ImageVariants': {'<hash of the image>': [{'width', 'height', 'file'}]}
+
+Every conversion is a job document in the 'image_jobs' collection:
+
+    {'_id', 'Item', 'Filename', 'User', 'Status', 'Result', 'Error',
+     'Attempts', 'Owner', 'Created', 'Updated'}
+
+Status moves from 'queued' to 'running' (claimed atomically by one process)
+to 'done' or 'failed'. When a job finishes, the item's Images entry is
+swapped to the optimised file in the content-addressed media store (see
+media_store.py) and the original upload is removed. If a conversion fails
+for good, the uploading user gets a flash message on their open pages. Jobs left
+behind by a restart are picked up again by resume_pending(), which runs as a
+scheduled job.
+
+Images uploaded before the variants existed are converted, and flat legacy
+uploads moved into the media store, by queueing them with:
+
+    python image_jobs.py --backfill
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import sys
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from bson.objectid import ObjectId
+from PIL import Image, ImageOps
+
+import database
+import item_cache
+import media_store
+import notifications
+import settings as cfg
+
+
+COLLECTION = 'image_jobs'
+MAX_ATTEMPTS = 3
+STALE_MINUTES = 10
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif'}
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+def is_processable(filename):
+    """
+    Check whether a file is a raster image the worker should convert.
+
+    Args:
+        filename (str): File name
+
+    Returns:
+        bool: True for raster image extensions
+    """
+    return os.path.splitext(filename or '')[1].lower() in IMAGE_EXTENSIONS
+
+
+def variant_filename(filename, width):
+    """
+    Name of the responsive variant of an image for the given width.
+
+    Args:
+        filename (str): Image file name (upload or converted WebP)
+        width (int): Variant width in pixels
+
+    Returns:
+        str: Variant file name, e.g. '<name>_400w.webp'
+    """
+    return f"{os.path.splitext(filename)[0]}_{int(width)}w.webp"
+
+
+def variant_filenames(filename):
+    """Return the names of all configured variants of an image."""
+    return [variant_filename(filename, w) for w in cfg.IMAGE_VARIANT_WIDTHS]
+
+
+def variant_key(filename):
+    """Key of an image in the item's ImageVariants manifest (no dots for MongoDB)."""
+    return os.path.splitext(filename)[0]
+
+
+def _save_webp(img, target, quality):
+    """Write a WebP through a temporary name, so readers never see a partial file."""
+    tmp_target = target + '.part'
+    img.save(tmp_target, 'WEBP', quality=quality, method=6)
+    os.replace(tmp_target, target)
+
+
+def optimize_image(upload_folder, filename, max_width=500, quality=80, variant_widths=()):
+    """
+    Convert an uploaded image to a resized WebP plus a ladder of smaller
+    variants for srcset. Runs in a worker process.
+
+    The image is decoded once. The converted image is placed into the media
+    store, and the variants are named after its hash; every variant is scaled
+    down from the next larger one, widest first. Widths at or above the
+    source width are skipped, except the narrowest, so small uploads still get
+    a thumbnail. Variants that already exist for the same content are not
+    encoded again. WebP uploads are stored as they are. The upload itself is
+    left in place; the caller removes it once the item references the
+    converted file.
+
+    Args:
+        upload_folder (str): Directory of the upload
+        filename (str): Uploaded or stored file name
+        max_width (int): Maximum width of the converted image
+        quality (int): WebP quality
+        variant_widths (iterable): Widths of the srcset variants
+
+    Returns:
+        dict: {'original': stored file name, 'width', 'height', 'size',
+               'variants': [{'width', 'height', 'file'}] sorted by width}
+    """
+    source = media_store.path_for(filename, upload_folder)
+
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'P') else 'RGB')
+
+        main = img
+        if os.path.splitext(filename)[1].lower() == '.webp':
+            main_name = filename if media_store.is_stored(filename) else \
+                media_store.put_file(source, upload_folder, move=False)
+        else:
+            if img.width > max_width:
+                main = img.resize((max_width, int(img.height * max_width / img.width)),
+                                  Image.Resampling.LANCZOS)
+            tmp_main = os.path.join(upload_folder, f"{uuid.uuid4().hex}.webp")
+            _save_webp(main, tmp_main, quality)
+            main_name = media_store.put_file(tmp_main, upload_folder, move=True)
+
+        widths = sorted({int(w) for w in variant_widths if int(w) > 0})
+        ladder = [w for w in widths if w < img.width] or widths[:1]
+        variants = []
+        current = img
+        for w in sorted(ladder, reverse=True):
+            if current.width > w:
+                current = current.resize((w, max(1, round(current.height * w / current.width))),
+                                         Image.Resampling.LANCZOS)
+            name = variant_filename(main_name, w)
+            target = media_store.path_for(name, upload_folder)
+            if not os.path.exists(target):
+                _save_webp(current, target, quality)
+            variants.append({'width': current.width, 'height': current.height, 'file': name})
+        width, height = main.size
+
+    return {
+        'original': main_name,
+        'width': width,
+        'height': height,
+        'size': os.path.getsize(media_store.path_for(main_name, upload_folder)),
+        'variants': sorted(variants, key=lambda v: v['width']),
+    }
+
+
+def _remove_upload(filename):
+    """Remove a flat (not content-addressed) upload, ignoring files that are gone."""
+    try:
+        os.remove(os.path.join(cfg.UPLOAD_FOLDER, filename))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Error removing image {filename}: {e}")
+
+
+def _get_executor():
+    """Return the process pool of this process, creating it after a fork."""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # Forking a worker that runs threads and holds a MongoClient can
+            # copy held locks into the child, so workers start from a clean
+            # forkserver process (spawn where forkserver is unavailable)
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, int(cfg.IMAGE_WORKERS)),
+                mp_context=multiprocessing.get_context(method)
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _collection():
+    return database.get_db()[COLLECTION]
+
+
+def _apply_result(job, result):
+    """
+    Point the item at the stored, optimised file and its variant manifest.
+
+    The item takes over a reference on the stored file; the upload it
+    replaces is released (stored) or removed (flat upload).
+    """
+    filename = job['Filename']
+    new_name = result.get('original')
+    if not new_name:
+        return
+    variants = result.get('variants') or []
+    items = database.get_db()['items']
+    now = datetime.datetime.now()
+
+    if new_name == filename:
+        # Already stored as WebP; only the variants are new
+        media_store.set_variants(new_name, variants)
+        if job.get('Item'):
+            items.update_one(
+                {'_id': ObjectId(job['Item']), 'Images': filename},
+                {'$set': {f"ImageVariants.{variant_key(new_name)}": variants, 'LastUpdated': now}}
+            )
+            item_cache.changed([job['Item']])
+        return
+
+    media_store.add_ref(new_name, variants, source=media_store.get_source(filename))
+    swapped = 0
+    if job.get('Item'):
+        swapped = items.update_one(
+            {'_id': ObjectId(job['Item']), 'Images': filename},
+            {'$set': {
+                'Images.$': new_name,
+                f"ImageVariants.{variant_key(new_name)}": variants,
+                'LastUpdated': now,
+            }}
+        ).modified_count
+        item_cache.changed([job['Item']])
+    if not swapped:
+        # The item or image is gone; give back the reference taken above
+        media_store.release([new_name])
+    elif media_store.is_stored(filename):
+        media_store.release([filename])
+    else:
+        _remove_upload(filename)
+
+
+def _finish(job, future):
+    """Store the outcome of a finished worker run."""
+    now = datetime.datetime.now()
+    try:
+        result = future.result()
+    except Exception as e:
+        failed = job.get('Attempts', 0) + 1 >= MAX_ATTEMPTS
+        _collection().update_one(
+            {'_id': job['_id']},
+            {'$set': {'Status': 'failed' if failed else 'queued', 'Error': str(e), 'Updated': now}}
+        )
+        print(f"Image job {job['_id']} for {job['Filename']} failed: {e}")
+        if failed and job.get('User'):
+            notifications.flash(job['User'], f"Das Bild '{job['Filename']}' konnte nicht optimiert werden.", 'error')
+        return
+    try:
+        _apply_result(job, result)
+        _collection().update_one(
+            {'_id': job['_id']},
+            {'$set': {'Status': 'done', 'Result': result, 'Error': None, 'Updated': now}}
+        )
+    except Exception as e:
+        print(f"Error completing image job {job['_id']}: {e}")
+
+
+def _submit(job_id):
+    """Claim a queued job and hand it to the process pool."""
+    job = _collection().find_one_and_update(
+        {'_id': job_id, 'Status': 'queued'},
+        {'$set': {'Status': 'running', 'Owner': os.getpid(), 'Updated': datetime.datetime.now()}}
+    )
+    if not job:
+        return False
+    future = _get_executor().submit(
+        optimize_image, cfg.UPLOAD_FOLDER, job['Filename'], cfg.IMAGE_MAX_WIDTH, cfg.IMAGE_QUALITY,
+        cfg.IMAGE_VARIANT_WIDTHS
+    )
+    future.add_done_callback(lambda f: _finish(job, f))
+    _collection().update_one({'_id': job_id}, {'$inc': {'Attempts': 1}})
+    return True
+
+
+def enqueue(item_id, filenames, submit=True, user=None):
+    """
+    Queue the optimisation of uploaded images of an item.
+
+    Args:
+        item_id (str): ID of the item referencing the files
+        filenames (list): Uploaded file names
+        submit (bool): Start the jobs in this process; otherwise they are
+            left for resume_pending()
+        user (str, optional): Uploading user, notified if a job fails
+
+    Returns:
+        list: IDs of the created jobs as strings
+    """
+    now = datetime.datetime.now()
+    job_ids = []
+    for filename in filenames or []:
+        if not is_processable(filename):
+            continue
+        job = {
+            'Item': str(item_id) if item_id else None,
+            'Filename': filename,
+            'User': user,
+            'Status': 'queued',
+            'Attempts': 0,
+            'Created': now,
+            'Updated': now,
+        }
+        try:
+            job_id = _collection().insert_one(job).inserted_id
+            job_ids.append(str(job_id))
+            if submit:
+                _submit(job_id)
+        except Exception as e:
+            print(f"Error queueing image job for {filename}: {e}")
+    return job_ids
+
+
+def resume_pending():
+    """
+    Requeue jobs of crashed processes and start all queued jobs.
+
+    Returns:
+        int: Number of jobs started
+    """
+    stale_before = datetime.datetime.now() - datetime.timedelta(minutes=STALE_MINUTES)
+    _collection().update_many(
+        {'Status': 'running', 'Updated': {'$lt': stale_before}},
+        {'$set': {'Status': 'queued', 'Updated': datetime.datetime.now()}}
+    )
+    started = 0
+    for job in _collection().find({'Status': 'queued', 'Attempts': {'$lt': MAX_ATTEMPTS}}, {'_id': 1}):
+        if _submit(job['_id']):
+            started += 1
+    return started
+
+
+def get_jobs(item_id=None, job_ids=None):
+    """
+    Return the state of image jobs for the status endpoint.
+
+    Args:
+        item_id (str, optional): Only jobs of this item
+        job_ids (list, optional): Only these job IDs
+
+    Returns:
+        list: Job dicts with string IDs
+    """
+    query = {}
+    if item_id:
+        query['Item'] = str(item_id)
+    if job_ids:
+        query['_id'] = {'$in': [ObjectId(j) for j in job_ids if ObjectId.is_valid(j)]}
+    if not query:
+        return []
+    jobs = []
+    for job in _collection().find(query).sort('Created', 1):
+        jobs.append({
+            'id': str(job['_id']),
+            'item': job.get('Item'),
+            'filename': job.get('Filename'),
+            'status': job.get('Status'),
+            'result': (job.get('Result') or {}).get('original'),
+            'error': job.get('Error'),
+        })
+    return jobs
+
+
+def backfill_variants():
+    """
+    Queue jobs for item images that have no variant manifest yet.
+
+    The jobs are only stored; the scheduler leader runs them through
+    resume_pending().
+
+    Returns:
+        int: Number of queued jobs
+    """
+    queued = 0
+    items = database.get_db()['items'].find({'Images.0': {'$exists': True}},
+                                            {'Images': 1, 'ImageVariants': 1})
+    for item in items:
+        manifest = item.get('ImageVariants') or {}
+        missing = [f for f in item.get('Images', [])
+                   if isinstance(f, str) and variant_key(f) not in manifest]
+        queued += len(enqueue(item['_id'], missing, submit=False))
+    return queued
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background image processing jobs")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Queue variant generation for images without variants")
+    args = parser.parse_args()
+
+    try:
+        if args.backfill:
+            print(f"Queued {backfill_variants()} image jobs.")
+            return 0
+        for state in ('queued', 'running', 'done', 'failed'):
+            print(f"{state}: {_collection().count_documents({'Status': state})}")
+        return 0
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
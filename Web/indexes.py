@@ -0,0 +1,380 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Index Registry and Schema Migrations
+====================================
+
+Declares every MongoDB index the application relies on and a small, versioned
+list of data migrations. Both are applied idempotently, either at application
+startup or from the command line:
+
+    python indexes.py            # ensure indexes and run pending migrations
+    python indexes.py --status   # show schema version and existing indexes
+
+The current schema version is stored in the 'schema_migrations' collection as
+a single document {'_id': 'schema', 'version': <int>}. Migrations must be
+idempotent, since several gunicorn workers may start at the same time.
+"""
+import argparse
+import datetime
+import sys
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+import database
+
+
+MIGRATIONS_COLLECTION = 'schema_migrations'
+
+
+# Index registry: collection name -> list of index specifications.
+# Each entry has the index keys, a stable name and optional create_index options.
+INDEXES = {
+    'ausleihungen': [
+        {
+            'name': 'item_status_start',
+            'keys': [('Item', ASCENDING), ('Status', ASCENDING), ('Start', ASCENDING)],
+        },
+        {
+            'name': 'user_status',
+            'keys': [('User', ASCENDING), ('Status', ASCENDING)],
+        },
+        {
+            'name': 'conflict_status',
+            'keys': [('ConflictDetected', ASCENDING), ('Status', ASCENDING)],
+        },
+        {
+            'name': 'start_id',
+            'keys': [('Start', DESCENDING), ('_id', DESCENDING)],
+        },
+        {
+            'name': 'last_updated',
+            'keys': [('LastUpdated', ASCENDING)],
+        },
+        # Partial indexes only cover open bookings, which the scheduler scans
+        {
+            'name': 'planned_start',
+            'keys': [('Start', ASCENDING)],
+            'options': {'partialFilterExpression': {'Status': 'planned'}},
+        },
+        {
+            'name': 'active_end',
+            'keys': [('End', ASCENDING)],
+            'options': {'partialFilterExpression': {'Status': 'active'}},
+        },
+    ],
+    'items': [
+        # Empty codes are stored as None or '', so only non-empty strings are
+        # indexed. This behaves like a sparse index but tolerates blank codes.
+        {
+            'name': 'code_4_unique',
+            'keys': [('Code_4', ASCENDING)],
+            'options': {
+                'unique': True,
+                'partialFilterExpression': {'Code_4': {'$gt': ''}},
+            },
+        },
+        {
+            'name': 'name_id',
+            'keys': [('Name', ASCENDING), ('_id', ASCENDING)],
+        },
+        {
+            'name': 'last_updated',
+            'keys': [('LastUpdated', ASCENDING)],
+        },
+        {
+            'name': 'verfuegbar_user',
+            'keys': [('Verfuegbar', ASCENDING), ('User', ASCENDING)],
+        },
+    ],
+    'users': [
+        {
+            'name': 'username',
+            'keys': [('Username', ASCENDING)],
+        },
+    ],
+    'filter_presets': [
+        {
+            'name': 'filter_num',
+            'keys': [('filter_num', ASCENDING)],
+        },
+    ],
+    'occupancy': [
+        {
+            'name': 'item_date',
+            'keys': [('Item', ASCENDING), ('Date', ASCENDING)],
+        },
+        {
+            'name': 'booking_id',
+            'keys': [('Bookings.id', ASCENDING)],
+        },
+    ],
+    'settings': [
+        {
+            'name': 'setting_type',
+            'keys': [('setting_type', ASCENDING)],
+        },
+    ],
+    'image_jobs': [
+        {
+            'name': 'status_updated',
+            'keys': [('Status', ASCENDING), ('Updated', ASCENDING)],
+        },
+        {
+            'name': 'item_created',
+            'keys': [('Item', ASCENDING), ('Created', ASCENDING)],
+        },
+    ],
+    'media_refs': [
+        # Book covers are looked up by download URL to avoid fetching them again
+        {
+            'name': 'source',
+            'keys': [('Source', ASCENDING)],
+            'options': {'sparse': True},
+        },
+        # media_store.sweep() looks for old unreferenced files
+        {
+            'name': 'unreferenced',
+            'keys': [('Refs', ASCENDING), ('Updated', ASCENDING)],
+        },
+    ],
+    'item_tombstones': [
+        # Kept as long as incremental syncs may resume (items.TOMBSTONE_DAYS)
+        {
+            'name': 'deleted_ttl',
+            'keys': [('Deleted', ASCENDING)],
+            'options': {'expireAfterSeconds': 30 * 86400},
+        },
+    ],
+    'notifications': [
+        # Clients only resume from recent events; older ones are dropped
+        {
+            'name': 'created_ttl',
+            'keys': [('Created', ASCENDING)],
+            'options': {'expireAfterSeconds': 86400},
+        },
+    ],
+    'scheduler_lease': [
+        # Removes leases of crashed leaders; expiry itself is checked on acquire
+        {
+            'name': 'expires_ttl',
+            'keys': [('expires', ASCENDING)],
+            'options': {'expireAfterSeconds': 0},
+        },
+    ],
+}
+
+
+def ensure_indexes(db=None):
+    """
+    Create all registered indexes that do not exist yet.
+
+    An index that cannot be built (e.g. duplicate Code_4 values for the unique
+    index) is reported and skipped, so the remaining indexes are still created.
+
+    Args:
+        db (Database, optional): Database to use, defaults to database.get_db()
+
+    Returns:
+        list: Names of indexes that could not be created
+    """
+    if db is None:
+        db = database.get_db()
+
+    failed = []
+    for coll_name, specs in INDEXES.items():
+        collection = db[coll_name]
+        for spec in specs:
+            options = dict(spec.get('options', {}))
+            try:
+                collection.create_index(spec['keys'], name=spec['name'], **options)
+            except OperationFailure as e:
+                print(f"Error creating index {coll_name}.{spec['name']}: {e}")
+                failed.append(f"{coll_name}.{spec['name']}")
+    return failed
+
+
+def _migration_initial_indexes(db):
+    """Build the registered indexes for existing installations."""
+    ensure_indexes(db)
+
+
+def _migration_normalize_empty_codes(db):
+    """Remove blank Code_4 values so they never take part in uniqueness checks."""
+    result = db['items'].update_many(
+        {'Code_4': {'$in': ['', None]}},
+        {'$unset': {'Code_4': ''}}
+    )
+    if result.modified_count:
+        import item_cache
+        item_cache.changed()
+        print(f"Removed {result.modified_count} blank Code_4 values")
+
+
+def _migration_report_duplicate_codes(db):
+    """Report duplicate Code_4 values that block the unique index."""
+    duplicates = list(db['items'].aggregate([
+        {'$match': {'Code_4': {'$gt': ''}}},
+        {'$group': {'_id': '$Code_4', 'count': {'$sum': 1}, 'ids': {'$push': '$_id'}}},
+        {'$match': {'count': {'$gt': 1}}},
+    ]))
+    for dup in duplicates:
+        ids = ', '.join(str(i) for i in dup['ids'])
+        print(f"Warning: Code_4 '{dup['_id']}' is used by {dup['count']} items ({ids})")
+
+
+def _migration_resolve_duplicate_codes(db):
+    """
+    Keep each duplicate Code_4 on its oldest item and build the unique index.
+
+    The code is removed from the other items and kept in 'Code_4_Duplicate',
+    so administrators can find them and assign a new code.
+    """
+    duplicates = db['items'].aggregate([
+        {'$match': {'Code_4': {'$gt': ''}}},
+        {'$group': {'_id': '$Code_4', 'count': {'$sum': 1}, 'ids': {'$push': '$_id'}}},
+        {'$match': {'count': {'$gt': 1}}},
+    ])
+    flagged = 0
+    for dup in duplicates:
+        keep, *others = sorted(dup['ids'])
+        result = db['items'].update_many(
+            {'_id': {'$in': others}},
+            {'$set': {'Code_4_Duplicate': dup['_id']}, '$unset': {'Code_4': ''}}
+        )
+        flagged += result.modified_count
+        ids = ', '.join(str(i) for i in others)
+        print(f"Warning: Code_4 '{dup['_id']}' kept on item {keep}, removed from {ids}")
+    if flagged:
+        import item_cache
+        item_cache.changed()
+
+    spec = next(s for s in INDEXES['items'] if s['name'] == 'code_4_unique')
+    db['items'].create_index(spec['keys'], name=spec['name'], **spec['options'])
+
+
+def _migration_build_occupancy(db):
+    """Fill the period occupancy collection from existing bookings."""
+    # Imported here: occupancy pulls in the items module
+    import occupancy
+    count = occupancy.rebuild()
+    print(f"Built occupancy from {count} planned/active bookings")
+
+
+# Versioned migrations, applied in order. Never reorder or renumber entries.
+MIGRATIONS = [
+    (1, 'initial indexes', _migration_initial_indexes),
+    (2, 'normalize empty item codes', _migration_normalize_empty_codes),
+    (3, 'report duplicate item codes', _migration_report_duplicate_codes),
+    (4, 'build period occupancy', _migration_build_occupancy),
+    (5, 'store booked exemplar in occupancy', _migration_build_occupancy),
+    (6, 'resolve duplicate item codes', _migration_resolve_duplicate_codes),
+]
+
+
+def get_schema_version(db=None):
+    """
+    Return the schema version stored in the database.
+
+    Args:
+        db (Database, optional): Database to use, defaults to database.get_db()
+
+    Returns:
+        int: Current schema version, 0 for a fresh installation
+    """
+    if db is None:
+        db = database.get_db()
+    doc = db[MIGRATIONS_COLLECTION].find_one({'_id': 'schema'})
+    return int(doc.get('version', 0)) if doc else 0
+
+
+def run_migrations(db=None):
+    """
+    Apply all migrations newer than the stored schema version.
+
+    Args:
+        db (Database, optional): Database to use, defaults to database.get_db()
+
+    Returns:
+        int: Schema version after running
+    """
+    if db is None:
+        db = database.get_db()
+
+    version = get_schema_version(db)
+    for number, description, func in MIGRATIONS:
+        if number <= version:
+            continue
+        print(f"Running migration {number}: {description}")
+        func(db)
+        # $max keeps the version monotonic if another worker got further already
+        db[MIGRATIONS_COLLECTION].update_one(
+            {'_id': 'schema'},
+            {'$max': {'version': number}, '$set': {'updated': datetime.datetime.now()}},
+            upsert=True
+        )
+        version = number
+    return version
+
+
+def bootstrap():
+    """
+    Ensure indexes and run pending migrations, reporting errors instead of raising.
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        db = database.get_db()
+        ensure_indexes(db)
+        run_migrations(db)
+        return True
+    except Exception as e:
+        print(f"Error bootstrapping database schema: {e}")
+        return False
+
+
+def print_status(db=None):
+    """Print the schema version and the indexes of all registered collections."""
+    if db is None:
+        db = database.get_db()
+    print(f"Schema version: {get_schema_version(db)} (latest: {MIGRATIONS[-1][0]})")
+    for coll_name in INDEXES:
+        names = sorted(db[coll_name].index_information().keys())
+        print(f"  {coll_name}: {', '.join(names)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ensure MongoDB indexes and run schema migrations")
+    parser.add_argument("--status", action="store_true", help="Only show schema version and indexes")
+    parser.add_argument("--indexes-only", action="store_true", help="Ensure indexes without running migrations")
+    args = parser.parse_args()
+
+    try:
+        db = database.get_db()
+        if args.status:
+            print_status(db)
+            return 0
+        failed = ensure_indexes(db)
+        if not args.indexes_only:
+            version = run_migrations(db)
+            print(f"Schema is at version {version}")
+        if failed:
+            print(f"Indexes not created: {', '.join(failed)}")
+            return 1
+        print("Indexes are up to date.")
+        return 0
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
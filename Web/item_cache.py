@@ -0,0 +1,268 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Item Cache
+==========
+
+Read-through cache of item documents in every worker process, used by
+items.get_item() and items.get_items(). Entries are bounded by
+cache.max_items (least recently used are evicted) and cache.ttl_seconds,
+which also limits how long writes made outside the application (restore
+tool, mongo shell) stay invisible.
+
+Every write to the items collection calls changed() with the IDs it touched.
+This bumps the catalog version in the 'counters' collection and appends the
+IDs to the change log in the same atomic update:
+
+    {'_id': 'catalog', 'seq': <version>, 'changes': [[<item id>, ...], ...]}
+
+The last entry of 'changes' belongs to 'seq', the one before to seq - 1 and
+so on; None stands for "all items". At most every
+cache.check_interval_seconds a process compares its version with 'seq' and
+drops only the documents changed since. If it fell behind the change log,
+everything is dropped.
+
+Returned documents are shallow copies; callers must not modify nested lists
+or dicts in place.
+"""
+import collections
+import threading
+import time
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+import database
+import settings as cfg
+
+
+COUNTER_ID = 'catalog'
+CHANGE_LOG_SIZE = 500
+
+_lock = threading.RLock()
+_sync_lock = threading.Lock()
+_entries = collections.OrderedDict()   # item id -> (document, loaded at)
+_stale = set()         # IDs to reload before the complete catalog is served
+_complete_at = None    # When _entries last held every item, or None
+_generation = 0        # Bumped on every invalidation; guards concurrent loads
+_version = None
+_last_check = 0.0
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+
+def changed(item_ids=None):
+    """
+    Record a write to the items collection.
+
+    Args:
+        item_ids (list, optional): IDs of the written items; None if the
+            write may have touched any item (e.g. update_many)
+    """
+    global _version
+    ids = None if item_ids is None else sorted({str(i) for i in item_ids})
+    _invalidate(ids)
+    try:
+        doc = database.get_db()['counters'].find_one_and_update(
+            {'_id': COUNTER_ID},
+            {'$inc': {'seq': 1}, '$push': {'changes': {'$each': [ids], '$slice': -CHANGE_LOG_SIZE}}},
+            projection={'seq': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        with _lock:
+            # Nobody else wrote in between, so this process is still in sync
+            if _version is not None and doc['seq'] == _version + 1:
+                _version = doc['seq']
+    except Exception as e:
+        print(f"Error publishing item change: {e}")
+
+
+def _invalidate(ids):
+    """Drop changed documents; None drops everything."""
+    global _generation, _complete_at
+    with _lock:
+        _generation += 1
+        _stats['invalidations'] += 1
+        if ids is None:
+            _entries.clear()
+            _stale.clear()
+            _complete_at = None
+            return
+        for item_id in ids:
+            _entries.pop(item_id, None)
+            if _complete_at is not None:
+                _stale.add(item_id)
+
+
+def _sync():
+    """Pick up changes of other processes, at most every check interval."""
+    global _last_check
+    now = time.monotonic()
+    if now - _last_check < cfg.CACHE_CHECK_INTERVAL:
+        return
+    # One thread checks; the others keep using the cache meanwhile
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        _last_check = now
+        _sync_locked()
+    finally:
+        _sync_lock.release()
+
+
+def _sync_locked():
+    global _version
+    counters = database.get_db()['counters']
+    doc = counters.find_one({'_id': COUNTER_ID}, {'seq': 1})
+    version = doc['seq'] if doc else 0
+    if _version is None or version == _version:
+        with _lock:
+            _version = version if _version is None else max(_version, version)
+        return
+    if version < _version:
+        # Counter was reset (e.g. restored database)
+        _invalidate(None)
+        with _lock:
+            _version = version
+        return
+
+    doc = counters.find_one({'_id': COUNTER_ID}, {'seq': 1, 'changes': 1}) or {}
+    version = doc.get('seq', version)
+    changes = doc.get('changes') or []
+    missed = version - _version
+    if missed > len(changes) or any(ids is None for ids in changes[len(changes) - missed:]):
+        _invalidate(None)
+    else:
+        _invalidate(sorted({i for ids in changes[len(changes) - missed:] for i in ids}))
+    with _lock:
+        _version = max(_version, version)
+
+
+def version():
+    """
+    Return the catalog version this process is in sync with.
+
+    Changes of other processes are seen after at most one check interval.
+
+    Returns:
+        int: Catalog version
+    """
+    _sync()
+    return _version or 0
+
+
+def _store(docs, generation, now):
+    """Add loaded documents unless they were invalidated meanwhile. Caller must hold _lock."""
+    global _complete_at
+    if generation != _generation:
+        return False
+    for doc in docs:
+        key = str(doc['_id'])
+        _entries[key] = (doc, now)
+        _entries.move_to_end(key)
+    while len(_entries) > cfg.CACHE_MAX_ITEMS:
+        _entries.popitem(last=False)
+        _stats['evictions'] += 1
+        _complete_at = None
+        _stale.clear()
+    return True
+
+
+def get_item(item_id):
+    """
+    Return one item document.
+
+    Args:
+        item_id (str): ID of the item
+
+    Returns:
+        dict: Copy of the item document or None if not found
+    """
+    key = str(item_id)
+    _sync()
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry and now - entry[1] < cfg.CACHE_TTL_SECONDS:
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            return dict(entry[0])
+        _stats['misses'] += 1
+        generation = _generation
+
+    doc = database.get_db()['items'].find_one({'_id': ObjectId(key)})
+    if doc is None:
+        return None
+    with _lock:
+        _store([doc], generation, now)
+    return dict(doc)
+
+
+def get_all():
+    """
+    Return all item documents.
+
+    Returns:
+        list: Copies of all item documents
+    """
+    global _complete_at
+    _sync()
+    now = time.monotonic()
+    items = database.get_db()['items']
+    with _lock:
+        complete = _complete_at is not None and now - _complete_at < cfg.CACHE_TTL_SECONDS
+        stale = list(_stale) if complete else []
+        generation = _generation
+
+    if complete and stale:
+        docs = list(items.find({'_id': {'$in': [ObjectId(i) for i in stale if ObjectId.is_valid(i)]}}))
+        with _lock:
+            if _store(docs, generation, now):
+                _stale.difference_update(stale)
+            else:
+                complete = False
+
+    if complete:
+        with _lock:
+            if _complete_at is not None and not _stale:
+                _stats['hits'] += 1
+                return [dict(doc) for doc, _ in _entries.values()]
+
+    with _lock:
+        _stats['misses'] += 1
+        generation = _generation
+    docs = list(items.find())
+    with _lock:
+        if len(docs) <= cfg.CACHE_MAX_ITEMS and generation == _generation:
+            _entries.clear()
+            _stale.clear()
+            _store(docs, generation, now)
+            _complete_at = now
+    return [dict(doc) for doc in docs]
+
+
+def clear():
+    """Drop all cached documents of this process."""
+    _invalidate(None)
+
+
+def stats():
+    """
+    Return the counters of this process.
+
+    Returns:
+        dict: hits, misses, evictions, invalidations, entries, version and
+              whether the complete catalog is cached
+    """
+    with _lock:
+        result = dict(_stats)
+        result['entries'] = len(_entries)
+        result['complete'] = _complete_at is not None
+        result['version'] = _version
+    return result
@@ -26,16 +26,33 @@ Collection Structure:
    Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
    For commercial licensing inquiries: https://github.com/AIIrondev
 '''
-from pymongo import MongoClient
+import database
+import item_cache
+import metadata
+import notifications
+import payloads
+import search
 from bson.objectid import ObjectId
 import datetime
-import settings as cfg
+import re
+import json
+import base64
+
+
+# Deleted items are remembered for clients that sync incrementally (see
+# get_item_changes); clients that were away longer reload everything
+TOMBSTONE_COLLECTION = 'item_tombstones'
+TOMBSTONE_DAYS = 30
+# Writes take their LastUpdated before they are committed, so a sync re-reads
+# this many seconds before its cursor
+SYNC_OVERLAP_SECONDS = 5
 
 
 # === ITEM MANAGEMENT ===
 
 def add_item(name, ort, beschreibung, images=None, filter=None, filter2=None, filter3=None,
-             ansch_jahr=None, ansch_kost=None, code_4=None, reservierbar=True):
+             ansch_jahr=None, ansch_kost=None, code_4=None, reservierbar=True,
+             image_variants=None):
     """
     Add a new item to the inventory.
     
@@ -51,13 +68,14 @@ def add_item(name, ort, beschreibung, images=None, filter=None, filter2=None, fi
         ansch_kost (float, optional): Cost of acquisition
         code_4 (str, optional): 4-digit identification code
         reservierbar (bool, optional): Whether the item can be reserved in advance
+        image_variants (dict, optional): Variant manifests of images that
+            already have variants, keyed like ImageVariants
         
     Returns:
         ObjectId: ID of the new item or None if failed
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
 
         # Set default values for optional parameters
@@ -80,10 +98,13 @@ def add_item(name, ort, beschreibung, images=None, filter=None, filter2=None, fi
             'Created': datetime.datetime.now(),
             'LastUpdated': datetime.datetime.now()
         }
+        if image_variants:
+            item['ImageVariants'] = image_variants
         result = items.insert_one(item)
         item_id = result.inserted_id
+        search.index_item(item)
+        item_cache.changed([item_id])
 
-        client.close()
         return item_id
     except Exception as e:
         print(f"Error adding item: {e}")
@@ -101,11 +122,17 @@ def remove_item(id):
         bool: True if successful, False otherwise
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         result = items.delete_one({'_id': ObjectId(id)})
-        client.close()
+        search.remove_item(id)
+        item_cache.changed([id])
+        if result.deleted_count:
+            db[TOMBSTONE_COLLECTION].update_one(
+                {'_id': str(id)},
+                {'$set': {'Deleted': datetime.datetime.now()}},
+                upsert=True
+            )
         return result.deleted_count > 0
     except Exception as e:
         print(f"Error removing item: {e}")
@@ -136,8 +163,7 @@ def update_item(id, name, ort, beschreibung, images=None, verfuegbar=True,
         bool: True if successful, False otherwise
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
 
         # Set default values for optional parameters
@@ -164,8 +190,9 @@ def update_item(id, name, ort, beschreibung, images=None, verfuegbar=True,
             {'_id': ObjectId(id)},
             {'$set': update_data}
         )
+        search.index_item(dict(update_data, _id=id))
+        item_cache.changed([id])
 
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         print(f"Error updating item: {e}")
@@ -185,8 +212,7 @@ def update_item_status(id, verfuegbar, user=None):
         bool: True if successful, False otherwise
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
 
         update_data = {
@@ -205,7 +231,9 @@ def update_item_status(id, verfuegbar, user=None):
             {'$set': update_data}
         )
 
-        client.close()
+        if result.modified_count > 0:
+            item_cache.changed([id])
+            notifications.item_changed(id, verfuegbar, user)
         return result.modified_count > 0
     except Exception as e:
         print(f"Error updating item status: {e}")
@@ -224,8 +252,7 @@ def update_item_exemplare_status(id, exemplare_status):
         bool: True if successful, False otherwise
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
 
         update_data = {
@@ -237,8 +264,8 @@ def update_item_exemplare_status(id, exemplare_status):
             {'_id': ObjectId(id)},
             {'$set': update_data}
         )
+        item_cache.changed([id])
 
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         print(f"Error updating exemplar status: {e}")
@@ -260,22 +287,18 @@ def is_code_unique(code_4, exclude_id=None):
         # Empty codes are not considered unique
         return False
         
-    client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-    db = client[cfg.MONGODB_DB]
+    db = database.get_db()
     items = db['items']
     
-    # Build query to find items with this code
-    query = {'Code_4': code_4}
-    
-    # If we're editing an item, exclude it from the uniqueness check
-    if exclude_id:
-        query['_id'] = {'$ne': ObjectId(exclude_id)}
-    
-    # Check if any items with this code exist
-    count = items.count_documents(query)
+    # Code_4 is indexed by 'code_4_unique' (see indexes.py), so this is a
+    # single index lookup. Concurrent writes are only rejected once that
+    # index has been built, which needs duplicate codes to be resolved first
+    existing = items.find_one({'Code_4': code_4}, {'_id': 1})
+    if existing is None:
+        return True
     
-    client.close()
-    return count == 0
+    # If we're editing an item, its own code does not count as a conflict
+    return bool(exclude_id) and str(existing['_id']) == str(exclude_id)
 
 
 # === ITEM RETRIEVAL ===
@@ -288,21 +311,57 @@ def get_items():
         list: List of all inventory item documents with string IDs
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        items = db['items']
-        items_return = items.find()
-        items_list = []
-        for item in items_return:
+        items_list = item_cache.get_all()
+        for item in items_list:
             item['_id'] = str(item['_id'])
-            items_list.append(item)
-        client.close()
         return items_list
     except Exception as e:
         print(f"Error retrieving items: {e}")
         return []
 
 
+def get_item_changes(since):
+    """
+    Retrieve the changes of the catalog since a point in time.
+
+    Args:
+        since (datetime): Cursor of the previous sync
+
+    Returns:
+        tuple: (changed items with string IDs, IDs of deleted items), or None
+               if deletions that old are no longer recorded
+    """
+    now = datetime.datetime.now()
+    if since > now or since < now - datetime.timedelta(days=TOMBSTONE_DAYS):
+        return None
+    try:
+        db = database.get_db()
+        start = since - datetime.timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        items_list = []
+        for item in db['items'].find({'LastUpdated': {'$gte': start}}):
+            item['_id'] = str(item['_id'])
+            items_list.append(item)
+        deleted = [doc['_id'] for doc in db[TOMBSTONE_COLLECTION].find({'Deleted': {'$gte': start}}, {'_id': 1})]
+        return items_list, deleted
+    except Exception as e:
+        print(f"Error retrieving item changes: {e}")
+        return None
+
+
+def count_items():
+    """
+    Return the number of items in the inventory (from collection metadata).
+
+    Returns:
+        int: Number of items or None on error
+    """
+    try:
+        return database.get_db()['items'].estimated_document_count()
+    except Exception as e:
+        print(f"Error counting items: {e}")
+        return None
+
+
 def get_available_items():
     """
     Retrieve all available inventory items.
@@ -311,15 +370,13 @@ def get_available_items():
         list: List of available inventory item documents with string IDs
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         items_return = items.find({'Verfuegbar': True})
         items_list = []
         for item in items_return:
             item['_id'] = str(item['_id'])
             items_list.append(item)
-        client.close()
         return items_list
     except Exception as e:
         print(f"Error retrieving available items: {e}")
@@ -334,15 +391,13 @@ def get_borrowed_items():
         list: List of borrowed inventory item documents with string IDs
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         items_return = items.find({'Verfuegbar': False})
         items_list = []
         for item in items_return:
             item['_id'] = str(item['_id'])
             items_list.append(item)
-        client.close()
         return items_list
     except Exception as e:
         print(f"Error retrieving borrowed items: {e}")
@@ -360,17 +415,225 @@ def get_item(id):
         dict: The inventory item document or None if not found
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        items = db['items']
-        item = items.find_one({'_id': ObjectId(id)})
-        client.close()
-        return item
+        return item_cache.get_item(id)
     except Exception as e:
         print(f"Error retrieving item: {e}")
         return None
 
 
+def get_parent_item_id(item_id):
+    """
+    Map an exemplar ID of the form '<id>_<n>' back to the ID of its parent item.
+
+    Args:
+        item_id (str): Item or exemplar ID as stored in an ausleihung
+
+    Returns:
+        str: The parent item ID (unchanged if it is not an exemplar ID)
+    """
+    item_id = str(item_id) if item_id is not None else ''
+    base, sep, suffix = item_id.rpartition('_')
+    if sep and suffix.isdigit():
+        return base
+    return item_id
+
+
+def get_items_by_ids(ids, fields=('Name', 'Code_4')):
+    """
+    Resolve many item IDs with a single $in query instead of one lookup per ID.
+
+    Exemplar IDs ('<id>_<n>') are resolved to their parent item. Invalid IDs and
+    IDs without a matching item are missing from the result.
+
+    Args:
+        ids (iterable): Item or exemplar IDs (str or ObjectId)
+        fields (iterable, optional): Fields to project, defaults to Name and Code_4
+
+    Returns:
+        dict: Maps every requested ID (as str) to its projected item document
+    """
+    parents = {}
+    for raw_id in ids:
+        if raw_id is None:
+            continue
+        parent_id = get_parent_item_id(raw_id)
+        if ObjectId.is_valid(parent_id):
+            parents.setdefault(parent_id, set()).add(str(raw_id))
+
+    if not parents:
+        return {}
+
+    try:
+        db = database.get_db()
+        items = db['items']
+        projection = {field: 1 for field in fields}
+        cursor = items.find(
+            {'_id': {'$in': [ObjectId(parent_id) for parent_id in parents]}},
+            projection
+        )
+
+        resolved = {}
+        for item in cursor:
+            for requested_id in parents.get(str(item['_id']), ()):
+                resolved[requested_id] = item
+        return resolved
+    except Exception as e:
+        print(f"Error retrieving items by ids: {e}")
+        return {}
+
+
+def find_item_ids(text, limit=500):
+    """
+    Find the IDs of items whose name contains the text or whose code equals it.
+
+    Args:
+        text (str): Search text (case-insensitive for names)
+        limit (int, optional): Maximum number of IDs to return
+
+    Returns:
+        list: Matching item IDs as strings
+    """
+    if not text:
+        return []
+    if ObjectId.is_valid(text):
+        return [text]
+    try:
+        db = database.get_db()
+        items = db['items']
+        cursor = items.find(
+            {'$or': [
+                {'Name': {'$regex': re.escape(text), '$options': 'i'}},
+                {'Code_4': text}
+            ]},
+            {'_id': 1}
+        ).limit(limit)
+        return [str(item['_id']) for item in cursor]
+    except Exception as e:
+        print(f"Error finding item ids: {e}")
+        return []
+
+
+# Projection profiles for the catalog API. 'card' holds what the item grid
+# renders; None means the full document.
+ITEM_PROFILES = {
+    'card': ['Name', 'Ort', 'Images', 'ImageVariants', 'Verfuegbar', 'Reservierbar', 'User',
+             'Filter', 'Filter2', 'Filter3', 'Code_4', 'Exemplare', 'LastUpdated'],
+    'full': None,
+}
+
+ITEM_SORT = [('Name', 1), ('_id', 1)]
+
+
+def encode_item_cursor(item):
+    """
+    Build a keyset cursor from the Name and _id of the last item on a page.
+
+    Args:
+        item (dict): Last item of the current page
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    name = item.get('Name')
+    payload = {'n': name if isinstance(name, str) else None, 'id': str(item['_id'])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_item_cursor(cursor):
+    """
+    Decode a cursor created by encode_item_cursor.
+
+    Args:
+        cursor (str): Cursor string
+
+    Returns:
+        tuple: (Name or None, ObjectId) or None if the cursor is invalid
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return payload.get('n'), ObjectId(payload['id'])
+    except Exception:
+        return None
+
+
+def build_item_query(filter=None, filter2=None, filter3=None, ort=None, verfuegbar=None):
+    """
+    Build the catalog query for the given filters. Filter fields may hold a
+    single value or a list, equality matches both.
+
+    Args:
+        filter (str, optional): Value of the primary filter
+        filter2 (str, optional): Value of the secondary filter
+        filter3 (str, optional): Value of the tertiary filter
+        ort (str, optional): Location
+        verfuegbar (bool, optional): Availability
+
+    Returns:
+        dict: MongoDB query
+    """
+    query = {}
+    if filter:
+        query['Filter'] = filter
+    if filter2:
+        query['Filter2'] = filter2
+    if filter3:
+        query['Filter3'] = filter3
+    if ort:
+        query['Ort'] = ort
+    if verfuegbar is not None:
+        query['Verfuegbar'] = verfuegbar
+    return query
+
+
+def get_items_page(query=None, cursor=None, limit=100, profile='card'):
+    """
+    Retrieve one page of the catalog, sorted by Name, using keyset pagination.
+
+    Args:
+        query (dict, optional): Query from build_item_query
+        cursor (str, optional): Cursor returned for the previous page
+        limit (int, optional): Number of items per page
+        profile (str, optional): Projection profile from ITEM_PROFILES
+
+    Returns:
+        tuple: (list of items, cursor of the next page or None)
+    """
+    try:
+        db = database.get_db()
+        items = db['items']
+
+        query = dict(query or {})
+        keyset = decode_item_cursor(cursor) if cursor else None
+        if keyset:
+            name, last_id = keyset
+            if name is None:
+                # Items without a name sort first, followed by all named items
+                after = {'$or': [
+                    {'Name': None, '_id': {'$gt': last_id}},
+                    {'Name': {'$ne': None}}
+                ]}
+            else:
+                after = {'$or': [
+                    {'Name': {'$gt': name}},
+                    {'Name': name, '_id': {'$gt': last_id}}
+                ]}
+            query = {'$and': [query, after]} if query else after
+
+        fields = ITEM_PROFILES.get(profile, ITEM_PROFILES['card'])
+        projection = {field: 1 for field in fields} if fields else None
+
+        # Fetch one extra item to know whether another page exists
+        results = list(items.find(query, projection).sort(ITEM_SORT).limit(limit + 1))
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = encode_item_cursor(results[-1])
+        return results, next_cursor
+    except Exception as e:
+        print(f"Error retrieving items page: {e}")
+        return [], None
+
+
 def get_item_by_name(name):
     """
     Retrieve a specific inventory item by its name.
@@ -382,11 +645,9 @@ def get_item_by_name(name):
         dict: The inventory item document or None if not found
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         item = items.find_one({'Name': name})
-        client.close()
         return item
     except Exception as e:
         print(f"Error retrieving item by name: {e}")
@@ -404,8 +665,7 @@ def get_items_by_filter(filter_value):
         list: List of items matching the filter in primary, secondary, or tertiary category
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         
         # Use $or to find matches in any filter field
@@ -418,7 +678,6 @@ def get_items_by_filter(filter_value):
         }
         
         results = list(items.find(query))
-        client.close()
         
         # Convert ObjectId to string
         for item in results:
@@ -438,24 +697,7 @@ def get_filters():
         list: Combined list of all primary, secondary and tertiary filter values
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        items = db['items']
-        filters = items.distinct('Filter')
-        filters2 = items.distinct('Filter2')
-        filters3 = items.distinct('Filter3')
-        
-        # Combine filters and remove None/empty values
-        all_filters = [f for f in filters + filters2 + filters3 if f]
-        
-        # Remove duplicates while preserving order
-        unique_filters = []
-        for f in all_filters:
-            if f not in unique_filters:
-                unique_filters.append(f)
-                
-        client.close()
-        return unique_filters
+        return metadata.get_all_filter_values()
     except Exception as e:
         print(f"Error retrieving filters: {e}")
         return []
@@ -469,12 +711,7 @@ def get_primary_filters():
         list: List of all primary filter values
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        items = db['items']
-        filters = [f for f in items.distinct('Filter') if f]
-        client.close()
-        return filters
+        return metadata.get_filter_values('Filter')
     except Exception as e:
         print(f"Error retrieving primary filters: {e}")
         return []
@@ -488,12 +725,7 @@ def get_secondary_filters():
         list: List of all secondary filter values
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        items = db['items']
-        filters = [f for f in items.distinct('Filter2') if f]
-        client.close()
-        return filters
+        return metadata.get_filter_values('Filter2')
     except Exception as e:
         print(f"Error retrieving secondary filters: {e}")
         return []
@@ -507,12 +739,7 @@ def get_tertiary_filters():
         list: List of all tertiary filter values
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        items = db['items']
-        filters = [f for f in items.distinct('Filter3') if f]
-        client.close()
-        return filters
+        return metadata.get_filter_values('Filter3')
     except Exception as e:
         print(f"Error retrieving tertiary filters: {e}")
         return []
@@ -529,8 +756,7 @@ def get_item_by_code_4(code_4):
         list: List of items matching the code
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         results = list(items.find({"Code_4": code_4}))
         
@@ -538,7 +764,6 @@ def get_item_by_code_4(code_4):
         for item in results:
             item['_id'] = str(item['_id'])
             
-        client.close()
         return results
     except Exception as e:
         print(f"Error retrieving item by code: {e}")
@@ -559,10 +784,13 @@ def unstuck_item(id):
         bool: True if successful, False otherwise
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         ausleihungen = db['ausleihungen']
-        result = ausleihungen.delete_many({'Item': id})
+        booking_ids = [doc['_id'] for doc in ausleihungen.find({'Item': id}, {'_id': 1})]
+        result = ausleihungen.delete_many({'_id': {'$in': booking_ids}})
+        # Imported here: occupancy imports this module
+        import occupancy
+        occupancy.release_bookings(booking_ids)
         
         # Also reset the item status
         items = db['items']
@@ -576,8 +804,8 @@ def unstuck_item(id):
                 '$unset': {'User': ""}
             }
         )
+        item_cache.changed([id])
         
-        client.close()
         return True
     except Exception as e:
         print(f"Error unsticking item: {e}")
@@ -594,32 +822,8 @@ def get_predefined_filter_values(filter_num):
     Returns:
         list: List of predefined filter values
     """
-    client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-    db = client[cfg.MONGODB_DB]
-    
-    # Use a dedicated collection for filter presets
-    filter_presets = db['filter_presets']
-    
-    # Find the document for the specified filter
-    filter_doc = filter_presets.find_one({'filter_num': filter_num})
-    
-    client.close()
-    
-    if filter_doc and 'values' in filter_doc:
-        # Sort values alphabetically
-        return sorted(filter_doc['values'])
-    else:
-        # Create empty document if it doesn't exist
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        filter_presets = db['filter_presets']
-        filter_presets.update_one(
-            {'filter_num': filter_num},
-            {'$set': {'values': []}},
-            upsert=True
-        )
-        client.close()
-        return []
+    return metadata.get_predefined_filter_values(filter_num)
+
 
 def add_predefined_filter_value(filter_num, value):
     """
@@ -632,8 +836,7 @@ def add_predefined_filter_value(filter_num, value):
     Returns:
         bool: True if value was added, False if it already existed
     """
-    client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-    db = client[cfg.MONGODB_DB]
+    db = database.get_db()
     filter_presets = db['filter_presets']
     
     # Check if value already exists
@@ -644,7 +847,6 @@ def add_predefined_filter_value(filter_num, value):
     
     if filter_doc:
         # Value already exists
-        client.close()
         return False
     
     # Add the value to the filter
@@ -653,8 +855,8 @@ def add_predefined_filter_value(filter_num, value):
         {'$push': {'values': value}},
         upsert=True
     )
+    payloads.bump(metadata.FILTER_PRESETS_VERSION)
     
-    client.close()
     return result.modified_count > 0 or result.upserted_id is not None
 
 def remove_predefined_filter_value(filter_num, value):
@@ -668,8 +870,7 @@ def remove_predefined_filter_value(filter_num, value):
     Returns:
         bool: True if value was removed, False otherwise
     """
-    client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-    db = client[cfg.MONGODB_DB]
+    db = database.get_db()
     filter_presets = db['filter_presets']
     
     # Remove the value from the filter
@@ -677,8 +878,9 @@ def remove_predefined_filter_value(filter_num, value):
         {'filter_num': filter_num},
         {'$pull': {'values': value}}
     )
+    if result.modified_count:
+        payloads.bump(metadata.FILTER_PRESETS_VERSION)
     
-    client.close()
     return result.modified_count > 0
 
 
@@ -692,30 +894,7 @@ def get_predefined_locations():
         list: List of predefined location strings
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
-        
-        # Check if settings collection exists, create if not
-        if 'settings' not in db.list_collection_names():
-            db.create_collection('settings')
-        
-        # Get settings document or create if it doesn't exist
-        settings_collection = db['settings']
-        location_settings = settings_collection.find_one({'setting_type': 'predefined_locations'})
-        
-        if not location_settings:
-            # Create default settings document if it doesn't exist
-            settings_collection.insert_one({
-                'setting_type': 'predefined_locations',
-                'locations': []
-            })
-            return []
-        
-        # Return the predefined locations
-        locations = location_settings.get('locations', [])
-        client.close()
-        return sorted(locations)
-        
+        return metadata.get_predefined_locations()
     except Exception as e:
         print(f"Error getting predefined locations: {str(e)}")
         return []
@@ -739,8 +918,7 @@ def add_predefined_location(location):
         return False
         
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         settings_collection = db['settings']
         
         # Check if settings document exists, create if not
@@ -752,13 +930,12 @@ def add_predefined_location(location):
                 'setting_type': 'predefined_locations',
                 'locations': [location]
             })
-            client.close()
+            payloads.bump(metadata.LOCATIONS_VERSION)
             return True
         
         # Check if location already exists (case-insensitive)
         current_locations = location_settings.get('locations', [])
         if any(loc.lower() == location.lower() for loc in current_locations):
-            client.close()
             return False
         
         # Add the new location
@@ -766,8 +943,8 @@ def add_predefined_location(location):
             {'setting_type': 'predefined_locations'},
             {'$push': {'locations': location}}
         )
+        payloads.bump(metadata.LOCATIONS_VERSION)
         
-        client.close()
         return True
         
     except Exception as e:
@@ -789,16 +966,16 @@ def remove_predefined_location(location):
         return False
         
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         settings_collection = db['settings']
         
         result = settings_collection.update_one(
             {'setting_type': 'predefined_locations'},
             {'$pull': {'locations': location}}
         )
+        if result.modified_count:
+            payloads.bump(metadata.LOCATIONS_VERSION)
         
-        client.close()
         return result.modified_count > 0
         
     except Exception as e:
@@ -824,8 +1001,7 @@ def update_item_next_appointment(item_id, appointment_data):
         bool: True if successful, False otherwise
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         
         # Format the appointment data for storage
@@ -855,8 +1031,8 @@ def update_item_next_appointment(item_id, appointment_data):
             {'_id': ObjectId(item_id)},
             {'$set': update_data}
         )
+        item_cache.changed([item_id])
         
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         print(f"Error updating item next appointment: {e}")
@@ -874,16 +1050,15 @@ def clear_item_next_appointment(item_id):
         bool: True if successful, False otherwise
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         
         result = items.update_one(
             {'_id': ObjectId(item_id)},
             {'$unset': {'NextAppointment': ""}, '$set': {'LastUpdated': datetime.datetime.now()}}
         )
+        item_cache.changed([item_id])
         
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         print(f"Error clearing item next appointment: {e}")
@@ -898,8 +1073,7 @@ def get_items_with_appointments():
         list: List of items with NextAppointment field
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         
         items_return = items.find({'NextAppointment': {'$exists': True}})
@@ -907,7 +1081,6 @@ def get_items_with_appointments():
         for item in items_return:
             item['_id'] = str(item['_id'])
             items_list.append(item)
-        client.close()
         return items_list
     except Exception as e:
         print(f"Error retrieving items with appointments: {e}")
@@ -924,8 +1097,7 @@ def get_current_status(item_id):
         dict: Current status of the item or None if not found
     """
     try:
-        client = MongoClient(cfg.MONGODB_HOST, cfg.MONGODB_PORT)
-        db = client[cfg.MONGODB_DB]
+        db = database.get_db()
         items = db['items']
         
         item = items.find_one({'_id': ObjectId(item_id)}, {'Verfuegbar': 1, 'User': 1})
@@ -933,10 +1105,8 @@ def get_current_status(item_id):
         if item:
             # Convert ObjectId to string for consistency
             item['_id'] = str(item['_id'])
-            client.close()
             return item
         else:
-            client.close()
             return None
     except Exception as e:
         print(f"Error retrieving current status: {e}")
@@ -0,0 +1,209 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Scheduler Leader Election
+=========================
+
+Makes sure scheduled jobs run in exactly one process, even though every
+gunicorn worker (and an optional dedicated scheduler process) starts its own
+scheduler. Two backends are available via scheduler.leader_election:
+
+- 'mongo': a lease document {'_id': 'scheduler', 'holder', 'expires'} in the
+  'scheduler_lease' collection. The leader renews it on every heartbeat; when
+  it dies the lease expires after scheduler.lease_seconds and another process
+  takes over. A TTL index removes stale leases.
+- 'file': an exclusive flock on scheduler.lock_file for single-host
+  installations. The kernel releases the lock when the holder exits.
+- 'none': every process is leader (single-process deployments).
+"""
+import datetime
+import os
+import socket
+import threading
+import uuid
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import database
+import settings as cfg
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+LEASE_COLLECTION = 'scheduler_lease'
+LEASE_ID = 'scheduler'
+
+_lock = threading.Lock()
+_is_leader = False
+_lock_file = None
+_holder_pid = None
+_holder = None
+
+
+def get_holder_id():
+    """
+    Return an ID that identifies this process as lease holder.
+
+    The ID is regenerated after a fork, so forked workers never share it.
+
+    Returns:
+        str: '<hostname>:<pid>:<random>'
+    """
+    global _holder, _holder_pid
+    if _holder is None or _holder_pid != os.getpid():
+        _holder_pid = os.getpid()
+        _holder = f"{socket.gethostname()}:{_holder_pid}:{uuid.uuid4().hex[:8]}"
+    return _holder
+
+
+def _utcnow():
+    """Current UTC time as naive datetime, as stored by MongoDB and used by TTL indexes."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _acquire_mongo_lease():
+    """Acquire or renew the Mongo lease. Returns True if this process holds it."""
+    holder = get_holder_id()
+    now = _utcnow()
+    lease = database.get_db()[LEASE_COLLECTION]
+    try:
+        doc = lease.find_one_and_update(
+            {'_id': LEASE_ID, '$or': [{'holder': holder}, {'expires': {'$lte': now}}]},
+            {'$set': {
+                'holder': holder,
+                'expires': now + datetime.timedelta(seconds=cfg.SCHEDULER_LEASE_SECONDS),
+                'renewed': now,
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # The lease exists and is held by another process
+        return False
+    return bool(doc) and doc.get('holder') == holder
+
+
+def _release_mongo_lease():
+    """Delete the Mongo lease if this process holds it."""
+    database.get_db()[LEASE_COLLECTION].delete_one({'_id': LEASE_ID, 'holder': get_holder_id()})
+
+
+def _acquire_file_lock():
+    """Acquire the lock file. Returns True if this process holds it."""
+    global _lock_file
+    if _lock_file is not None:
+        return True
+    if fcntl is None:
+        print("File lock leader election is not supported on this platform")
+        return False
+    lock_dir = os.path.dirname(cfg.SCHEDULER_LOCK_FILE)
+    if lock_dir and not os.path.exists(lock_dir):
+        os.makedirs(lock_dir, exist_ok=True)
+    handle = open(cfg.SCHEDULER_LOCK_FILE, 'a+')
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    handle.seek(0)
+    handle.truncate()
+    handle.write(get_holder_id())
+    handle.flush()
+    _lock_file = handle
+    return True
+
+
+def _release_file_lock():
+    """Release the lock file if this process holds it."""
+    global _lock_file
+    if _lock_file is None:
+        return
+    try:
+        fcntl.flock(_lock_file.fileno(), fcntl.LOCK_UN)
+    finally:
+        _lock_file.close()
+        _lock_file = None
+
+
+def heartbeat():
+    """
+    Acquire or renew leadership; called periodically by every scheduler.
+
+    Returns:
+        bool: True if this process is the leader
+    """
+    global _is_leader
+    with _lock:
+        mode = cfg.SCHEDULER_LEADER_ELECTION
+        try:
+            if mode == 'mongo':
+                leader = _acquire_mongo_lease()
+            elif mode == 'file':
+                leader = _acquire_file_lock()
+            else:
+                leader = True
+        except Exception as e:
+            print(f"Error during scheduler leader election: {e}")
+            leader = False
+
+        if leader != _is_leader:
+            state = "acquired" if leader else "lost"
+            print(f"[{datetime.datetime.now()}] Scheduler leadership {state} ({get_holder_id()})")
+        _is_leader = leader
+        return leader
+
+
+def is_leader():
+    """
+    Return whether this process held leadership at the last heartbeat.
+
+    Returns:
+        bool: True if this process is the leader
+    """
+    return _is_leader
+
+
+def leader_only(func):
+    """
+    Wrap a job so it only runs in the leader process.
+
+    Leadership is renewed right before the job runs, so a job never starts on
+    a lease that expired since the last heartbeat.
+
+    Args:
+        func (callable): Job function
+
+    Returns:
+        callable: Wrapped job function
+    """
+    def wrapper(*args, **kwargs):
+        if not heartbeat():
+            return None
+        return func(*args, **kwargs)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def release():
+    """Give up leadership, e.g. on shutdown, so another process can take over at once."""
+    global _is_leader
+    with _lock:
+        try:
+            if cfg.SCHEDULER_LEADER_ELECTION == 'mongo' and _is_leader:
+                _release_mongo_lease()
+            elif cfg.SCHEDULER_LEADER_ELECTION == 'file':
+                _release_file_lock()
+        except Exception as e:
+            print(f"Error releasing scheduler leadership: {e}")
+        _is_leader = False
@@ -0,0 +1,347 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Content-Addressed Media Store
+=============================
+
+Image files are stored under the SHA-256 of their bytes, sharded into two
+directory levels below the upload folder:
+
+    uploads/ab/cd/abcd...<64 hex digits>.webp
+    uploads/ab/cd/abcd..._400w.webp          (responsive variants)
+
+Items keep referencing plain file names ('<hash>.<ext>'), so identical photos
+and book covers are stored once and duplicating an item only copies names.
+The 'media_refs' collection counts the references of every stored file:
+
+    {'_id': '<hash>.<ext>', 'Refs', 'Size', 'Variants', 'Source',
+     'Created', 'Updated'}
+
+Refs is maintained by add_ref()/add_refs() and release(). Files are not
+unlinked when their last reference is released, because a concurrent
+add_ref() (duplicate, reused cover) may still pick them up; sweep() removes
+entries that stayed without references for ORPHAN_HOURS, together with the
+file and its variants. This also covers book covers downloaded for an item
+that was never saved. Files written
+before the store existed keep their flat UUID names and are handled by the
+callers as before; is_stored() tells both kinds apart.
+
+The filesystem helpers (hash_file, put_file, path_for) do not touch MongoDB
+and are safe to use in the image worker processes.
+"""
+import datetime
+import hashlib
+import os
+import re
+import shutil
+import uuid
+
+from pymongo import ReturnDocument, UpdateOne
+
+import database
+import settings as cfg
+
+
+COLLECTION = 'media_refs'
+CHUNK_SIZE = 1024 * 1024
+ORPHAN_HOURS = 24
+
+_STORED_NAME = re.compile(r'^[0-9a-f]{64}(?:_\d+w)?\.[a-z0-9]+$')
+
+
+def is_stored(filename):
+    """
+    Check whether a file name belongs to the content-addressed store.
+
+    Args:
+        filename (str): File name as referenced by an item
+
+    Returns:
+        bool: True for '<sha256>.<ext>' names and their variants
+    """
+    return bool(filename) and bool(_STORED_NAME.match(filename))
+
+
+def path_for(filename, root=None):
+    """
+    Return the absolute path of an upload.
+
+    Args:
+        filename (str): Stored or legacy file name
+        root (str, optional): Upload folder, defaults to settings.UPLOAD_FOLDER
+
+    Returns:
+        str: Sharded path for stored names, flat path otherwise
+    """
+    root = root or cfg.UPLOAD_FOLDER
+    if is_stored(filename):
+        return os.path.join(root, filename[0:2], filename[2:4], filename)
+    return os.path.join(root, filename)
+
+
+def hash_file(path):
+    """
+    Compute the SHA-256 of a file without reading it into memory at once.
+
+    Args:
+        path (str): File path
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def put_file(path, root=None, move=True):
+    """
+    Place a file into the store under the hash of its content.
+
+    If the content is already stored, the existing file is kept and a moved
+    source is removed.
+
+    Args:
+        path (str): Source file
+        root (str, optional): Upload folder, defaults to settings.UPLOAD_FOLDER
+        move (bool): Move the source instead of copying it
+
+    Returns:
+        str: Stored file name '<hash>.<ext>'
+    """
+    ext = os.path.splitext(path)[1].lower() or '.bin'
+    name = f"{hash_file(path)}{ext}"
+    target = path_for(name, root)
+    if os.path.exists(target):
+        if move:
+            os.remove(path)
+        return name
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if move:
+        os.replace(path, target)
+    else:
+        tmp_target = f"{target}.{uuid.uuid4().hex}.part"
+        shutil.copyfile(path, tmp_target)
+        os.replace(tmp_target, target)
+    return name
+
+
+def _collection():
+    return database.get_db()[COLLECTION]
+
+
+def add_ref(filename, variants=None, source=None):
+    """
+    Add one reference to a stored file, creating its entry if needed.
+
+    Args:
+        filename (str): Stored file name
+        variants (list, optional): Variant manifest of the image
+        source (str, optional): URL the file was downloaded from
+
+    Returns:
+        bool: True if a reference was added
+    """
+    if not is_stored(filename):
+        return False
+    now = datetime.datetime.now()
+    update = {
+        '$inc': {'Refs': 1},
+        '$set': {'Updated': now},
+        '$setOnInsert': {'Created': now, 'Size': _size(filename)},
+    }
+    if variants is not None:
+        update['$set']['Variants'] = variants
+    if source:
+        update['$set']['Source'] = source
+    _collection().update_one({'_id': filename}, update, upsert=True)
+    return True
+
+
+def add_refs(filenames):
+    """
+    Add one reference to each stored file in a list, e.g. for a duplicate.
+
+    Args:
+        filenames (list): File names; legacy names are ignored
+
+    Returns:
+        int: Number of references added
+    """
+    now = datetime.datetime.now()
+    ops = [
+        UpdateOne({'_id': name},
+                  {'$inc': {'Refs': 1}, '$set': {'Updated': now},
+                   '$setOnInsert': {'Created': now, 'Size': _size(name)}},
+                  upsert=True)
+        for name in filenames or [] if is_stored(name)
+    ]
+    if not ops:
+        return 0
+    _collection().bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def ingest(path, move=True, source=None, add_reference=True):
+    """
+    Store a file and register it.
+
+    Args:
+        path (str): Source file
+        move (bool): Move the source instead of copying it
+        source (str, optional): URL the file was downloaded from
+        add_reference (bool): Count the caller as a reference; without it the
+            entry is only created, e.g. for a book cover that is not yet used
+
+    Returns:
+        str: Stored file name
+    """
+    name = put_file(path, move=move)
+    if add_reference:
+        add_ref(name, source=source)
+    else:
+        now = datetime.datetime.now()
+        update = {'$setOnInsert': {'Refs': 0, 'Created': now, 'Size': _size(name)},
+                  '$set': {'Updated': now}}
+        if source:
+            update['$set']['Source'] = source
+        _collection().update_one({'_id': name}, update, upsert=True)
+    return name
+
+
+def release(filenames):
+    """
+    Drop one reference per stored file. Files nobody references any more are
+    removed by sweep().
+
+    Args:
+        filenames (list): File names; legacy names are ignored
+
+    Returns:
+        int: Number of files left without references
+    """
+    unreferenced = 0
+    for name in filenames or []:
+        if not is_stored(name):
+            continue
+        doc = _collection().find_one_and_update(
+            {'_id': name},
+            {'$inc': {'Refs': -1}, '$set': {'Updated': datetime.datetime.now()}},
+            projection={'Refs': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is not None and doc.get('Refs', 0) <= 0:
+            unreferenced += 1
+    return unreferenced
+
+
+def sweep(older_than_hours=ORPHAN_HOURS):
+    """
+    Remove stored files without references that were not touched for a while.
+
+    Args:
+        older_than_hours (float): Minimum age of the last update
+
+    Returns:
+        int: Number of files removed from disk
+    """
+    cutoff = datetime.datetime.now() - datetime.timedelta(hours=older_than_hours)
+    query = {'Refs': {'$lte': 0}, 'Updated': {'$lt': cutoff}}
+    removed = 0
+    for doc in _collection().find(query, {'Variants': 1}):
+        # A reference added meanwhile keeps the entry
+        if not _collection().delete_one(dict(query, _id=doc['_id'])).deleted_count:
+            continue
+        # add_ref() upserts, so it may have recreated the entry since
+        if _collection().find_one({'_id': doc['_id']}, {'_id': 1}):
+            continue
+        removed += _unlink(doc['_id'], doc.get('Variants'))
+    if removed:
+        print(f"Removed {removed} unreferenced stored files")
+    return removed
+
+
+def _unlink(name, variants):
+    """Remove a stored file and its variants from disk."""
+    removed = 0
+    files = [v.get('file') for v in variants or []]
+    for path in [path_for(name)] + [path_for(f) for f in files if f]:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing stored file {path}: {e}")
+    return removed
+
+
+def set_variants(filename, variants):
+    """Store the variant manifest of a stored file."""
+    if is_stored(filename):
+        _collection().update_one({'_id': filename}, {'$set': {'Variants': variants}})
+
+
+def get_variants(filenames):
+    """
+    Return the variant manifests of stored files.
+
+    Args:
+        filenames (list): File names
+
+    Returns:
+        dict: file name -> variant list (only files with variants)
+    """
+    names = [n for n in filenames or [] if is_stored(n)]
+    if not names:
+        return {}
+    return {
+        doc['_id']: doc['Variants']
+        for doc in _collection().find({'_id': {'$in': names}, 'Variants': {'$exists': True}},
+                                      {'Variants': 1})
+    }
+
+
+def find_by_source(url):
+    """
+    Look up a file that was already downloaded from a URL.
+
+    Args:
+        url (str): Download URL
+
+    Returns:
+        str: Stored file name or None
+    """
+    if not url:
+        return None
+    # Handing the file out again keeps an unreferenced cover from sweep()
+    doc = _collection().find_one_and_update(
+        {'Source': url}, {'$set': {'Updated': datetime.datetime.now()}},
+        projection={'_id': 1}, sort=[('Updated', -1)]
+    )
+    if doc and os.path.exists(path_for(doc['_id'])):
+        return doc['_id']
+    return None
+
+
+def get_source(filename):
+    """Return the download URL recorded for a stored file, if any."""
+    if not is_stored(filename):
+        return None
+    doc = _collection().find_one({'_id': filename}, {'Source': 1})
+    return (doc or {}).get('Source')
+
+
+def _size(filename):
+    try:
+        return os.path.getsize(path_for(filename))
+    except OSError:
+        return None
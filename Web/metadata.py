@@ -0,0 +1,166 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Catalog Metadata
+================
+
+Per-process snapshot of the values the filter and location pickers offer:
+
+- the filter values used by items (Filter, Filter2, Filter3), computed with
+  one $facet aggregation over the items collection
+- the predefined filter values ('filter_presets' collection)
+- the predefined locations ('settings' document 'predefined_locations')
+
+Each part is tagged with the version it was built from and rebuilt when the
+version moves: the item catalog version (item_cache.version()) for the
+filter values, and the 'filter_presets' and 'locations' versions (see
+payloads.bump()) for the predefined lists. items.py bumps them on every
+write, so no request reads these collections while nothing changed.
+"""
+import threading
+
+import database
+import item_cache
+import payloads
+
+
+FILTER_FIELDS = ('Filter', 'Filter2', 'Filter3')
+FILTER_PRESETS_VERSION = 'filter_presets'
+LOCATIONS_VERSION = 'locations'
+
+_lock = threading.Lock()
+_snapshot = {}   # part -> (version, value)
+
+
+def _cached(part, version, build):
+    """Return a part of the snapshot, rebuilding it if its version moved."""
+    with _lock:
+        entry = _snapshot.get(part)
+        if entry and entry[0] == version:
+            return entry[1]
+    value = build()
+    with _lock:
+        _snapshot[part] = (version, value)
+    return value
+
+
+def _load_filters():
+    """Collect the distinct values of all filter fields in one aggregation."""
+    facets = {
+        field: [
+            {'$unwind': f'${field}'},
+            {'$match': {field: {'$nin': [None, '']}}},
+            {'$group': {'_id': f'${field}'}},
+            {'$sort': {'_id': 1}},
+        ]
+        for field in FILTER_FIELDS
+    }
+    pipeline = [
+        {'$project': {field: 1 for field in FILTER_FIELDS}},
+        {'$facet': facets},
+    ]
+    result = next(database.get_db()['items'].aggregate(pipeline), {})
+    return {field: [doc['_id'] for doc in result.get(field, [])] for field in FILTER_FIELDS}
+
+
+def _filters():
+    return _cached('filters', item_cache.version(), _load_filters)
+
+
+def get_filter_values(field):
+    """
+    Return the distinct values items use in a filter field.
+
+    Args:
+        field (str): 'Filter', 'Filter2' or 'Filter3'
+
+    Returns:
+        list: Sorted values
+    """
+    return list(_filters()[field])
+
+
+def get_all_filter_values():
+    """
+    Return the values of all filter fields combined, without duplicates.
+
+    Returns:
+        list: Values of Filter, then Filter2, then Filter3
+    """
+    combined = []
+    seen = set()
+    for field in FILTER_FIELDS:
+        for value in _filters()[field]:
+            key = repr(value)
+            if key not in seen:
+                seen.add(key)
+                combined.append(value)
+    return combined
+
+
+def _load_filter_presets():
+    presets = {}
+    for doc in database.get_db()['filter_presets'].find({}, {'filter_num': 1, 'values': 1}):
+        presets[doc.get('filter_num')] = sorted(doc.get('values') or [])
+    return presets
+
+
+def get_predefined_filter_values(filter_num):
+    """
+    Return the predefined values of a filter.
+
+    Args:
+        filter_num (int): Filter number
+
+    Returns:
+        list: Sorted values
+    """
+    version = payloads.version(FILTER_PRESETS_VERSION)
+    presets = _cached('filter_presets', version, _load_filter_presets)
+    if filter_num not in presets:
+        # Same as before: a missing filter gets an empty preset document
+        database.get_db()['filter_presets'].update_one(
+            {'filter_num': filter_num},
+            {'$setOnInsert': {'values': []}},
+            upsert=True
+        )
+        with _lock:
+            presets.setdefault(filter_num, [])
+        return []
+    return list(presets[filter_num])
+
+
+def _load_locations():
+    settings_collection = database.get_db()['settings']
+    doc = settings_collection.find_one({'setting_type': 'predefined_locations'}, {'locations': 1})
+    if doc is None:
+        settings_collection.update_one(
+            {'setting_type': 'predefined_locations'},
+            {'$setOnInsert': {'locations': []}},
+            upsert=True
+        )
+        return []
+    return sorted(doc.get('locations') or [])
+
+
+def get_predefined_locations():
+    """
+    Return the predefined locations.
+
+    Returns:
+        list: Sorted locations
+    """
+    version = payloads.version(LOCATIONS_VERSION)
+    return list(_cached('locations', version, _load_locations))
+
+
+def clear():
+    """Drop the snapshot of this process."""
+    with _lock:
+        _snapshot.clear()
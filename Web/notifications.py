@@ -0,0 +1,268 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Notifications
+=============
+
+Push channel for flash messages, booking-conflict notices of the scheduler
+and item availability changes. Browsers long-poll /api/notifications with
+the sequence number of the last event they saw and get every newer event
+they may see, or an empty answer after the wait timeout.
+
+Events are written to the 'notifications' collection by any process
+(web workers, scheduler):
+
+    {'_id': <int sequence>, 'Type', 'Data', 'User', 'Admin', 'Created'}
+
+An event without User and Admin is broadcast; User restricts it to one user
+and Admin (additionally) to administrators. Sequence numbers come from the
+'counters' collection, and a TTL index removes events after a day.
+
+Every web process runs a single poller thread that reads new events once
+per second into an in-memory buffer and wakes all waiting requests, so the
+number of MongoDB queries does not grow with the number of open tabs.
+At most notifications.max_waiters requests of a process wait at the same
+time; further requests are answered at once with 'retry_after', so open
+tabs cannot take all gunicorn threads.
+
+Sequence numbers are taken before the insert, so an event can become
+visible after a newer one. Events are therefore only delivered up to the
+highest sequence number without gaps before it; a gap that is not filled
+within GAP_SECONDS (the publishing process failed) is skipped.
+"""
+import collections
+import datetime
+import threading
+import time
+
+from pymongo import ReturnDocument
+
+import database
+import settings as cfg
+
+
+COLLECTION = 'notifications'
+COUNTER_ID = 'notifications'
+POLL_SECONDS = 1
+BUFFER_SIZE = 1000
+# Events loaded on start, so clients coming from another process can resume
+RESUME_EVENTS = 20
+# How long delivery waits for a missing sequence number
+GAP_SECONDS = 5
+
+_buffer = collections.deque(maxlen=BUFFER_SIZE)
+_seen = set()
+_condition = threading.Condition()
+_poller = None
+_poller_lock = threading.Lock()
+_last_seq = None   # Highest sequence number loaded
+_safe_seq = None   # Highest sequence number with all events up to it loaded
+_gaps = {}         # Missing sequence number -> when it was first noticed
+_waiters = threading.BoundedSemaphore(cfg.NOTIFICATION_MAX_WAITERS)
+
+
+def publish(event_type, data, user=None, admin=False):
+    """
+    Store an event for all processes.
+
+    Args:
+        event_type (str): 'flash', 'conflict' or 'item'
+        data (dict): Event payload (JSON serialisable)
+        user (str, optional): Only this user (and admins if admin is set)
+        admin (bool): Visible to administrators
+
+    Returns:
+        int: Sequence number of the event or None on error
+    """
+    try:
+        db = database.get_db()
+        counter = db['counters'].find_one_and_update(
+            {'_id': COUNTER_ID},
+            {'$inc': {'seq': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        seq = counter['seq']
+        db[COLLECTION].insert_one({
+            '_id': seq,
+            'Type': event_type,
+            'Data': data,
+            'User': user,
+            'Admin': bool(admin),
+            'Created': datetime.datetime.now(),
+        })
+        return seq
+    except Exception as e:
+        print(f"Error publishing notification: {e}")
+        return None
+
+
+def flash(user, message, category='info'):
+    """
+    Send a flash message to the open pages of one user.
+
+    Args:
+        user (str): Username
+        message (str): Message text
+        category (str): Flash category ('success', 'error', 'info')
+
+    Returns:
+        int: Sequence number of the event or None on error
+    """
+    return publish('flash', {'message': message, 'category': category}, user=user)
+
+
+def item_changed(item_id, available, user=None):
+    """
+    Broadcast an availability change of an item.
+
+    Args:
+        item_id (str): ID of the item
+        available (bool): New availability
+        user (str, optional): Borrowing user
+
+    Returns:
+        int: Sequence number of the event or None on error
+    """
+    return publish('item', {'id': str(item_id), 'available': bool(available), 'user': user})
+
+
+def _current_seq(db):
+    counter = db['counters'].find_one({'_id': COUNTER_ID})
+    return counter['seq'] if counter else 0
+
+
+def _poll_once():
+    """Load new events into the buffer and wake the waiting requests."""
+    global _last_seq, _safe_seq
+    db = database.get_db()
+    if _safe_seq is None:
+        start = max(0, _current_seq(db) - RESUME_EVENTS)
+    else:
+        start = _safe_seq
+    new_events = [e for e in db[COLLECTION].find({'_id': {'$gt': start}}).sort('_id', 1)
+                  if e['_id'] not in _seen]
+    now = time.monotonic()
+    with _condition:
+        for event in new_events:
+            if len(_buffer) == _buffer.maxlen:
+                _seen.discard(_buffer[0]['_id'])
+            _buffer.append(event)
+            _seen.add(event['_id'])
+        last = max([start, _last_seq or 0] + [e['_id'] for e in new_events])
+
+        # Advance over loaded events; wait for missing ones up to GAP_SECONDS
+        safe = start
+        while safe < last:
+            seq = safe + 1
+            if seq not in _seen and now - _gaps.setdefault(seq, now) < GAP_SECONDS:
+                break
+            safe = seq
+        for seq in [seq for seq in _gaps if seq <= safe]:
+            del _gaps[seq]
+
+        changed = (last, safe) != (_last_seq, _safe_seq)
+        _last_seq, _safe_seq = last, safe
+        if changed:
+            _condition.notify_all()
+
+
+def _run_poller():
+    while True:
+        try:
+            _poll_once()
+        except Exception as e:
+            print(f"Error polling notifications: {e}")
+        time.sleep(POLL_SECONDS)
+
+
+def _ensure_poller():
+    """Start the poller thread of this process on first use."""
+    global _poller
+    with _poller_lock:
+        if _poller is None or not _poller.is_alive():
+            _poller = threading.Thread(target=_run_poller, name='notifications-poller', daemon=True)
+            _poller.start()
+
+
+def _visible(event, username, is_admin):
+    user = event.get('User')
+    admin = event.get('Admin')
+    if user is None and not admin:
+        return True
+    return (user is not None and user == username) or (admin and is_admin)
+
+
+def _collect(cursor, username, is_admin):
+    """Return visible buffered events after the cursor up to the gap-free sequence."""
+    events = [e for e in _buffer if cursor < e['_id'] <= _safe_seq and _visible(e, username, is_admin)]
+    # Late events are appended after newer ones
+    return sorted(events, key=lambda e: e['_id'])
+
+
+def wait(cursor, username, is_admin, timeout=25):
+    """
+    Wait for events after a cursor.
+
+    If all long-poll slots of the process are taken, the answer comes back
+    immediately and carries 'retry_after' (seconds until the next request).
+
+    Args:
+        cursor (int): Sequence number of the last event the client has seen,
+            None to only learn the current cursor
+        username (str): Logged in user
+        is_admin (bool): Whether the user is an administrator
+        timeout (float): Maximum wait in seconds
+
+    Returns:
+        dict: {'cursor': newest sequence, 'events': [...], 'reset': bool};
+              reset is set if events after the cursor are no longer buffered
+    """
+    if not _waiters.acquire(blocking=False):
+        result = _wait(cursor, username, is_admin, 0)
+        result['retry_after'] = cfg.NOTIFICATION_BUSY_RETRY_SECONDS
+        return result
+    try:
+        return _wait(cursor, username, is_admin, timeout)
+    finally:
+        _waiters.release()
+
+
+def _wait(cursor, username, is_admin, timeout):
+    _ensure_poller()
+    deadline = time.monotonic() + timeout
+    counter = None
+    if cursor is not None and _last_seq is not None and cursor > _last_seq:
+        # Usually this process is just behind the one that served the last
+        # answer; only the counter tells whether it went backwards
+        counter = _current_seq(database.get_db())
+    with _condition:
+        while _safe_seq is None and time.monotonic() < deadline:
+            _condition.wait(POLL_SECONDS)
+        if cursor is None or _safe_seq is None:
+            return {'cursor': _safe_seq or 0, 'events': [], 'reset': False}
+        if counter is not None and cursor > counter:
+            # Counter was reset (e.g. restored database); start over
+            return {'cursor': _safe_seq, 'events': [], 'reset': True}
+        oldest = min(e['_id'] for e in _buffer) if _buffer else _safe_seq + 1
+        reset = cursor < _safe_seq and cursor + 1 < oldest
+        events = _collect(cursor, username, is_admin)
+        while not events and not reset:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _condition.wait(remaining)
+            events = _collect(cursor, username, is_admin)
+        # Never move a client back; it may come from a process that is ahead
+        newest = max(cursor, _safe_seq)
+    return {
+        'cursor': newest,
+        'events': [{'seq': e['_id'], 'type': e['Type'], 'data': e['Data']} for e in events],
+        'reset': reset,
+    }
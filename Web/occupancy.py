@@ -0,0 +1,516 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Period Occupancy
+================
+
+Maintains, per item and day, which school periods are taken by planned or
+active bookings, so availability questions are answered with bit operations
+on one small document instead of querying and iterating bookings.
+
+Collection structure:
+- occupancy: One document per (item, date)
+  - _id: '<item_id>|<YYYY-MM-DD>'
+  - Item: Parent item ID (exemplar bookings '<id>_<n>' count for their parent)
+  - Date: 'YYYY-MM-DD'
+  - Bookings: [{'id': <booking id>, 'mask': <period bitmask>,
+                'item': <booked item or exemplar ID>, 'exemplar': bool}]
+
+Bit n-1 of a mask stands for period n of settings.SCHOOL_PERIODS. A booking
+occupies every period its time window overlaps (a missing End counts as
+Start + 1 hour, as in the conflict checks) plus its own Period on the start day.
+The occupied mask of a day is the OR of all booking masks, the exemplar count
+of a period the number of bookings with that bit set.
+
+A period is taken for a new booking if a booking of the same item or
+exemplar ID overlaps it, or if all Exemplare of the item are booked in it
+(see blocked_mask()).
+
+sync_booking() must be called after every write that changes Status, Start,
+End or Period of a booking; rebuild() recreates the collection from scratch.
+"""
+import datetime
+import re
+
+from bson.objectid import ObjectId
+
+import database
+import items as it
+import settings as cfg
+
+
+COLLECTION = 'occupancy'
+OCCUPYING_STATUSES = ('planned', 'active')
+DEFAULT_BOOKING_DURATION = datetime.timedelta(hours=1)
+MAX_SPAN_DAYS = 366
+
+
+def period_bit(period):
+    """
+    Return the bit of a period number.
+
+    Args:
+        period (int/str): Period number (1-based)
+
+    Returns:
+        int: Bitmask with only this period set
+    """
+    return 1 << (int(period) - 1)
+
+
+def periods_mask(periods):
+    """
+    Return the bitmask of several period numbers.
+
+    Args:
+        periods (iterable): Period numbers
+
+    Returns:
+        int: Combined bitmask
+    """
+    mask = 0
+    for period in periods:
+        mask |= period_bit(period)
+    return mask
+
+
+def mask_periods(mask):
+    """
+    Return the period numbers contained in a bitmask.
+
+    Args:
+        mask (int): Bitmask
+
+    Returns:
+        list: Period numbers in ascending order
+    """
+    return [bit + 1 for bit in range(mask.bit_length()) if mask & (1 << bit)]
+
+
+def _period_windows(day):
+    """Return [(period, start, end)] of all configured periods on a day."""
+    windows = []
+    for key, info in cfg.SCHOOL_PERIODS.items():
+        try:
+            start_hour, start_min = map(int, info['start'].split(':'))
+            end_hour, end_min = map(int, info['end'].split(':'))
+        except (KeyError, ValueError, AttributeError):
+            continue
+        windows.append((
+            int(key),
+            datetime.datetime.combine(day, datetime.time(start_hour, start_min)),
+            datetime.datetime.combine(day, datetime.time(end_hour, end_min)),
+        ))
+    return windows
+
+
+def window_mask(day, start, end):
+    """
+    Return the mask of all periods on a day that overlap [start, end).
+
+    Args:
+        day (date): Day to look at
+        start (datetime): Window start
+        end (datetime): Window end
+
+    Returns:
+        int: Bitmask of overlapping periods
+    """
+    mask = 0
+    for period, period_start, period_end in _period_windows(day):
+        if period_start < end and period_end > start:
+            mask |= period_bit(period)
+    return mask
+
+
+def booking_masks(booking):
+    """
+    Compute the occupied periods of a booking per day.
+
+    Args:
+        booking (dict): Booking with Start, End and optional Period
+
+    Returns:
+        dict: 'YYYY-MM-DD' -> bitmask (days without occupied periods are omitted)
+    """
+    start = booking.get('Start')
+    if not isinstance(start, datetime.datetime):
+        return {}
+    start = start.replace(tzinfo=None)
+    end = booking.get('End')
+    end = end.replace(tzinfo=None) if isinstance(end, datetime.datetime) else start + DEFAULT_BOOKING_DURATION
+
+    masks = {}
+    day = start.date()
+    last_day = max(day, (end - datetime.timedelta(microseconds=1)).date())
+    last_day = min(last_day, day + datetime.timedelta(days=MAX_SPAN_DAYS))
+    while day <= last_day:
+        mask = window_mask(day, start, end)
+        if day == start.date() and booking.get('Period') is not None:
+            try:
+                mask |= period_bit(booking['Period'])
+            except (TypeError, ValueError):
+                pass
+        if mask:
+            masks[day.isoformat()] = mask
+        day += datetime.timedelta(days=1)
+    return masks
+
+
+def _day_key(item_id, date_str):
+    return f"{item_id}|{date_str}"
+
+
+def _date_str(value):
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+def release_booking(booking_id):
+    """
+    Remove a booking from all occupancy documents.
+
+    Args:
+        booking_id (str/ObjectId): ID of the booking
+    """
+    try:
+        collection = database.get_db()[COLLECTION]
+        collection.update_many(
+            {'Bookings.id': str(booking_id)},
+            {'$pull': {'Bookings': {'id': str(booking_id)}}}
+        )
+    except Exception as e:
+        print(f"Error releasing occupancy of booking {booking_id}: {e}")
+
+
+def release_bookings(booking_ids):
+    """
+    Remove several bookings from all occupancy documents with one update.
+
+    Args:
+        booking_ids (iterable): IDs of the bookings
+    """
+    ids = [str(booking_id) for booking_id in booking_ids]
+    if not ids:
+        return
+    try:
+        collection = database.get_db()[COLLECTION]
+        collection.update_many(
+            {'Bookings.id': {'$in': ids}},
+            {'$pull': {'Bookings': {'id': {'$in': ids}}}}
+        )
+    except Exception as e:
+        print(f"Error releasing occupancy of bookings: {e}")
+
+
+def sync_booking(booking):
+    """
+    Bring the occupancy in line with the current state of a booking.
+    Idempotent: the booking is first removed everywhere, then added again for
+    its days if its status still occupies the item.
+
+    Args:
+        booking (dict): Full booking document including '_id'
+    """
+    booking_id = str(booking['_id'])
+    release_booking(booking_id)
+    if booking.get('Status') not in OCCUPYING_STATUSES or not booking.get('Item'):
+        return
+
+    try:
+        collection = database.get_db()[COLLECTION]
+        raw_item_id = str(booking['Item'])
+        item_id = it.get_parent_item_id(raw_item_id)
+        for date_str, mask in booking_masks(booking).items():
+            collection.update_one(
+                {'_id': _day_key(item_id, date_str)},
+                {
+                    '$setOnInsert': {'Item': item_id, 'Date': date_str},
+                    '$push': {'Bookings': {
+                        'id': booking_id,
+                        'mask': mask,
+                        'item': raw_item_id,
+                        'exemplar': raw_item_id != item_id,
+                    }},
+                },
+                upsert=True
+            )
+    except Exception as e:
+        print(f"Error updating occupancy of booking {booking_id}: {e}")
+
+
+def sync_booking_id(booking_id):
+    """
+    Reload a booking and sync its occupancy (releases it if it was deleted).
+
+    Args:
+        booking_id (str/ObjectId): ID of the booking
+    """
+    try:
+        booking = database.get_db()['ausleihungen'].find_one(
+            {'_id': ObjectId(str(booking_id))},
+            {'Item': 1, 'Status': 1, 'Start': 1, 'End': 1, 'Period': 1}
+        )
+    except Exception as e:
+        print(f"Error loading booking {booking_id} for occupancy: {e}")
+        return
+    if booking is None:
+        release_booking(booking_id)
+    else:
+        sync_booking(booking)
+
+
+def get_days(item_id, dates):
+    """
+    Load the occupancy of an item for several days with one query.
+
+    Args:
+        item_id (str): Item ID (exemplar IDs are mapped to their parent)
+        dates (iterable): Days as date, datetime or 'YYYY-MM-DD'
+
+    Returns:
+        dict: 'YYYY-MM-DD' -> occupancy document (missing days are free)
+    """
+    item_id = it.get_parent_item_id(item_id)
+    keys = [_day_key(item_id, _date_str(date)) for date in dates]
+    if not keys:
+        return {}
+    collection = database.get_db()[COLLECTION]
+    return {doc['Date']: doc for doc in collection.find({'_id': {'$in': keys}})}
+
+
+def get_day(item_id, date):
+    """
+    Load the occupancy of an item for one day.
+
+    Args:
+        item_id (str): Item ID
+        date: Day as date, datetime or 'YYYY-MM-DD'
+
+    Returns:
+        dict: Occupancy document or None if nothing is booked
+    """
+    return get_days(item_id, [date]).get(_date_str(date))
+
+
+def get_range(item_ids, start_date, end_date):
+    """
+    Load the occupancy of many items over a date range with one query.
+
+    Args:
+        item_ids (iterable): Item IDs (exemplar IDs are mapped to their parent)
+        start_date: First day (date, datetime or 'YYYY-MM-DD')
+        end_date: Last day, inclusive
+
+    Returns:
+        dict: item_id -> {'YYYY-MM-DD': occupancy document}
+    """
+    parents = list(dict.fromkeys(it.get_parent_item_id(item_id) for item_id in item_ids))
+    result = {item_id: {} for item_id in parents}
+    if not parents:
+        return result
+    collection = database.get_db()[COLLECTION]
+    cursor = collection.find({
+        'Item': {'$in': parents},
+        'Date': {'$gte': _date_str(start_date), '$lte': _date_str(end_date)},
+    })
+    for doc in cursor:
+        result.setdefault(doc['Item'], {})[doc['Date']] = doc
+    return result
+
+
+def occupied_mask(day_doc):
+    """
+    Return the OR of all booking masks of a day.
+
+    Args:
+        day_doc (dict): Occupancy document or None
+
+    Returns:
+        int: Bitmask of occupied periods
+    """
+    mask = 0
+    for booking in (day_doc or {}).get('Bookings', []):
+        mask |= booking.get('mask', 0)
+    return mask
+
+
+def period_counts(day_doc):
+    """
+    Count the bookings (exemplars) per occupied period of a day.
+
+    Args:
+        day_doc (dict): Occupancy document or None
+
+    Returns:
+        dict: Period number -> number of bookings
+    """
+    counts = {}
+    for booking in (day_doc or {}).get('Bookings', []):
+        for period in mask_periods(booking.get('mask', 0)):
+            counts[period] = counts.get(period, 0) + 1
+    return counts
+
+
+def item_capacity(item_id):
+    """
+    Return how many bookings of an item may overlap: its number of exemplars.
+
+    Args:
+        item_id (str): Item or exemplar ID
+
+    Returns:
+        int: Exemplare of the parent item (at least 1)
+    """
+    item = it.get_item(it.get_parent_item_id(item_id))
+    try:
+        return max(1, int((item or {}).get('Exemplare', 1) or 1))
+    except (TypeError, ValueError):
+        return 1
+
+
+def blocked_mask(day_doc, item_id=None, capacity=1):
+    """
+    Return the periods of a day in which an item or exemplar cannot be booked.
+
+    A period is blocked if a booking of the same item or exemplar ID overlaps
+    it, or if capacity bookings (of the item and all its exemplars) do.
+
+    Args:
+        day_doc (dict): Occupancy document or None
+        item_id (str, optional): Item or exemplar ID to book
+        capacity (int): Number of exemplars of the item
+
+    Returns:
+        int: Bitmask of blocked periods
+    """
+    day_doc = day_doc or {}
+    mask = 0
+    if item_id is not None:
+        item_id = str(item_id)
+        for booking in day_doc.get('Bookings', []):
+            # Entries written before 'item' was stored belong to the parent
+            if booking.get('item', day_doc.get('Item')) == item_id:
+                mask |= booking.get('mask', 0)
+    for period, count in period_counts(day_doc).items():
+        if count >= capacity:
+            mask |= period_bit(period)
+    return mask
+
+
+def conflicting_bookings(day_doc, mask, item_id=None, capacity=1):
+    """
+    Return the IDs of the bookings of a day that keep a period mask from being
+    booked (see blocked_mask()).
+
+    Args:
+        day_doc (dict): Occupancy document or None
+        mask (int): Requested periods
+        item_id (str, optional): Item or exemplar ID to book
+        capacity (int): Number of exemplars of the item
+
+    Returns:
+        list: Booking IDs
+    """
+    mask &= blocked_mask(day_doc, item_id, capacity)
+    return [b['id'] for b in (day_doc or {}).get('Bookings', []) if b.get('mask', 0) & mask]
+
+
+def request_masks(start, end, period=None, period_end=None):
+    """
+    Compute the period masks per day requested by a new booking.
+
+    Args:
+        start (datetime): Start of the new booking
+        end (datetime): End of the new booking
+        period (int, optional): First period (period-based booking)
+        period_end (int, optional): Last period of a period range
+
+    Returns:
+        dict: 'YYYY-MM-DD' -> bitmask
+    """
+    masks = booking_masks({'Start': start, 'End': end})
+    if period is not None:
+        last = int(period_end) if period_end is not None else int(period)
+        day = start.date().isoformat()
+        masks[day] = masks.get(day, 0) | periods_mask(range(int(period), last + 1))
+    return masks
+
+
+def check_conflict(item_id, start, end, period=None, period_end=None, days=None, capacity=None):
+    """
+    Check a new booking against the occupancy with bit operations.
+
+    Args:
+        item_id (str): Item ID
+        start (datetime): Start of the new booking
+        end (datetime): End of the new booking
+        period (int, optional): First period
+        period_end (int, optional): Last period of a period range
+        days (dict, optional): Preloaded result of get_days for the item
+        capacity (int, optional): Exemplare of the item (loaded if omitted)
+
+    Returns:
+        bool: True on conflict, False if free, None if the window does not
+              touch any school period (the caller has to fall back to the
+              time-based check)
+    """
+    masks = request_masks(start, end, period, period_end)
+    if not masks:
+        return None
+    if days is None:
+        days = get_days(item_id, masks.keys())
+    if capacity is None:
+        capacity = item_capacity(item_id)
+    return any(blocked_mask(days.get(day), item_id, capacity) & mask for day, mask in masks.items())
+
+
+def add_to_days(days, booking):
+    """
+    Add a just created booking to preloaded occupancy documents, so further
+    checks within the same request see it.
+
+    Args:
+        days (dict): Result of get_days
+        booking (dict): Booking with '_id', Item, Start, End and optional Period
+    """
+    for date_str, mask in booking_masks(booking).items():
+        day_doc = days.setdefault(date_str, {'Date': date_str, 'Bookings': []})
+        day_doc['Bookings'].append({'id': str(booking.get('_id')), 'mask': mask, 'item': str(booking.get('Item'))})
+
+
+def rebuild(item_id=None):
+    """
+    Recreate the occupancy from all planned and active bookings.
+
+    Args:
+        item_id (str, optional): Only rebuild this item (and its exemplars)
+
+    Returns:
+        int: Number of bookings processed
+    """
+    db = database.get_db()
+    collection = db[COLLECTION]
+    query = {'Status': {'$in': list(OCCUPYING_STATUSES)}}
+    if item_id:
+        item_id = it.get_parent_item_id(item_id)
+        collection.delete_many({'Item': item_id})
+        query['Item'] = {'$in': [item_id, re.compile('^' + re.escape(item_id) + r'_\d+$')]}
+    else:
+        collection.delete_many({})
+
+    count = 0
+    projection = {'Item': 1, 'Status': 1, 'Start': 1, 'End': 1, 'Period': 1}
+    for booking in db['ausleihungen'].find(query, projection):
+        sync_booking(booking)
+        count += 1
+    return count
@@ -0,0 +1,162 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Precomputed JSON Responses
+==========================
+
+Read-mostly JSON endpoints are serialised once per content version. Later
+requests for the same version are answered from the cached bytes (gzip
+compressed if the client accepts it), or with 304 Not Modified if the
+client sends the version back in If-None-Match.
+
+Content versions come from item_cache.version() for data derived from the
+items collection, and from counters bumped with bump() for small reference
+data such as predefined locations and filter values:
+
+    {'_id': 'version:<name>', 'seq': <int>}   (in 'counters')
+
+Like the item cache, a process re-reads a version from MongoDB at most every
+cache.check_interval_seconds.
+"""
+import collections
+import gzip
+import hashlib
+import threading
+import time
+
+from flask import Response, current_app, request
+from pymongo import ReturnDocument
+
+import database
+import settings as cfg
+
+
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+# Upper bound for all cached bodies (plain + gzip) of a process
+MAX_CACHED_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_CONTROL = 'private, no-cache'
+
+_lock = threading.Lock()
+_payloads = collections.OrderedDict()   # key -> (version, body, gzipped body)
+_cached_bytes = 0
+_versions = {}                          # name -> (seq, checked at)
+
+
+def version(name):
+    """
+    Return the current version of a piece of reference data.
+
+    Args:
+        name (str): Version name, e.g. 'locations'
+
+    Returns:
+        int: Version number (0 if it was never bumped)
+    """
+    now = time.monotonic()
+    cached = _versions.get(name)
+    if cached and now - cached[1] < cfg.CACHE_CHECK_INTERVAL:
+        return cached[0]
+    doc = database.get_db()['counters'].find_one({'_id': f'version:{name}'}, {'seq': 1})
+    seq = doc['seq'] if doc else 0
+    _versions[name] = (seq, now)
+    return seq
+
+
+def bump(name):
+    """
+    Mark a piece of reference data as changed in all processes.
+
+    Args:
+        name (str): Version name, e.g. 'locations'
+    """
+    try:
+        doc = database.get_db()['counters'].find_one_and_update(
+            {'_id': f'version:{name}'},
+            {'$inc': {'seq': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        _versions[name] = (doc['seq'], time.monotonic())
+    except Exception as e:
+        print(f"Error bumping version {name}: {e}")
+
+
+def dumps(obj):
+    """Serialise like jsonify() does and return UTF-8 bytes."""
+    return current_app.json.dumps(obj).encode('utf-8')
+
+
+def _compress(body):
+    if len(body) < GZIP_MIN_SIZE:
+        return None
+    return gzip.compress(body, GZIP_LEVEL)
+
+
+def _cached(key, tag, build):
+    """Return (body, gzipped body) for a version, building it on a miss."""
+    global _cached_bytes
+    with _lock:
+        entry = _payloads.get(key)
+        if entry and entry[0] == tag:
+            _payloads.move_to_end(key)
+            return entry[1], entry[2]
+
+    body = build()
+    compressed = _compress(body)
+    size = len(body) + len(compressed or b'')
+    with _lock:
+        old = _payloads.pop(key, None)
+        if old:
+            _cached_bytes -= len(old[1]) + len(old[2] or b'')
+        if size <= MAX_CACHED_BYTES:
+            _payloads[key] = (tag, body, compressed)
+            _cached_bytes += size
+            while _cached_bytes > MAX_CACHED_BYTES:
+                _, evicted = _payloads.popitem(last=False)
+                _cached_bytes -= len(evicted[1]) + len(evicted[2] or b'')
+    return body, compressed
+
+
+def respond(key, content_version, build, cache_control=DEFAULT_CACHE_CONTROL):
+    """
+    Answer a request with a JSON body that only changes with its version.
+
+    Args:
+        key (tuple): Cache key, e.g. the endpoint and its arguments
+        content_version (str): Version of the content; None to skip the
+            cache and derive the ETag from the body
+        build (callable): Returns the JSON body as bytes (see dumps())
+        cache_control (str): Cache-Control header
+
+    Returns:
+        flask.Response: 200 with the body or 304
+    """
+    if content_version is not None:
+        tag = str(content_version)
+        not_modified = request.if_none_match.contains_weak(tag)
+        if not not_modified:
+            body, compressed = _cached(key, tag, build)
+    else:
+        body = build()
+        tag = hashlib.sha1(body).hexdigest()[:20]
+        not_modified = request.if_none_match.contains_weak(tag)
+        compressed = None if not_modified else _compress(body)
+
+    if not_modified:
+        response = Response(status=304)
+    elif compressed is not None and request.accept_encodings['gzip']:
+        response = Response(compressed, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(tag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,487 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Scheduled Jobs
+==============
+
+Background jobs of the application: the daily booking backup, the
+booking status updates and resuming unfinished image conversions. The jobs either run inside the web workers
+(scheduler.enabled) or in a dedicated process:
+
+    python scheduler.py
+
+In both cases every process runs a scheduler, but only the process elected
+by leader.py executes the jobs; the others keep sending heartbeats and take
+over when the leader stops. Web workers can therefore keep
+scheduler.enabled on while a dedicated scheduler process is running.
+"""
+import datetime
+import os
+import signal
+import sys
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+import ausleihung as au
+import database
+import image_jobs
+import items as it
+import leader
+import media_store
+import notifications
+import occupancy
+import settings as cfg
+
+
+STATUS_JOB_ID = 'appointment_statuses'
+BACKUP_JOB_ID = 'daily_backup'
+IMAGE_JOB_ID = 'image_jobs'
+MEDIA_SWEEP_JOB_ID = 'media_sweep'
+HEARTBEAT_JOB_ID = 'leader_heartbeat'
+
+SIGNAL_COLLECTION = 'scheduler_signals'
+STATUS_SIGNAL_ID = 'status'
+
+_scheduler = None
+
+
+def create_daily_backup():
+    """
+    Erstellt täglich ein Backup der Ausleihungsdatenbank
+    """
+    try:
+        print(f"[{datetime.datetime.now()}] Erstelle Backup der Ausleihungsdatenbank...")
+        result = au.create_backup_database()
+        if result:
+            print(f"[{datetime.datetime.now()}] Backup erfolgreich erstellt")
+        else:
+            print(f"[{datetime.datetime.now()}] Fehler beim Erstellen des Backups")
+    except Exception as e:
+        print(f"[{datetime.datetime.now()}] Ausnahme beim Erstellen des Backups: {str(e)}")
+
+def _due_status_query(now):
+    """
+    Query for open bookings whose Start or End boundary has been crossed.
+
+    Each branch matches one of the partial indexes 'planned_start' and
+    'active_end', so the query only touches bookings that are actually due.
+    Bookings that were transitioned drop out of these indexes, which makes a
+    lower bound on the last tick unnecessary and lets missed ticks catch up.
+    """
+    return {'$or': [
+        {'Status': 'planned', 'Start': {'$lte': now}},
+        {'Status': 'active', 'End': {'$lte': now}},
+    ]}
+
+
+def _period_boundaries(day):
+    """Return all SCHOOL_PERIODS start and end times on the given date."""
+    boundaries = []
+    for period in cfg.SCHOOL_PERIODS.values():
+        for key in ('start', 'end'):
+            try:
+                hours, minutes = str(period.get(key, '')).split(':')
+                boundaries.append(datetime.datetime.combine(day, datetime.time(int(hours), int(minutes))))
+            except (ValueError, TypeError):
+                continue
+    return boundaries
+
+
+def _next_status_boundary(ausleihungen, now):
+    """
+    Determine when the next booking status can change.
+
+    Args:
+        ausleihungen (Collection): The bookings collection
+        now (datetime): Current time
+
+    Returns:
+        datetime: Earliest upcoming Start of a planned booking, End of an
+        active booking or SCHOOL_PERIODS boundary. Bookings added or changed
+        later wake the job through request_status_update().
+    """
+    candidates = []
+    for status, field in (('planned', 'Start'), ('active', 'End')):
+        doc = ausleihungen.find_one(
+            {'Status': status, field: {'$gt': now}},
+            {field: 1},
+            sort=[(field, 1)]
+        )
+        if doc and doc.get(field):
+            candidates.append(doc[field])
+    for day in (now.date(), now.date() + datetime.timedelta(days=1)):
+        candidates.extend(b for b in _period_boundaries(day) if b > now)
+    return min(candidates, default=now + datetime.timedelta(days=1))
+
+
+def _schedule_next_status_update(now):
+    """Schedule the next status run at the next known boundary (boundary mode only)."""
+    try:
+        run_date = _next_status_boundary(database.get_db()['ausleihungen'], now)
+    except Exception as e:
+        print(f"Fehler beim Ermitteln der nächsten Statusgrenze: {e}")
+        run_date = now + datetime.timedelta(minutes=cfg.SCHEDULER_INTERVAL_MIN)
+    try:
+        _scheduler.add_job(
+            func=run_status_job,
+            trigger='date',
+            run_date=run_date + datetime.timedelta(seconds=1),
+            id=STATUS_JOB_ID,
+            replace_existing=True
+        )
+    except Exception as e:
+        print(f"Fehler beim Planen der nächsten Statusaktualisierung: {e}")
+
+
+def request_status_update():
+    """
+    Ask the leader to rerun the status job after a booking was added or changed.
+
+    The leader may be another process, so the request is stored in the
+    database and picked up with the next heartbeat. Only needed in boundary
+    mode; the interval mode picks up every booking on its next run.
+    """
+    if not cfg.SCHEDULER_SLEEP_UNTIL_BOUNDARY:
+        return
+    try:
+        database.get_db()[SIGNAL_COLLECTION].update_one(
+            {'_id': STATUS_SIGNAL_ID},
+            {'$set': {'requested': datetime.datetime.now()}},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"Fehler beim Anfordern einer Statusaktualisierung: {e}")
+
+
+def _heartbeat():
+    """Renew the leadership and run the status job early if a booking changed."""
+    if not leader.heartbeat() or _scheduler is None or not cfg.SCHEDULER_SLEEP_UNTIL_BOUNDARY:
+        return
+    try:
+        requested = database.get_db()[SIGNAL_COLLECTION].find_one_and_delete({'_id': STATUS_SIGNAL_ID})
+    except Exception as e:
+        print(f"Fehler beim Lesen der Statusanforderung: {e}")
+        return
+    if requested:
+        # Runs now; afterwards the job reschedules itself at the next boundary
+        _scheduler.add_job(func=run_status_job, id=STATUS_JOB_ID, replace_existing=True)
+
+
+def _find_activation_conflicts(db, appointments, current_time, ending_ids=()):
+    """
+    Check planned → active transitions for items that are already borrowed.
+
+    Loads all affected items with one query and counts their active bookings
+    with one aggregation. Activations within the same run are counted as well,
+    so two bookings of the same item starting together are detected, while
+    bookings ending in the same run no longer hold the item.
+
+    Args:
+        db (Database): Database handle
+        appointments (list): Bookings that become active
+        current_time (datetime): Time of this run
+        ending_ids (iterable, optional): IDs of active bookings ending in this run
+
+    Returns:
+        dict: Booking _id -> extra fields to set (conflict flags)
+    """
+    item_ids = {a.get('Item') for a in appointments if a.get('Item')}
+    if not item_ids:
+        return {}
+
+    object_ids = []
+    for item_id in item_ids:
+        try:
+            object_ids.append(ObjectId(item_id))
+        except Exception:
+            continue
+    item_docs = {
+        str(doc['_id']): doc
+        for doc in db['items'].find(
+            {'_id': {'$in': object_ids}},
+            {'Verfuegbar': 1, 'User': 1, 'Name': 1, 'Exemplare': 1}
+        )
+    }
+    active_counts = {
+        row['_id']: row['count']
+        for row in db['ausleihungen'].aggregate([
+            {'$match': {'Item': {'$in': list(item_ids)}, 'Status': 'active', '_id': {'$nin': list(ending_ids)}}},
+            {'$group': {'_id': '$Item', 'count': {'$sum': 1}}},
+        ])
+    }
+
+    extra = {}
+    for appointment in appointments:
+        item_id_str = appointment.get('Item')
+        item_doc = item_docs.get(item_id_str)
+        if not item_doc:
+            continue
+        try:
+            total_exemplare = int(item_doc.get('Exemplare', 1))
+        except (ValueError, TypeError):
+            total_exemplare = 1
+        active_borrows = active_counts.get(item_id_str, 0)
+        if active_borrows >= total_exemplare or item_doc.get('Verfuegbar') is False:
+            borrower = item_doc.get('User', 'unbekannter Benutzer')
+            item_name = item_doc.get('Name', item_id_str)
+            conflict_note = (
+                f"Gegenstand '{item_name}' war beim Aktivieren von "
+                f"'{appointment.get('User', '?')}' bereits ausgeliehen "
+                f"von '{borrower}' (aktive Borrows: {active_borrows}/{total_exemplare})."
+            )
+            extra[appointment['_id']] = {
+                'ConflictDetected': True,
+                'ConflictNote': conflict_note,
+                'ConflictAt': current_time,
+            }
+        else:
+            # No conflict — clear any previously stored conflict flag
+            extra[appointment['_id']] = {'ConflictDetected': False, 'ConflictNote': ''}
+        active_counts[item_id_str] = active_borrows + 1
+    return extra
+
+
+def _flash_transitions(transitions, conflict_fields):
+    """Tell the booking users that their bookings were activated or completed."""
+    names = it.get_items_by_ids((a.get('Item') for a, old, new in transitions), fields=('Name',))
+    for appointment, old_status, new_status in transitions:
+        user = appointment.get('User')
+        if not user or conflict_fields.get(appointment['_id'], {}).get('ConflictDetected'):
+            # Conflicts are sent as 'conflict' events
+            continue
+        item_id = appointment.get('Item')
+        name = (names.get(str(item_id)) or {}).get('Name', item_id)
+        if old_status == 'planned' and new_status == 'active':
+            notifications.flash(user, f"Ihre Reservierung für '{name}' ist jetzt aktiv.", 'success')
+        elif new_status == 'completed':
+            notifications.flash(user, f"Ihre Reservierung für '{name}' ist beendet.", 'info')
+
+
+def update_appointment_statuses():
+    """
+    Aktualisiert automatisch die Status aller Terminplaner-Einträge.
+
+    Es werden nur Termine geladen, deren Start- oder Endzeit überschritten
+    wurde (indizierte Abfrage), und alle Änderungen mit einem bulk_write
+    geschrieben:
+    - Geplante Termine, die aktiviert werden sollten
+    - Aktive Termine, die beendet werden sollten
+    """
+    current_time = datetime.datetime.now()
+    # Prepare logging early so it's available in exception paths
+    log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    log_file = os.path.join(log_dir, 'scheduler.log')
+
+    try:
+        db = database.get_db()
+        ausleihungen = db['ausleihungen']
+
+        # Nur Termine, deren Grenze überschritten wurde
+        due_appointments = list(ausleihungen.find(_due_status_query(current_time)))
+        if not due_appointments:
+            return
+
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(f"[{current_time}] Starte automatische Statusaktualisierung...\n")
+        print(f"[{current_time}] Starte automatische Statusaktualisierung...")
+
+        transitions = []
+        for appointment in due_appointments:
+            old_status = appointment.get('Status')
+            new_status = au.get_current_status(appointment, log_changes=True, user='scheduler')
+            if new_status != old_status:
+                transitions.append((appointment, old_status, new_status))
+
+        # --- Conflict resolver: planned → active transition ---
+        # Check if the physical item is already borrowed by someone else
+        activations = [a for a, old, new in transitions if old == 'planned' and new == 'active']
+        ending_ids = [a['_id'] for a, old, new in transitions if old == 'active']
+        conflict_fields = {}
+        if activations:
+            try:
+                conflict_fields = _find_activation_conflicts(db, activations, current_time, ending_ids)
+            except Exception as conflict_err:
+                print(f"  [WARN] Konfliktprüfung fehlgeschlagen: {conflict_err}")
+
+        operations = []
+        for appointment, old_status, new_status in transitions:
+            extra_fields = conflict_fields.get(appointment['_id'], {}) if new_status == 'active' else {}
+            if extra_fields.get('ConflictDetected'):
+                conflict_log = (
+                    f"  [KONFLIKT] Termin {appointment['_id']}: "
+                    f"planned → active, aber {extra_fields['ConflictNote']}"
+                )
+                print(conflict_log)
+                with open(log_file, 'a', encoding='utf-8') as f:
+                    f.write(f"[{current_time}] {conflict_log}\n")
+            # Filter on the old status so concurrent manual changes are not overwritten
+            operations.append(UpdateOne(
+                {'_id': appointment['_id'], 'Status': old_status},
+                {'$set': {
+                    'Status': new_status,
+                    'LastUpdated': current_time,
+                    **extra_fields
+                }}
+            ))
+
+        updated_count = 0
+        activated_count = 0
+        completed_count = 0
+        if operations:
+            result = ausleihungen.bulk_write(operations, ordered=False)
+            updated_count = result.modified_count
+
+            released = [a['_id'] for a, old, new in transitions if new not in occupancy.OCCUPYING_STATUSES]
+            if released:
+                occupancy.release_bookings(released)
+
+            # Tell the booking user and the admins about conflicts right away
+            for appointment, old_status, new_status in transitions:
+                fields = conflict_fields.get(appointment['_id'], {}) if new_status == 'active' else {}
+                if fields.get('ConflictDetected'):
+                    notifications.publish('conflict', {
+                        'booking': str(appointment['_id']),
+                        'item': appointment.get('Item'),
+                        'note': fields.get('ConflictNote', ''),
+                    }, user=appointment.get('User'), admin=True)
+            _flash_transitions(transitions, conflict_fields)
+
+            with open(log_file, 'a', encoding='utf-8') as f:
+                for appointment, old_status, new_status in transitions:
+                    if new_status == 'active':
+                        activated_count += 1
+                    elif new_status == 'completed':
+                        completed_count += 1
+                    log_msg = f"  - Termin {appointment['_id']}: {old_status} → {new_status}"
+                    print(log_msg)
+                    f.write(f"[{current_time}] {log_msg}\n")
+
+        if updated_count > 0:
+            result_msg = f"Statusaktualisierung abgeschlossen: {updated_count} Termine aktualisiert"
+            detail_msg = f"  - {activated_count} aktiviert, {completed_count} abgeschlossen"
+            print(f"[{current_time}] {result_msg}")
+            print(f"[{current_time}] {detail_msg}")
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.write(f"[{current_time}] {result_msg}\n")
+                f.write(f"[{current_time}] {detail_msg}\n")
+        else:
+            result_msg = "Statusaktualisierung abgeschlossen: Keine Änderungen erforderlich"
+            print(f"[{current_time}] {result_msg}")
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.write(f"[{current_time}] {result_msg}\n")
+
+    except Exception as e:
+        error_msg = f"Fehler bei der automatischen Statusaktualisierung: {str(e)}"
+        print(f"[{datetime.datetime.now()}] {error_msg}")
+        try:
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.write(f"[{datetime.datetime.now()}] {error_msg}\n")
+        except Exception:
+            pass
+        import traceback
+        traceback.print_exc()
+
+
+def run_status_job():
+    """
+    Run the status update in the leader process.
+
+    In scheduler.sleep_until_boundary mode the job reschedules itself at the
+    next known boundary (booking Start/End or SCHOOL_PERIODS start/end)
+    instead of running at a fixed interval. Followers reschedule as well, so
+    they keep the job when they take over.
+    """
+    try:
+        if leader.heartbeat():
+            update_appointment_statuses()
+    finally:
+        if _scheduler is not None and cfg.SCHEDULER_SLEEP_UNTIL_BOUNDARY:
+            _schedule_next_status_update(datetime.datetime.now())
+
+
+def _add_jobs(sched):
+    """Register all jobs and the leader heartbeat on a scheduler."""
+    heartbeat_seconds = max(1, int(cfg.SCHEDULER_LEASE_SECONDS) // 3)
+    sched.add_job(func=_heartbeat, trigger="interval", seconds=heartbeat_seconds,
+                  id=HEARTBEAT_JOB_ID, next_run_time=datetime.datetime.now())
+    sched.add_job(func=leader.leader_only(create_daily_backup), trigger="interval",
+                  hours=cfg.BACKUP_INTERVAL_HOURS, id=BACKUP_JOB_ID)
+    # Picks up image conversions left behind by restarted or crashed workers
+    sched.add_job(func=leader.leader_only(image_jobs.resume_pending), trigger="interval",
+                  minutes=image_jobs.STALE_MINUTES, id=IMAGE_JOB_ID,
+                  next_run_time=datetime.datetime.now())
+    # Removes stored files nobody references, e.g. covers of items never saved
+    sched.add_job(func=leader.leader_only(media_store.sweep), trigger="interval",
+                  hours=1, id=MEDIA_SWEEP_JOB_ID)
+    if cfg.SCHEDULER_SLEEP_UNTIL_BOUNDARY:
+        # Runs once now and then reschedules itself at the next status boundary
+        sched.add_job(func=run_status_job, id=STATUS_JOB_ID)
+    else:
+        sched.add_job(func=run_status_job, trigger="interval",
+                      minutes=cfg.SCHEDULER_INTERVAL_MIN, id=STATUS_JOB_ID)
+
+
+def start_background():
+    """
+    Start the jobs in a background thread of the current (web) process.
+
+    Returns:
+        BackgroundScheduler: The running scheduler
+    """
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+    _scheduler = BackgroundScheduler()
+    _add_jobs(_scheduler)
+    _scheduler.start()
+    return _scheduler
+
+
+def shutdown():
+    """Stop the scheduler and hand over leadership to another process."""
+    global _scheduler
+    if _scheduler is None:
+        return
+    try:
+        _scheduler.shutdown(wait=False)
+    except Exception as e:
+        print(f"Error stopping scheduler: {e}")
+    _scheduler = None
+    leader.release()
+
+
+def main():
+    """Run the jobs in the foreground as a dedicated scheduler process."""
+    global _scheduler
+    _scheduler = BlockingScheduler()
+    _add_jobs(_scheduler)
+
+    def handle_signal(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    print(f"[{datetime.datetime.now()}] Scheduler started ({leader.get_holder_id()}, "
+          f"leader election: {cfg.SCHEDULER_LEADER_ELECTION})")
+    try:
+        _scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        leader.release()
+        print(f"[{datetime.datetime.now()}] Scheduler stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+Item Search
+===========
+
+In-memory inverted index over the searchable item fields (Name, Beschreibung,
+Ort, Code_4, Filter, Filter2, Filter3), used by /search_word.
+
+Text is normalised before indexing and querying: lower case, German umlauts
+and ß folded (ä -> ae, ö -> oe, ü -> ue, ß -> ss), remaining accents removed.
+Every query token must match (AND); a token matches an indexed word exactly,
+as a prefix or, for tokens of at least three characters, anywhere inside the
+word. Results are ranked by field weight and match quality.
+
+Each worker process keeps its own index. Writes through items.py update it
+directly; changes made by other workers are picked up by a cheap freshness
+probe (item count and newest LastUpdated) at most every REFRESH_INTERVAL seconds.
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+
+import database
+
+
+REFRESH_INTERVAL = 5
+
+# Weight of a match per field; Code_4 and Name matter most
+FIELD_WEIGHTS = {
+    'Code_4': 8,
+    'Name': 5,
+    'Filter': 3,
+    'Filter2': 3,
+    'Filter3': 3,
+    'Ort': 2,
+    'Beschreibung': 1,
+}
+
+# Multiplier per match quality
+EXACT_MATCH = 4
+PREFIX_MATCH = 2
+INFIX_MATCH = 1
+MIN_INFIX_LENGTH = 3
+
+_FOLDING = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+_lock = threading.RLock()
+_postings = {}        # token -> {item_id: weight}
+_doc_tokens = {}      # item_id -> set of tokens
+_doc_names = {}       # item_id -> normalised name (tie-breaker)
+_vocabulary = []      # sorted list of all tokens
+_built = False
+_last_updated = None
+_last_check = 0.0
+
+
+def normalize(text):
+    """
+    Normalise text for indexing and querying.
+
+    Args:
+        text (str): Raw text
+
+    Returns:
+        str: Lower-case text with umlauts/ß folded and accents removed
+    """
+    text = str(text).lower().translate(_FOLDING)
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(value):
+    """
+    Split a field value (str, number or list) into normalised tokens.
+
+    Args:
+        value: Field value
+
+    Returns:
+        list: Tokens in order of appearance
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        tokens = []
+        for part in value:
+            tokens.extend(tokenize(part))
+        return tokens
+    return _TOKEN_RE.findall(normalize(value))
+
+
+def _item_weights(item):
+    """Return {token: weight} for an item, keeping the best field weight per token."""
+    weights = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(item.get(field)):
+            if weights.get(token, 0) < weight:
+                weights[token] = weight
+    return weights
+
+
+def _remove_locked(item_id):
+    """Remove an item from the index. Caller must hold _lock."""
+    for token in _doc_tokens.pop(item_id, ()):
+        posting = _postings.get(token)
+        if posting is None:
+            continue
+        posting.pop(item_id, None)
+        if not posting:
+            del _postings[token]
+            pos = bisect.bisect_left(_vocabulary, token)
+            if pos < len(_vocabulary) and _vocabulary[pos] == token:
+                del _vocabulary[pos]
+    _doc_names.pop(item_id, None)
+
+
+def _add_locked(item):
+    """Add or replace an item in the index. Caller must hold _lock."""
+    item_id = str(item['_id'])
+    _remove_locked(item_id)
+    weights = _item_weights(item)
+    for token, weight in weights.items():
+        posting = _postings.get(token)
+        if posting is None:
+            posting = _postings[token] = {}
+            bisect.insort(_vocabulary, token)
+        posting[item_id] = weight
+    _doc_tokens[item_id] = set(weights)
+    _doc_names[item_id] = normalize(item.get('Name') or '')
+
+
+def _track_last_updated(item):
+    """Remember the newest LastUpdated seen. Caller must hold _lock."""
+    global _last_updated
+    last_updated = item.get('LastUpdated')
+    if last_updated is not None and (_last_updated is None or last_updated > _last_updated):
+        _last_updated = last_updated
+
+
+def rebuild():
+    """
+    Build the index from scratch from the items collection.
+
+    Returns:
+        int: Number of indexed items
+    """
+    global _built, _last_updated, _last_check
+    projection = {field: 1 for field in FIELD_WEIGHTS}
+    projection['LastUpdated'] = 1
+    db = database.get_db()
+    docs = list(db['items'].find({}, projection))
+
+    with _lock:
+        _postings.clear()
+        _doc_tokens.clear()
+        _doc_names.clear()
+        del _vocabulary[:]
+        _last_updated = None
+        for item in docs:
+            _add_locked(item)
+            _track_last_updated(item)
+        _built = True
+        _last_check = time.monotonic()
+    return len(docs)
+
+
+def _ensure_fresh():
+    """Build the index on first use and pick up changes from other processes."""
+    global _last_check
+    if not _built:
+        rebuild()
+        return
+    now = time.monotonic()
+    if now - _last_check < REFRESH_INTERVAL:
+        return
+
+    with _lock:
+        _last_check = now
+        last_updated = _last_updated
+        indexed = len(_doc_tokens)
+
+    items = database.get_db()['items']
+    if items.estimated_document_count() != indexed:
+        # Items were added or deleted elsewhere; deletions leave no trace to query
+        rebuild()
+        return
+    if last_updated is None:
+        return
+
+    projection = {field: 1 for field in FIELD_WEIGHTS}
+    projection['LastUpdated'] = 1
+    changed = list(items.find({'LastUpdated': {'$gt': last_updated}}, projection))
+    if changed:
+        with _lock:
+            for item in changed:
+                _add_locked(item)
+                _track_last_updated(item)
+
+
+def index_item(item):
+    """
+    Add or update a single item after it was written.
+
+    Args:
+        item (dict): Item document including '_id' and the searchable fields
+    """
+    if not _built:
+        return
+    try:
+        with _lock:
+            _add_locked(item)
+            _track_last_updated(item)
+    except Exception as e:
+        print(f"Error updating search index: {e}")
+
+
+def remove_item(item_id):
+    """
+    Remove a single item after it was deleted.
+
+    Args:
+        item_id (str): ID of the deleted item
+    """
+    if not _built:
+        return
+    with _lock:
+        _remove_locked(str(item_id))
+
+
+def _match_token(query_token):
+    """Return {item_id: score} for all items matching a single query token."""
+    scores = {}
+
+    def add(token, quality):
+        for item_id, weight in _postings.get(token, {}).items():
+            score = weight * quality
+            if scores.get(item_id, 0) < score:
+                scores[item_id] = score
+
+    # Prefix range in the sorted vocabulary (includes the exact match)
+    pos = bisect.bisect_left(_vocabulary, query_token)
+    prefix_tokens = set()
+    while pos < len(_vocabulary) and _vocabulary[pos].startswith(query_token):
+        token = _vocabulary[pos]
+        prefix_tokens.add(token)
+        add(token, EXACT_MATCH if token == query_token else PREFIX_MATCH)
+        pos += 1
+
+    # Infix matches, e.g. 'mikro' in 'tischmikrofon'
+    if len(query_token) >= MIN_INFIX_LENGTH:
+        for token in _vocabulary:
+            if token not in prefix_tokens and query_token in token:
+                add(token, INFIX_MATCH)
+    return scores
+
+
+def search(term, limit=None):
+    """
+    Search items and return their IDs, best match first.
+
+    Args:
+        term (str): Search text
+        limit (int, optional): Maximum number of results
+
+    Returns:
+        list: Matching item IDs as strings
+    """
+    query_tokens = list(dict.fromkeys(tokenize(term)))
+    if not query_tokens:
+        return []
+
+    _ensure_fresh()
+
+    with _lock:
+        totals = None
+        for query_token in query_tokens:
+            scores = _match_token(query_token)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {item_id: totals[item_id] + score
+                          for item_id, score in scores.items() if item_id in totals}
+            if not totals:
+                return []
+        ranked = sorted(totals, key=lambda item_id: (-totals[item_id], _doc_names.get(item_id, ''), item_id))
+
+    return ranked[:limit] if limit else ranked
@@ -0,0 +1,171 @@
+'''
+   Copyright 2025-2026 AIIrondev
+
+   Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+   See Legal/LICENSE for the full license text.
+   Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+   For commercial licensing inquiries: https://github.com/AIIrondev
+'''
+"""
+File Serving
+============
+
+Resolves uploads, thumbnails, previews and static files to a path once and
+builds the response for it. The transfer itself depends on serving.mode:
+
+    'flask'      - Flask streams the file (development)
+    'x-accel'    - nginx sends it via X-Accel-Redirect to an internal location
+                   '<accel_prefix>/<kind>/' that aliases the configured folder
+    'x-sendfile' - Apache/lighttpd send it via X-Sendfile
+
+Every response carries ETag and Last-Modified and answers conditional
+requests with 304. Content-addressed and UUID-named uploads never change
+under their name and are sent with a one-year immutable Cache-Control.
+"""
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Response, request, send_file
+
+import media_store
+import settings as cfg
+
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+# Upload names written by upload_item/edit_item: '<uuid4>_<timestamp>.<ext>'
+_UUID_NAME = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_\d{14}[^/]*$')
+
+# Legacy deployment directories that are still probed after the configured ones
+_ROOTS = {
+    'uploads': [cfg.UPLOAD_FOLDER, '/opt/Inventarsystem/Web/uploads', '/var/Inventarsystem/Web/uploads'],
+    'thumbnails': [cfg.THUMBNAIL_FOLDER, '/var/Inventarsystem/Web/thumbnails'],
+    'previews': [cfg.PREVIEW_FOLDER, '/var/Inventarsystem/Web/previews'],
+    'static': [os.path.join(cfg.BASE_DIR, 'static'), '/var/Inventarsystem/Web/static'],
+}
+
+_RESOLVE_CACHE_SIZE = 10000
+_resolved = {}
+_resolved_lock = threading.Lock()
+
+
+def is_immutable(kind, filename):
+    """
+    Check whether a file never changes under its name.
+
+    Args:
+        kind (str): Root name ('uploads', 'thumbnails', ...)
+        filename (str): File name relative to the root
+
+    Returns:
+        bool: True for content-addressed and UUID-named uploads
+    """
+    if kind != 'uploads':
+        return False
+    return media_store.is_stored(filename) or bool(_UUID_NAME.match(filename))
+
+
+def _candidates(kind, filename):
+    """Yield (root, path) pairs where a file may live, configured root first."""
+    if kind == 'uploads' and media_store.is_stored(filename):
+        yield _ROOTS[kind][0], media_store.path_for(filename, _ROOTS[kind][0])
+    for root in _ROOTS[kind]:
+        yield root, os.path.join(root, filename)
+
+
+def resolve(kind, filename):
+    """
+    Find a file below one of the roots of a kind.
+
+    Hits are remembered, so later requests only need a single stat.
+
+    Args:
+        kind (str): Root name ('uploads', 'thumbnails', 'previews', 'static')
+        filename (str): File name relative to the root
+
+    Returns:
+        tuple: (root, absolute path, os.stat_result) or None if not found
+    """
+    if not filename or '\x00' in filename:
+        return None
+    key = (kind, filename)
+    cached = _resolved.get(key)
+    candidates = [cached] if cached else []
+    candidates += [c for c in _candidates(kind, filename) if c != cached]
+    for root, path in candidates:
+        real_root = os.path.realpath(root)
+        real_path = os.path.realpath(path)
+        # Reject paths that escape the root (e.g. '../')
+        if os.path.commonpath([real_root, real_path]) != real_root:
+            continue
+        try:
+            st = os.stat(real_path)
+        except OSError:
+            continue
+        if not os.path.isfile(real_path):
+            continue
+        with _resolved_lock:
+            if len(_resolved) >= _RESOLVE_CACHE_SIZE:
+                _resolved.clear()
+            _resolved[key] = (root, path)
+        return root, real_path, st
+    if cached:
+        with _resolved_lock:
+            _resolved.pop(key, None)
+    return None
+
+
+def _etag(st):
+    return f'"{st.st_size:x}-{int(st.st_mtime):x}"'
+
+
+def _not_modified(etag, st):
+    """Evaluate If-None-Match / If-Modified-Since of the current request."""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag.strip('"'))
+    if request.if_modified_since:
+        return int(st.st_mtime) <= request.if_modified_since.timestamp()
+    return False
+
+
+def send(kind, filename, cache_control=None):
+    """
+    Send a file of a kind, or None if it does not exist.
+
+    Args:
+        kind (str): Root name ('uploads', 'thumbnails', 'previews', 'static')
+        filename (str): File name relative to the root
+        cache_control (str, optional): Cache-Control override
+
+    Returns:
+        flask.Response: File response, 304 response, or None
+    """
+    found = resolve(kind, filename)
+    if not found:
+        return None
+    root, path, st = found
+    if cache_control is None:
+        cache_control = IMMUTABLE_CACHE if is_immutable(kind, filename) \
+            else f'public, max-age={int(cfg.SERVING_MAX_AGE)}'
+    etag = _etag(st)
+
+    if _not_modified(etag, st):
+        response = Response(status=304)
+    elif cfg.SERVING_MODE == 'x-accel' and root == _ROOTS[kind][0]:
+        relative = os.path.relpath(path, os.path.realpath(root)).replace(os.sep, '/')
+        response = Response(status=200)
+        response.headers['X-Accel-Redirect'] = f"{cfg.SERVING_ACCEL_PREFIX.rstrip('/')}/{kind}/{relative}"
+        response.headers['Content-Type'] = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    elif cfg.SERVING_MODE == 'x-sendfile':
+        response = Response(status=200)
+        response.headers['X-Sendfile'] = path
+        response.headers['Content-Type'] = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    else:
+        response = send_file(path, conditional=True, etag=False, max_age=None)
+
+    response.headers['ETag'] = etag
+    response.last_modified = st.st_mtime
+    response.headers['Cache-Control'] = cache_control
+    return response
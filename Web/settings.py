@@ -27,11 +27,22 @@ DEFAULTS = {
         'host': 'localhost',
         'port': 27017,
         'db': 'Inventarsystem',
+        'max_pool_size': 50,
+        'min_pool_size': 0,
+        'max_idle_time_ms': 300000,
+        'connect_timeout_ms': 5000,
+        'server_selection_timeout_ms': 5000,
+        'socket_timeout_ms': 30000,
+        'ensure_indexes': True,
     },
     'scheduler': {
         'interval_minutes': 1,
         'backup_interval_hours': 24,
         'enabled': True,
+        'sleep_until_boundary': False,
+        'leader_election': 'mongo',
+        'lease_seconds': 60,
+        'lock_file': os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'logs', 'scheduler.lock'),
     },
     'ssl': {
         'enabled': False,
@@ -41,6 +52,10 @@ DEFAULTS = {
     'images': {
         'thumbnail_size': [150, 150],
         'preview_size': [400, 400],
+        'workers': 2,
+        'max_width': 500,
+        'quality': 80,
+        'variant_widths': [150, 400, 800, 1600],
     },
     'upload': {
         'folder': os.path.join(BASE_DIR, 'uploads'),
@@ -52,6 +67,26 @@ DEFAULTS = {
         'video_max_size_mb': 100,
         'allowed_extensions': ['png', 'jpg', 'jpeg', 'gif']
     },
+    'serving': {
+        'mode': 'flask',
+        'accel_prefix': '/_protected',
+        'max_age': 3600,
+    },
+    'cache': {
+        'max_items': 5000,
+        'ttl_seconds': 300,
+        'check_interval_seconds': 1,
+    },
+    'notifications': {
+        'max_waiters': 8,
+        'busy_retry_seconds': 15,
+    },
+    'backup': {
+        'compression': 'gzip',
+        'full_interval_hours': 168,
+        'keep_full': 4,
+        'batch_size': 1000,
+    },
     'paths': {
         'backups': os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'backups'),
         'logs': os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'logs'),
@@ -99,11 +134,22 @@ PORT = _get(_conf, ['port'], DEFAULTS['port'])
 MONGODB_HOST = _get(_conf, ['mongodb', 'host'], DEFAULTS['mongodb']['host'])
 MONGODB_PORT = _get(_conf, ['mongodb', 'port'], DEFAULTS['mongodb']['port'])
 MONGODB_DB = _get(_conf, ['mongodb', 'db'], DEFAULTS['mongodb']['db'])
+MONGODB_MAX_POOL_SIZE = int(_get(_conf, ['mongodb', 'max_pool_size'], DEFAULTS['mongodb']['max_pool_size']))
+MONGODB_MIN_POOL_SIZE = int(_get(_conf, ['mongodb', 'min_pool_size'], DEFAULTS['mongodb']['min_pool_size']))
+MONGODB_MAX_IDLE_TIME_MS = int(_get(_conf, ['mongodb', 'max_idle_time_ms'], DEFAULTS['mongodb']['max_idle_time_ms']))
+MONGODB_CONNECT_TIMEOUT_MS = int(_get(_conf, ['mongodb', 'connect_timeout_ms'], DEFAULTS['mongodb']['connect_timeout_ms']))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(_get(_conf, ['mongodb', 'server_selection_timeout_ms'], DEFAULTS['mongodb']['server_selection_timeout_ms']))
+MONGODB_SOCKET_TIMEOUT_MS = int(_get(_conf, ['mongodb', 'socket_timeout_ms'], DEFAULTS['mongodb']['socket_timeout_ms']))
+MONGODB_ENSURE_INDEXES = bool(_get(_conf, ['mongodb', 'ensure_indexes'], DEFAULTS['mongodb']['ensure_indexes']))
 
 # Scheduler
 SCHEDULER_INTERVAL_MIN = _get(_conf, ['scheduler', 'interval_minutes'], DEFAULTS['scheduler']['interval_minutes'])
 BACKUP_INTERVAL_HOURS = _get(_conf, ['scheduler', 'backup_interval_hours'], DEFAULTS['scheduler']['backup_interval_hours'])
 SCHEDULER_ENABLED = _get(_conf, ['scheduler', 'enabled'], DEFAULTS['scheduler']['enabled'])
+SCHEDULER_SLEEP_UNTIL_BOUNDARY = _get(_conf, ['scheduler', 'sleep_until_boundary'], DEFAULTS['scheduler']['sleep_until_boundary'])
+SCHEDULER_LEADER_ELECTION = _get(_conf, ['scheduler', 'leader_election'], DEFAULTS['scheduler']['leader_election'])
+SCHEDULER_LEASE_SECONDS = int(_get(_conf, ['scheduler', 'lease_seconds'], DEFAULTS['scheduler']['lease_seconds']))
+SCHEDULER_LOCK_FILE = _get(_conf, ['scheduler', 'lock_file'], DEFAULTS['scheduler']['lock_file'])
 
 # SSL
 SSL_ENABLED = _get(_conf, ['ssl', 'enabled'], DEFAULTS['ssl']['enabled'])
@@ -137,9 +183,32 @@ THUMBNAIL_SIZE_LIST = _get(_conf, ['images', 'thumbnail_size'], DEFAULTS['images
 PREVIEW_SIZE_LIST = _get(_conf, ['images', 'preview_size'], DEFAULTS['images']['preview_size'])
 THUMBNAIL_SIZE = (int(THUMBNAIL_SIZE_LIST[0]), int(THUMBNAIL_SIZE_LIST[1])) if isinstance(THUMBNAIL_SIZE_LIST, (list, tuple)) else (150, 150)
 PREVIEW_SIZE = (int(PREVIEW_SIZE_LIST[0]), int(PREVIEW_SIZE_LIST[1])) if isinstance(PREVIEW_SIZE_LIST, (list, tuple)) else (400, 400)
+IMAGE_WORKERS = int(_get(_conf, ['images', 'workers'], DEFAULTS['images']['workers']))
+IMAGE_MAX_WIDTH = int(_get(_conf, ['images', 'max_width'], DEFAULTS['images']['max_width']))
+IMAGE_QUALITY = int(_get(_conf, ['images', 'quality'], DEFAULTS['images']['quality']))
+IMAGE_VARIANT_WIDTHS = sorted(int(w) for w in _get(_conf, ['images', 'variant_widths'], DEFAULTS['images']['variant_widths']))
+
+# File serving: 'flask', 'x-accel' (nginx) or 'x-sendfile'
+SERVING_MODE = _get(_conf, ['serving', 'mode'], DEFAULTS['serving']['mode'])
+SERVING_ACCEL_PREFIX = _get(_conf, ['serving', 'accel_prefix'], DEFAULTS['serving']['accel_prefix'])
+SERVING_MAX_AGE = int(_get(_conf, ['serving', 'max_age'], DEFAULTS['serving']['max_age']))
+
+# Per-process item cache (see item_cache.py)
+CACHE_MAX_ITEMS = int(_get(_conf, ['cache', 'max_items'], DEFAULTS['cache']['max_items']))
+CACHE_TTL_SECONDS = float(_get(_conf, ['cache', 'ttl_seconds'], DEFAULTS['cache']['ttl_seconds']))
+CACHE_CHECK_INTERVAL = float(_get(_conf, ['cache', 'check_interval_seconds'], DEFAULTS['cache']['check_interval_seconds']))
+
+# Long-poll requests per process (see notifications.py); keep it well below
+# the gunicorn --threads of start.sh so normal requests always find a thread
+NOTIFICATION_MAX_WAITERS = int(_get(_conf, ['notifications', 'max_waiters'], DEFAULTS['notifications']['max_waiters']))
+NOTIFICATION_BUSY_RETRY_SECONDS = int(_get(_conf, ['notifications', 'busy_retry_seconds'], DEFAULTS['notifications']['busy_retry_seconds']))
 
 BACKUP_FOLDER = _get(_conf, ['paths', 'backups'], DEFAULTS['paths']['backups'])
 LOGS_FOLDER = _get(_conf, ['paths', 'logs'], DEFAULTS['paths']['logs'])
+BACKUP_COMPRESSION = _get(_conf, ['backup', 'compression'], DEFAULTS['backup']['compression'])
+BACKUP_FULL_INTERVAL_HOURS = int(_get(_conf, ['backup', 'full_interval_hours'], DEFAULTS['backup']['full_interval_hours']))
+BACKUP_KEEP_FULL = int(_get(_conf, ['backup', 'keep_full'], DEFAULTS['backup']['keep_full']))
+BACKUP_BATCH_SIZE = int(_get(_conf, ['backup', 'batch_size'], DEFAULTS['backup']['batch_size']))
 
 # Normalize backup and logs paths to absolute paths (similar to upload folders) to avoid
 # permission issues caused by relative paths resolving to unintended working dirs.
@@ -0,0 +1,87 @@
+/**
+ * Copyright 2025-2026 AIIrondev
+ *
+ * Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+ * See Legal/LICENSE for the full license text.
+ * Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+ * For commercial licensing inquiries: https://github.com/AIIrondev
+ */
+
+/**
+ * Catalog sync: keeps a copy of /get_items in localStorage and only asks
+ * the server for the changes since the last cursor. syncCatalog(url)
+ * resolves to the same shape as the full /get_items answer
+ * ({items, favorites}), so callers do not care which mode was used.
+ *
+ * syncCatalog(url, bootstrap) takes the /api/bootstrap answer of the page
+ * load: if the local copy is at its catalog version, no request is made.
+ */
+(function () {
+    const STORAGE_KEY = 'catalogCache:v1';
+
+    function readCache() {
+        try {
+            const cache = JSON.parse(localStorage.getItem(STORAGE_KEY));
+            return cache && cache.cursor && Array.isArray(cache.items) ? cache : null;
+        } catch (e) {
+            return null;
+        }
+    }
+
+    function writeCache(cursor, version, items) {
+        try {
+            localStorage.setItem(STORAGE_KEY, JSON.stringify({ cursor: cursor, version: version, items: items }));
+        } catch (e) {
+            // Quota exceeded: fall back to full loads
+            try { localStorage.removeItem(STORAGE_KEY); } catch (e2) {}
+        }
+    }
+
+    function merge(cache, data) {
+        const byId = new Map(cache.items.map(item => [item._id, item]));
+        (data.deleted || []).forEach(id => byId.delete(id));
+        (data.items || []).forEach(item => byId.set(item._id, item));
+        return Array.from(byId.values());
+    }
+
+    function withFavorites(items, favorites) {
+        const favoriteIds = new Set(favorites);
+        items.forEach(item => { item.is_favorite = favoriteIds.has(item._id); });
+        return { items: items, favorites: favorites };
+    }
+
+    function fetchCatalog(url, useCache) {
+        const cache = useCache === false ? null : readCache();
+        const requestUrl = cache
+            ? url + (url.indexOf('?') === -1 ? '?' : '&') + 'since=' + encodeURIComponent(cache.cursor)
+            : url;
+        return fetch(requestUrl, { credentials: 'same-origin' })
+            .then(response => response.json().then(data => ({ ok: response.ok, data: data })))
+            .then(({ ok, data }) => {
+                if (!ok || data.error) return data;
+                let items = data.items || [];
+                if (cache && !data.full) {
+                    items = merge(cache, data);
+                    if (typeof data.count === 'number' && items.length !== data.count) {
+                        // Local copy drifted (e.g. after a database restore)
+                        return fetchCatalog(url, false);
+                    }
+                }
+                writeCache(data.cursor, data.version, items);
+                return withFavorites(items, data.favorites || []);
+            });
+    }
+
+    function syncCatalog(url, bootstrap) {
+        const catalog = bootstrap && bootstrap.catalog;
+        if (catalog) {
+            const cache = readCache();
+            if (cache && cache.version === catalog.version && cache.items.length === catalog.count) {
+                return Promise.resolve(withFavorites(cache.items, bootstrap.favorites || []));
+            }
+        }
+        return fetchCatalog(url);
+    }
+
+    window.syncCatalog = syncCatalog;
+})();
@@ -0,0 +1,19 @@
+/**
+ * Copyright 2025-2026 AIIrondev
+ *
+ * Licensed under the Inventarsystem EULA (Endbenutzer-Lizenzvertrag).
+ * See Legal/LICENSE for the full license text.
+ * Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
+ * For commercial licensing inquiries: https://github.com/AIIrondev
+ */
+
+/**
+ * Page bootstrap: requests /api/bootstrap as soon as the script is parsed.
+ * window.pageBootstrap resolves to its answer, or to null if it failed, in
+ * which case the page falls back to the individual endpoints.
+ */
+(function () {
+    window.pageBootstrap = fetch('/api/bootstrap', { credentials: 'same-origin' })
+        .then(response => response.ok ? response.json() : null)
+        .catch(() => null);
+})();
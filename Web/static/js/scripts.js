@@ -6,19 +6,66 @@
  * Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
  * For commercial licensing inquiries: https://github.com/AIIrondev
  */
-chatBox = document.getElementById('chatBox');
 
-function fetchMessages() {
-    fetch('/messages')
-        .then(response => response.json())
-        .then(data => {
-            chatBox.innerHTML = '';
-            data.messages.forEach(msg => {
-                const messageElement = document.createElement('div');
-                messageElement.textContent = msg;
-                chatBox.appendChild(messageElement);
+/**
+ * Notification channel: long-polls /api/notifications with the cursor of
+ * the last answer. Flash messages and booking conflicts are shown in the
+ * flash area; every event is also dispatched as a DOM event
+ * ('inventar:flash', 'inventar:conflict', 'inventar:item') so pages can
+ * update e.g. item availability without reloading.
+ */
+(function () {
+    const RETRY_DELAY_MS = 5000;
+    let cursor = null;
+
+    function flashContainer() {
+        let container = document.querySelector('.flashes');
+        if (!container) {
+            container = document.createElement('div');
+            container.className = 'flashes';
+            const main = document.querySelector('body > .container');
+            if (!main) return null;
+            main.insertBefore(container, main.firstChild);
+        }
+        return container;
+    }
+
+    function showFlash(message, category) {
+        const container = flashContainer();
+        if (!container || !message) return;
+        const el = document.createElement('div');
+        el.className = 'flash ' + (category || 'info');
+        el.textContent = message;
+        container.appendChild(el);
+    }
+
+    function handle(event) {
+        if (event.type === 'flash') {
+            showFlash(event.data.message, event.data.category);
+        } else if (event.type === 'conflict') {
+            showFlash(event.data.note, 'error');
+        }
+        window.dispatchEvent(new CustomEvent('inventar:' + event.type, { detail: event.data }));
+    }
+
+    function poll() {
+        const url = '/api/notifications' + (cursor === null ? '' : '?cursor=' + cursor);
+        fetch(url, { credentials: 'same-origin', cache: 'no-store' })
+            .then(response => {
+                if (response.status === 401) throw new Error('unauthenticated');
+                return response.json();
+            })
+            .then(data => {
+                (data.events || []).forEach(handle);
+                if (typeof data.cursor === 'number') cursor = data.cursor;
+                // The server had no free long-poll slot: come back later
+                if (data.retry_after) setTimeout(poll, data.retry_after * 1000);
+                else poll();
+            })
+            .catch(err => {
+                if (err.message !== 'unauthenticated') setTimeout(poll, RETRY_DELAY_MS);
             });
-        });
-}
+    }
 
-setInterval(fetchMessages, 1000);
\ No newline at end of file
+    document.addEventListener('DOMContentLoaded', poll);
+})();
@@ -0,0 +1,22 @@
+import os
+import sys
+
+# Tests need the packages of requirements-dev.txt; a missing mongomock fails collection
+import mongomock
+import pytest
+
+# The application modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    """Point database.get_db() at an in-memory mongomock database."""
+    import database
+    import item_cache
+
+    db = mongomock.MongoClient()['inventar_test']
+    monkeypatch.setattr(database, 'get_db', lambda: db)
+    item_cache.clear()
+    yield db
+    item_cache.clear()
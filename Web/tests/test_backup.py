@@ -0,0 +1,40 @@
+import datetime
+import types
+
+import pytest
+
+import backup
+
+
+@pytest.fixture
+def clock(monkeypatch, tmp_path, mongo_db):
+    """Run backups into tmp_path with a controllable clock (run names have second resolution)."""
+    current = [datetime.datetime(2026, 3, 2, 8, 0, 0)]
+
+    class Clock(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return current[0]
+
+    monkeypatch.setattr(backup, 'datetime', types.SimpleNamespace(datetime=Clock, timedelta=datetime.timedelta))
+    monkeypatch.setattr(backup, 'get_backup_folder', lambda: str(tmp_path))
+    monkeypatch.setattr(backup, '_compression', lambda: 'none')
+
+    def advance():
+        current[0] += datetime.timedelta(minutes=10)
+    return advance
+
+
+def test_empty_incremental_keeps_max_id(clock, mongo_db):
+    mongo_db['users'].insert_one({'Username': 'alice'})
+    full = backup.create_backup('full', ['users'])
+    clock()
+    empty = backup.create_backup('incremental', ['users'])
+    assert empty['collections']['users']['count'] == 0
+    assert empty['collections']['users']['max_id'] == full['collections']['users']['max_id']
+
+    # Users have no LastUpdated; only the _id clause picks them up
+    mongo_db['users'].insert_one({'Username': 'bob'})
+    clock()
+    incremental = backup.create_backup('incremental', ['users'])
+    assert incremental['collections']['users']['count'] == 1
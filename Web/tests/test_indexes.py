@@ -0,0 +1,14 @@
+import indexes
+
+
+def test_duplicate_codes_are_resolved_before_unique_index(mongo_db):
+    first = mongo_db['items'].insert_one({'Name': 'A', 'Code_4': '1234'}).inserted_id
+    second = mongo_db['items'].insert_one({'Name': 'B', 'Code_4': '1234'}).inserted_id
+
+    indexes._migration_resolve_duplicate_codes(mongo_db)
+
+    assert mongo_db['items'].find_one({'_id': first})['Code_4'] == '1234'
+    flagged = mongo_db['items'].find_one({'_id': second})
+    assert 'Code_4' not in flagged
+    assert flagged['Code_4_Duplicate'] == '1234'
+    assert 'code_4_unique' in mongo_db['items'].index_information()
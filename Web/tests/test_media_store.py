@@ -0,0 +1,63 @@
+import datetime
+import os
+
+import pytest
+
+import media_store
+import settings as cfg
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path, mongo_db):
+    monkeypatch.setattr(cfg, 'UPLOAD_FOLDER', str(tmp_path))
+    return mongo_db
+
+
+def _upload(tmp_path, content):
+    path = tmp_path / f'upload_{abs(hash(content))}.jpg'
+    path.write_bytes(content)
+    return str(path)
+
+
+def _age(db, name, hours):
+    db[media_store.COLLECTION].update_one(
+        {'_id': name}, {'$set': {'Updated': datetime.datetime.now() - datetime.timedelta(hours=hours)}})
+
+
+def test_sweep_removes_old_unreferenced_cover(store, tmp_path):
+    name = media_store.ingest(_upload(tmp_path, b'cover'), source='https://covers/1', add_reference=False)
+    _age(store, name, media_store.ORPHAN_HOURS + 1)
+
+    assert media_store.sweep() == 1
+    assert not os.path.exists(media_store.path_for(name))
+    assert media_store.find_by_source('https://covers/1') is None
+
+
+def test_sweep_keeps_referenced_and_recent_files(store, tmp_path):
+    used = media_store.ingest(_upload(tmp_path, b'used'))
+    recent = media_store.ingest(_upload(tmp_path, b'recent'), add_reference=False)
+    _age(store, used, media_store.ORPHAN_HOURS + 1)
+
+    assert media_store.sweep() == 0
+    assert os.path.exists(media_store.path_for(used))
+    assert os.path.exists(media_store.path_for(recent))
+
+
+def test_released_file_survives_a_concurrent_reference(store, tmp_path):
+    name = media_store.ingest(_upload(tmp_path, b'photo'))
+    # The last item using the photo is deleted while another one is duplicated
+    assert media_store.release([name]) == 1
+    media_store.add_ref(name)
+    assert os.path.exists(media_store.path_for(name))
+
+    _age(store, name, media_store.ORPHAN_HOURS + 1)
+    assert media_store.sweep() == 0
+    assert os.path.exists(media_store.path_for(name))
+
+
+def test_released_file_is_swept(store, tmp_path):
+    name = media_store.ingest(_upload(tmp_path, b'old photo'))
+    media_store.release([name])
+    _age(store, name, media_store.ORPHAN_HOURS + 1)
+    assert media_store.sweep() == 1
+    assert not os.path.exists(media_store.path_for(name))
@@ -0,0 +1,86 @@
+import collections
+import datetime
+import threading
+
+import pytest
+
+import notifications
+
+
+@pytest.fixture
+def channel(monkeypatch, mongo_db):
+    """Fresh channel state without the background poller."""
+    monkeypatch.setattr(notifications, '_buffer', collections.deque(maxlen=notifications.BUFFER_SIZE))
+    monkeypatch.setattr(notifications, '_seen', set())
+    monkeypatch.setattr(notifications, '_gaps', {})
+    monkeypatch.setattr(notifications, '_last_seq', None)
+    monkeypatch.setattr(notifications, '_safe_seq', None)
+    monkeypatch.setattr(notifications, '_ensure_poller', lambda: None)
+    mongo_db['counters'].insert_one({'_id': notifications.COUNTER_ID, 'seq': 0})
+    notifications._poll_once()
+    return mongo_db
+
+
+def _insert(db, seq):
+    db[notifications.COLLECTION].insert_one({
+        '_id': seq, 'Type': 'flash', 'Data': {'message': str(seq)},
+        'User': None, 'Admin': False, 'Created': datetime.datetime.now(),
+    })
+
+
+def _seqs(result):
+    return [e['seq'] for e in result['events']]
+
+
+def test_late_event_is_delivered(channel):
+    # 2 took its sequence number first but is written after 3
+    _insert(channel, 1)
+    _insert(channel, 3)
+    notifications._poll_once()
+    first = notifications.wait(0, 'alice', False, timeout=0)
+    assert _seqs(first) == [1]
+    assert first['cursor'] == 1
+
+    _insert(channel, 2)
+    notifications._poll_once()
+    second = notifications.wait(first['cursor'], 'alice', False, timeout=0)
+    assert _seqs(second) == [2, 3]
+    assert second['cursor'] == 3
+
+
+def test_unfilled_gap_is_skipped(channel, monkeypatch):
+    _insert(channel, 1)
+    _insert(channel, 3)
+    notifications._poll_once()
+    monkeypatch.setattr(notifications, 'GAP_SECONDS', 0)
+    notifications._poll_once()
+    result = notifications.wait(0, 'alice', False, timeout=0)
+    assert _seqs(result) == [1, 3]
+
+
+def test_busy_process_answers_immediately(channel, monkeypatch):
+    monkeypatch.setattr(notifications, '_waiters', threading.BoundedSemaphore(1))
+    notifications._waiters.acquire()
+    result = notifications.wait(0, 'alice', False, timeout=30)
+    assert result['events'] == []
+    assert result['retry_after'] > 0
+
+
+def test_client_ahead_of_process_is_not_moved_back(channel):
+    _insert(channel, 1)
+    _insert(channel, 2)
+    notifications._poll_once()
+    # Another process already delivered 3, this one has not loaded it yet
+    channel['counters'].update_one({'_id': notifications.COUNTER_ID}, {'$set': {'seq': 3}})
+    _insert(channel, 3)
+    result = notifications.wait(3, 'alice', False, timeout=0)
+    assert result['reset'] is False
+    assert result['events'] == []
+    assert result['cursor'] == 3
+
+
+def test_counter_reset_is_reported(channel):
+    _insert(channel, 1)
+    notifications._poll_once()
+    result = notifications.wait(50, 'alice', False, timeout=0)
+    assert result['reset'] is True
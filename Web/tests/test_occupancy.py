@@ -0,0 +1,65 @@
+import datetime
+
+import occupancy
+import settings as cfg
+
+
+def _period_window(day, period):
+    info = cfg.SCHOOL_PERIODS[str(period)]
+    start = datetime.datetime.combine(day, datetime.time(*map(int, info['start'].split(':'))))
+    end = datetime.datetime.combine(day, datetime.time(*map(int, info['end'].split(':'))))
+    return start, end
+
+
+def _book(db, item_id, day, period):
+    start, end = _period_window(day, period)
+    booking = {'Item': item_id, 'Status': 'planned', 'Start': start, 'End': end, 'Period': period}
+    booking['_id'] = db['ausleihungen'].insert_one(booking).inserted_id
+    occupancy.sync_booking(booking)
+
+
+def test_exemplar_booking_leaves_other_exemplars_free(mongo_db):
+    item_id = str(mongo_db['items'].insert_one({'Name': 'Tablet', 'Exemplare': 5}).inserted_id)
+    day = datetime.date(2026, 3, 2)
+    _book(mongo_db, f'{item_id}_1', day, 1)
+
+    start, end = _period_window(day, 1)
+    assert occupancy.check_conflict(item_id, start, end, period=1) is False
+    assert occupancy.check_conflict(f'{item_id}_2', start, end, period=1) is False
+    # The booked exemplar itself is taken
+    assert occupancy.check_conflict(f'{item_id}_1', start, end, period=1) is True
+
+
+def test_all_exemplars_booked_conflicts(mongo_db):
+    item_id = str(mongo_db['items'].insert_one({'Name': 'Tablet', 'Exemplare': 2}).inserted_id)
+    day = datetime.date(2026, 3, 2)
+    _book(mongo_db, f'{item_id}_1', day, 1)
+    _book(mongo_db, f'{item_id}_2', day, 1)
+
+    start, end = _period_window(day, 1)
+    assert occupancy.check_conflict(item_id, start, end, period=1) is True
+    # Other periods stay free
+    start, end = _period_window(day, 3)
+    assert occupancy.check_conflict(item_id, start, end, period=3) is False
+
+
+def test_single_item_booking_conflicts(mongo_db):
+    item_id = str(mongo_db['items'].insert_one({'Name': 'Beamer'}).inserted_id)
+    day = datetime.date(2026, 3, 2)
+    _book(mongo_db, item_id, day, 2)
+
+    start, end = _period_window(day, 2)
+    assert occupancy.check_conflict(item_id, start, end, period=2) is True
+
+
+def test_unstuck_item_releases_occupancy(mongo_db):
+    import items
+
+    item_id = str(mongo_db['items'].insert_one({'Name': 'Beamer'}).inserted_id)
+    day = datetime.date(2026, 3, 2)
+    _book(mongo_db, item_id, day, 2)
+
+    assert items.unstuck_item(item_id) is True
+
+    start, end = _period_window(day, 2)
+    assert occupancy.check_conflict(item_id, start, end, period=2) is False
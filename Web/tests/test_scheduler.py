@@ -0,0 +1,36 @@
+import datetime
+
+import scheduler
+import settings as cfg
+
+
+def test_next_boundary_is_not_capped_at_interval(mongo_db, monkeypatch):
+    monkeypatch.setattr(cfg, 'SCHOOL_PERIODS', {})
+    now = datetime.datetime(2026, 3, 2, 8, 0)
+    start = now + datetime.timedelta(hours=5)
+    mongo_db['ausleihungen'].insert_one({'Item': 'x', 'Status': 'planned', 'Start': start})
+
+    assert scheduler._next_status_boundary(mongo_db['ausleihungen'], now) == start
+
+
+def test_booking_change_wakes_status_job(mongo_db, monkeypatch):
+    class FakeScheduler:
+        jobs = []
+
+        def add_job(self, **kwargs):
+            self.jobs.append(kwargs)
+
+    fake = FakeScheduler()
+    monkeypatch.setattr(cfg, 'SCHEDULER_SLEEP_UNTIL_BOUNDARY', True)
+    monkeypatch.setattr(scheduler, '_scheduler', fake)
+    monkeypatch.setattr(scheduler.leader, 'heartbeat', lambda: True)
+
+    scheduler._heartbeat()
+    assert fake.jobs == []
+
+    scheduler.request_status_update()
+    scheduler._heartbeat()
+    assert [job['id'] for job in fake.jobs] == [scheduler.STATUS_JOB_ID]
+
+    scheduler._heartbeat()
+    assert len(fake.jobs) == 1
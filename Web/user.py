@@ -10,19 +10,28 @@ Provides methods for creating, validating, and retrieving user information.
    Unauthorized commercial use, SaaS hosting, or removal of branding is prohibited.
    For commercial licensing inquiries: https://github.com/AIIrondev
 '''
-from pymongo import MongoClient
+import database
 import hashlib
 from bson.objectid import ObjectId
 
 
+# Sessions cache the admin flag (see auth.py) only while this version in the
+# 'counters' collection ({'_id': 'version:auth'}) is unchanged
+AUTH_VERSION_NAME = 'auth'
+
+
+def revoke_auth_claims():
+    """Make all sessions re-read the admin flag of their user."""
+    db = database.get_db()
+    db['counters'].update_one({'_id': f'version:{AUTH_VERSION_NAME}'}, {'$inc': {'seq': 1}}, upsert=True)
+
+
 # === FAVORITES MANAGEMENT ===
 def get_favorites(username):
     """Return a list of favorite item ObjectId strings for the user."""
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     user = users.find_one({'Username': username}) or users.find_one({'username': username})
-    client.close()
     if not user:
         return []
     favs = user.get('favorites', [])
@@ -32,14 +41,12 @@ def get_favorites(username):
 def add_favorite(username, item_id):
     """Add an item to user's favorites (idempotent)."""
     try:
-        client = MongoClient('localhost', 27017)
-        db = client['Inventarsystem']
+        db = database.get_db()
         users = db['users']
         users.update_one(
             {'$or': [{'Username': username}, {'username': username}]},
             {'$addToSet': {'favorites': ObjectId(item_id)}}
         )
-        client.close()
         return True
     except Exception:
         return False
@@ -47,14 +54,12 @@ def add_favorite(username, item_id):
 def remove_favorite(username, item_id):
     """Remove an item from user's favorites."""
     try:
-        client = MongoClient('localhost', 27017)
-        db = client['Inventarsystem']
+        db = database.get_db()
         users = db['users']
         users.update_one(
             {'$or': [{'Username': username}, {'username': username}]},
             {'$pull': {'favorites': ObjectId(item_id)}}
         )
-        client.close()
         return True
     except Exception:
         return False
@@ -100,12 +105,10 @@ def check_nm_pwd(username, password):
     Returns:
         dict: User document if credentials are valid, None otherwise
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     hashed_password = hashlib.sha512(password.encode()).hexdigest()
     user = users.find_one({'Username': username, 'Password': hashed_password})
-    client.close()
     return user
 
 
@@ -120,13 +123,11 @@ def add_user(username, password, name, last_name):
     Returns:
         bool: True if user was added successfully, False if password was too weak
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     if not check_password_strength(password):
         return False
     users.insert_one({'Username': username, 'Password': hashing(password), 'Admin': False, 'active_ausleihung': None, 'name': name, 'last_name': last_name})
-    client.close()
     return True
 
 
@@ -140,11 +141,10 @@ def make_admin(username):
     Returns:
         bool: True if user was promoted successfully
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     users.update_one({'Username': username}, {'$set': {'Admin': True}})
-    client.close()
+    revoke_auth_claims()
     return True
 
 def remove_admin(username):
@@ -157,11 +157,10 @@ def remove_admin(username):
     Returns:
         bool: True if user was demoted successfully
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     users.update_one({'Username': username}, {'$set': {'Admin': False}})
-    client.close()
+    revoke_auth_claims()
     return True
 
 def get_user(username):
@@ -174,11 +173,9 @@ def get_user(username):
     Returns:
         dict: User document or None if not found
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     users_return = users.find_one({'Username': username})
-    client.close()
     return users_return
 
 
@@ -192,12 +189,10 @@ def check_admin(username):
     Returns:
         bool: True if user is an administrator, False otherwise
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
-    user = users.find_one({'Username': username})
-    client.close()
-    return user and user.get('Admin', False)
+    user = users.find_one({'Username': username}, {'Admin': 1})
+    return bool(user and user.get('Admin', False))
 
 
 def update_active_ausleihung(username, id_item, ausleihung):
@@ -212,11 +207,9 @@ def update_active_ausleihung(username, id_item, ausleihung):
     Returns:
         bool: True if successful
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     users.update_one({'Username': username}, {'$set': {'active_ausleihung': {'Item': id_item, 'Ausleihung': ausleihung}}})
-    client.close()
     return True
 
 
@@ -230,8 +223,7 @@ def get_active_ausleihung(username):
     Returns:
         dict: Active borrowing information or None
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     user = users.find_one({'Username': username})
     return user['active_ausleihung']
@@ -248,8 +240,7 @@ def has_active_borrowing(username):
         bool: True if user has an active borrowing, False otherwise
     """
     try:
-        client = MongoClient('localhost', 27017)
-        db = client['Inventarsystem']
+        db = database.get_db()
         users = db['users']
         
         user = users.find_one({'username': username})
@@ -257,12 +248,10 @@ def has_active_borrowing(username):
             user = users.find_one({'Username': username})
             
         if not user:
-            client.close()
             return False
             
         has_active = user.get('active_borrowing', False)
         
-        client.close()
         return has_active
     except Exception as e:
         return False
@@ -279,18 +268,16 @@ def delete_user(username):
     Returns:
         bool: True if user was deleted successfully, False otherwise
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     result = users.delete_one({'username': username})
-    client.close()
     if result.deleted_count == 0:
         # Try with different field name
-        client = MongoClient('localhost', 27017)
-        db = client['Inventarsystem']
+        db = database.get_db()
         users = db['users']
         result = users.delete_one({'Username': username})
-        client.close()
+    if result.deleted_count:
+        revoke_auth_claims()
     
     return result.deleted_count > 0
 
@@ -308,8 +295,7 @@ def update_active_borrowing(username, item_id, status):
         bool: True if successful, False on error
     """
     try:
-        client = MongoClient('localhost', 27017)
-        db = client['Inventarsystem']
+        db = database.get_db()
         users = db['users']
         result = users.update_one(
             {'username': username}, 
@@ -328,7 +314,6 @@ def update_active_borrowing(username, item_id, status):
                 }}
             )
             
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         return False
@@ -341,8 +326,7 @@ def get_name(username):
     Returns:
         str: String of name
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     user = users.find_one({'Username': username})
     name = user.get("name")
@@ -356,8 +340,7 @@ def get_last_name(username):
     Returns:
         str: String of last_name
     """
-    client = MongoClient('localhost', 27017)
-    db = client['Inventarsystem']
+    db = database.get_db()
     users = db['users']
     user = users.find_one({'Username': username})
     name = user.get("last_name")
@@ -373,11 +356,9 @@ def get_all_users():
         list: List of all user documents
     """
     try:
-        client = MongoClient('localhost', 27017)
-        db = client['Inventarsystem']
+        db = database.get_db()
         users = db['users']
         all_users = list(users.find())
-        client.close()
         return all_users
     except Exception as e:
         return []
@@ -397,8 +378,7 @@ def update_password(username, new_password):
         if not check_password_strength(new_password):
             return False
             
-        client = MongoClient('localhost', 27017)
-        db = client['Inventarsystem']
+        db = database.get_db()
         users = db['users']
         
         # Hash the new password
@@ -410,7 +390,6 @@ def update_password(username, new_password):
             {'$set': {'Password': hashed_password}}
         )
         
-        client.close()
         return result.modified_count > 0
     except Exception as e:
         print(f"Error updating password: {e}")
@@ -429,8 +408,7 @@ def update_user_name(username, name, last_name):
         bool: True if updated successfully, False otherwise
     """
     try:
-        client = MongoClient('localhost', 27017)
-        db = client['Inventarsystem']
+        db = database.get_db()
         users = db['users']
         
         result = users.update_one(
@@ -438,7 +416,6 @@ def update_user_name(username, name, last_name):
             {'$set': {'name': name, 'last_name': last_name}}
         )
         
-        client.close()
         return True
     except Exception as e:
         print(f"Error updating user name: {e}")
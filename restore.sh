@@ -243,7 +243,7 @@ restore_db() {
     fi
     
     # Count CSV files in the backup directory
-    csv_count=$(find "$db_backup_location" -name "*.csv" 2>/dev/null | wc -l)
+    csv_count=$(find "$db_backup_location" \( -name "*.csv" -o -name "*.csv.gz" \) 2>/dev/null | wc -l)
     if [ "$csv_count" -eq 0 ]; then
         log_message "ERROR: No database backup files (CSV) found in $db_backup_location"
         # Continue without error to allow file restoration to succeed
@@ -426,6 +426,11 @@ if __name__ == "__main__":
     sys.exit(main())
 PYTHON_SCRIPT
     
+    # Prefer the streaming restore tool shipped with the project
+    if [ -f "$PROJECT_DIR/Restore-DB.py" ]; then
+        restore_script="$PROJECT_DIR/Restore-DB.py"
+    fi
+
     chmod +x "$restore_script"
     
     # Execute the restoration script
@@ -468,9 +468,12 @@ User=${SUDO_USER:-$USER}
 Group=$(id -gn ${SUDO_USER:-$USER})
 WorkingDirectory=$PROJECT_ROOT/Web
 Environment="PATH=$VENV_DIR/bin:/usr/local/bin:/usr/bin:/bin"
+ExecStartPre=-$VENV_DIR/bin/python $PROJECT_ROOT/Web/indexes.py
 ExecStart=$VENV_DIR/bin/gunicorn app:app \
     --bind unix:/tmp/inventarsystem.sock \
     --workers 3 \
+    --worker-class gthread \
+    --threads 16 \
     --timeout 60 \
     --graceful-timeout 20 \
     --max-requests 1000 \
@@ -492,6 +495,13 @@ echo " Writing Nginx config"
 echo "========================================================"
 write_nginx_tuning_conf
 SERVER_NAME="$NETWORK_IP"
+# The internal X-Accel locations alias the folders the app is configured with
+mapfile -t SERVING_PATHS < <(cd "$PROJECT_ROOT/Web" && "$VENV_DIR/bin/python" -c \
+    'import settings as s; print(s.SERVING_ACCEL_PREFIX.rstrip("/")); print(s.UPLOAD_FOLDER); print(s.THUMBNAIL_FOLDER); print(s.PREVIEW_FOLDER)')
+ACCEL_PREFIX="${SERVING_PATHS[0]:-/_protected}"
+UPLOAD_DIR="${SERVING_PATHS[1]:-$PROJECT_ROOT/Web/uploads}"
+THUMBNAIL_DIR="${SERVING_PATHS[2]:-$PROJECT_ROOT/Web/thumbnails}"
+PREVIEW_DIR="${SERVING_PATHS[3]:-$PROJECT_ROOT/Web/previews}"
 cat <<EOF | sudo tee /etc/nginx/sites-available/inventarsystem >/dev/null
 server {
         listen 80;
@@ -518,12 +528,37 @@ server {
                 expires 30d;
         }
 
+        # Files resolved by the app and handed over via X-Accel-Redirect
+        # (serving.mode "x-accel"); cache headers are set by the app
+        location ${ACCEL_PREFIX}/uploads/ {
+                internal;
+                alias ${UPLOAD_DIR%/}/;
+                access_log off;
+        }
+
+        location ${ACCEL_PREFIX}/thumbnails/ {
+                internal;
+                alias ${THUMBNAIL_DIR%/}/;
+                access_log off;
+        }
+
+        location ${ACCEL_PREFIX}/previews/ {
+                internal;
+                alias ${PREVIEW_DIR%/}/;
+                access_log off;
+        }
+
+        location ${ACCEL_PREFIX}/static/ {
+                internal;
+                alias $PROJECT_ROOT/Web/static/;
+                access_log off;
+        }
+
         location / {
                 include proxy_params;
                 proxy_hide_header X-Powered-By;
                 proxy_pass http://unix:/tmp/inventarsystem.sock;
                 proxy_read_timeout 300;
-				add_header Cache-Control "public";
         }
 
         error_page 404 /404.html;
@@ -546,7 +581,10 @@ sudo rm -f /etc/nginx/sites-enabled/default || true
 sudo ln -sf /etc/nginx/sites-available/inventarsystem /etc/nginx/sites-enabled/inventarsystem
 
 echo "Testing Nginx configuration..."
-sudo nginx -t
+if sudo nginx -t; then
+    # The internal locations exist now, so nginx can send the files (serving.mode)
+    sed -i 's/"mode": "flask"/"mode": "x-accel"/' "$PROJECT_ROOT/config.json"
+fi
 
 echo "========================================================"
 echo " Enabling services"